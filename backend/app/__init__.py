@@ -1,39 +1,162 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from app.config import Config
+from app.utils.tiempos_arranque import TiemposArranque
 
-def create_app():
-    """Crea y configura la aplicación Flask"""
+def inicializar_aplicacion(app, tiempos=None):
+    """
+    Trabajo de una sola vez por despliegue: esquema de la base de datos, datos
+    iniciales, reconciliación de los PDFs de emisiones interrumpidas y
+    precalentamiento de ReportLab (fuentes, estilos y plantillas compiladas).
+    Con gunicorn se ejecuta en el proceso maestro antes del fork,
+    así los workers heredan el estado ya caliente (ver gunicorn.conf.py).
+    """
+    from app.models import verificar_esquema
+    from app.seed_data import seed_initial_data
+    from app.pdf_generator import calentar_plantillas
+    from app.services.pdf_cache_service import PdfCacheService
+    from app.services.resolucion_codigo_service import ResolvedorCodigos
+    from app.services.revocacion_service import RegistroRevocaciones
+
+    tiempos = tiempos or TiemposArranque()
+
+    with app.app_context():
+        with tiempos.fase('esquema'):
+            verificar_esquema()
+        with tiempos.fase('seed'):
+            seed_initial_data()
+        with tiempos.fase('precalentamiento'):
+            # Compila (y deja en la caché de SQLAlchemy) la consulta de la ruta más usada
+            ResolvedorCodigos._consultar('')
+            # Los workers heredan las revocaciones ya cargadas; después solo traen deltas
+            RegistroRevocaciones.desde_app(app).sincronizar()
+        if app.config.get('CERTIFICADOS_RECONCILIAR'):
+            with tiempos.fase('reconciliacion'):
+                from app.services.reconciliacion_service import ReconciliacionService
+                resultado = ReconciliacionService.reconciliar()
+                if resultado['temporales'] or resultado['huerfanos']:
+                    print(f" Reconciliación: {len(resultado['temporales'])} temporales eliminados, "
+                          f"{len(resultado['huerfanos'])} PDFs huérfanos ({resultado['accion']})")
+    with tiempos.fase('precalentamiento'):
+        calentar_plantillas()
+        # La caché de PDFs recorre su carpeta en disco al crearse: mejor aquí que en la 1ª descarga
+        PdfCacheService.desde_app(app)
+
+    # Limpieza de los QR de MFA que antes se guardaban en disco
+    if app.config.get('MFA_QR_PURGAR_DISCO'):
+        from app.services.qr_service import purgar_qr_en_disco
+        eliminados = purgar_qr_en_disco(app.config['QR_CODES_FOLDER'])
+        if eliminados:
+            print(f" {eliminados} QR de MFA antiguos eliminados de {app.config['QR_CODES_FOLDER']}")
+
+
+def preparar_worker(app):
+    """
+    Se llama en cada worker de gunicorn con la app ya cargada (post_worker_init):
+    descarta las conexiones a la base de datos heredadas del maestro y arranca los
+    hilos propios del proceso. Los hilos no sobreviven al fork, y el maestro crea la
+    app con iniciar_hilos=False para no dejar hilos corriendo en él.
+    """
+    from app.models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    _iniciar_scrub(app)
+
+
+def _iniciar_scrub(app):
+    if not app.config.get('HASH_SCRUB_INTERVALO'):
+        return
+    from app.utils.cache_integridad import CacheHashArchivos
+    from app.services.certificado_service import CertificadoService
+
+    def calcular_hash(ruta):
+        with app.app_context():
+            return CertificadoService._calcular_hash_archivo(ruta)
+
+    CacheHashArchivos.desde_app(app).iniciar_scrub(
+        app.config['HASH_SCRUB_INTERVALO'], calcular_hash, app.logger
+    )
+
+
+def create_app(inicializar=True, iniciar_hilos=True):
+    """
+    Crea y configura la aplicación Flask.
+    Con inicializar=False se omite inicializar_aplicacion() (los workers de
+    producción la reciben ya hecha del proceso maestro).
+    Con iniciar_hilos=False no se arrancan los hilos en segundo plano (scrub de
+    hashes); con gunicorn los arranca preparar_worker en cada worker.
+    Los tiempos de cada fase quedan en app.extensions['tiempos_arranque'].
+    """
     try:
+        tiempos = TiemposArranque()
         app = Flask(__name__, static_folder=Config.STATIC_FOLDER)
         print(" Aplicación Flask creada")
 
         # Cargar configuración
-        app.config.from_object(Config)
-        Config.init_app(app)
+        with tiempos.fase('configuracion'):
+            app.config.from_object(Config)
+            Config.init_app(app)
+
+            # Habilitar CORS
+            CORS(app)
 
-        # Habilitar CORS
-        CORS(app)
+            # IP y esquema reales del cliente detrás de nginx (límite de login, logs)
+            saltos = app.config.get('PROXY_SALTOS_CONFIABLES', 0)
+            if saltos:
+                from werkzeug.middleware.proxy_fix import ProxyFix
+                app.wsgi_app = ProxyFix(app.wsgi_app, x_for=saltos, x_proto=saltos)
 
         # Inicializar base de datos
-        from app.models import init_db
-        init_db(app)
+        with tiempos.fase('base_datos'):
+            from app.models import init_db
+            init_db(app)
 
-        # Seed inicial
-        with app.app_context():
-            from app.seed_data import seed_initial_data
-            seed_initial_data()
+            if app.config.get('SQL_CONTAR_CONSULTAS'):
+                from app.models import db
+                from app.utils.contador_consultas import instrumentar_app
+                instrumentar_app(app, db)
+
+        with tiempos.fase('servicios'):
+            # Sin CERTIFICADO_TOKEN_SECRETO (fuera de DEBUG) la app no arranca
+            from app.services.token_certificado_service import TokenCertificados
+            TokenCertificados.desde_app(app)
+
+            # Pool de hash de contraseñas: Usuario lo encuentra en app.extensions
+            from app.services.password_service import PasswordService, ServicioSaturado
+            PasswordService.desde_app(app)
+
+            # Escritor en segundo plano de los logs de verificación
+            if app.config.get('LOG_VERIFICACION_ASINCRONO'):
+                from app.services.log_verificacion_service import LogVerificacionSink
+                LogVerificacionSink.iniciar_para_app(app)
+
+            # Scrub periódico de la caché de hashes de certificados
+            if iniciar_hilos:
+                _iniciar_scrub(app)
+
+        # Esquema, seed inicial y precalentamiento (una sola vez)
+        if inicializar:
+            inicializar_aplicacion(app, tiempos)
 
         # Registrar Blueprints - CON MANEJO DE ERRORES
-        try:
-            from app.routes.certificado_routes import certificado_bp
-            app.register_blueprint(certificado_bp)
-            print(" Blueprint de certificados registrado")
-        except Exception as e:
-            print(f" Error registrando certificado_bp: {e}")
+        with tiempos.fase('blueprints'):
+            try:
+                from app.routes.certificado_routes import certificado_bp
+                app.register_blueprint(certificado_bp)
+                print(" Blueprint de certificados registrado")
+            except Exception as e:
+                print(f" Error registrando certificado_bp: {e}")
 
         # ... otros blueprints
 
+        # El pool de hash de contraseñas está lleno: el cliente debe reintentar
+        @app.errorhandler(ServicioSaturado)
+        def servicio_saturado(error):
+            respuesta = jsonify({'success': False, 'message': str(error)})
+            respuesta.headers['Retry-After'] = '1'
+            return respuesta, 503
+
         # Rutas básicas
         @app.route('/')
         def index():
@@ -50,7 +173,9 @@ def create_app():
         def health():
             return jsonify({'status': 'ok'})
 
-        print(" Aplicación configurada completamente")
+        tiempos.detener()
+        app.extensions['tiempos_arranque'] = tiempos
+        print(f" Aplicación configurada completamente ({tiempos.total_ms():.0f} ms)")
         return app
 
     except Exception as e:
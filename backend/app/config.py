@@ -15,13 +15,59 @@ class Config:
     # Base de datos
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///certificados.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Réplica para las rutas públicas de verificación/descarga (por defecto, la misma base)
+    DATABASE_URL_LECTURA = os.getenv('DATABASE_URL_LECTURA')
+    # Pool de conexiones de cada motor
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True') == 'True'
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    # SQLite: WAL (lectores y escritor concurrentes), durabilidad, espera ante bloqueos y mmap
+    SQLITE_WAL = os.getenv('SQLITE_WAL', 'True') == 'True'
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # OFF | NORMAL | FULL
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
     
     # Seguridad MFA
     MFA_SECRET_KEY = os.getenv('MFA_SECRET_KEY', 'mfa-secret')
+    # Pasos de 30 s aceptados antes/después del actual y tamaño de las cachés del motor TOTP
+    MFA_VENTANA_PASOS = int(os.getenv('MFA_VENTANA_PASOS', 1))
+    MFA_CACHE_MAX_USUARIOS = int(os.getenv('MFA_CACHE_MAX_USUARIOS', 10000))
+    # Caché de códigos MFA ya usados: por proceso, salvo con LOGIN_LIMITE_BACKEND=redis,
+    # que la comparte entre workers (con 'memoria' y varios workers gunicorn.conf.py
+    # lo avisa al arrancar: un código podría reutilizarse una vez por worker)
+    MFA_CACHE_MAX_REPETICIONES = int(os.getenv('MFA_CACHE_MAX_REPETICIONES', 100000))
+    # Borrar al iniciar los PNG que versiones anteriores dejaban en QR_CODES_FOLDER
+    MFA_QR_PURGAR_DISCO = os.getenv('MFA_QR_PURGAR_DISCO', 'True') == 'True'
     
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    # Límite de intentos de login (ventana deslizante por usuario y por IP).
+    # 'memoria' cuenta por proceso: con N workers de gunicorn un atacante tiene hasta
+    # N veces los intentos configurados (gunicorn.conf.py lo avisa al arrancar).
+    # Con más de un worker, usar 'redis'
+    LOGIN_LIMITE_BACKEND = os.getenv('LOGIN_LIMITE_BACKEND', 'memoria')  # memoria | redis
+    LOGIN_LIMITE_REDIS_URL = os.getenv('LOGIN_LIMITE_REDIS_URL', 'redis://localhost:6379/0')
+    LOGIN_LIMITE_MAX_CLAVES = int(os.getenv('LOGIN_LIMITE_MAX_CLAVES', 100000))
+    LOGIN_MAX_INTENTOS_USUARIO = int(os.getenv('LOGIN_MAX_INTENTOS_USUARIO', 5))
+    LOGIN_MAX_INTENTOS_IP = int(os.getenv('LOGIN_MAX_INTENTOS_IP', 20))
+    LOGIN_VENTANA_SEGUNDOS = int(os.getenv('LOGIN_VENTANA_SEGUNDOS', 900))
+    LOGIN_BLOQUEO_MINUTOS = int(os.getenv('LOGIN_BLOQUEO_MINUTOS', 15))
+    
+    # Hash de contraseñas (bcrypt): factor de trabajo y pool dedicado con control de admisión
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_BCRYPT_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or None  # None: núcleos de CPU
+    PASSWORD_HASH_COLA_MAX = int(os.getenv('PASSWORD_HASH_COLA_MAX', 32))
+    PASSWORD_HASH_SATURACION = os.getenv('PASSWORD_HASH_SATURACION', 'queue')  # queue | reject
+    PASSWORD_HASH_ESPERA_MS = int(os.getenv('PASSWORD_HASH_ESPERA_MS', 2000))
+    
+    # Caché de tokens ya verificados (hasta su 'exp' o el TTL) y de usuarios autenticados
+    AUTH_CACHE_TOKENS_MAX_ENTRADAS = int(os.getenv('AUTH_CACHE_TOKENS_MAX_ENTRADAS', 10000))
+    AUTH_CACHE_TOKENS_TTL = int(os.getenv('AUTH_CACHE_TOKENS_TTL', 300))
+    AUTH_CACHE_USUARIOS_MAX_ENTRADAS = int(os.getenv('AUTH_CACHE_USUARIOS_MAX_ENTRADAS', 10000))
+    AUTH_CACHE_USUARIOS_TTL = int(os.getenv('AUTH_CACHE_USUARIOS_TTL', 30))
     
     # Email
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
@@ -36,6 +82,89 @@ class Config:
     QR_CODES_FOLDER = os.path.join(STATIC_FOLDER, 'qrcodes')
     CERTIFICADOS_FOLDER = os.path.join(BASE_DIR, "certificados_pdf")
     
+    # Emisión: fsync de cada PDF antes del rename y reconciliación al iniciar
+    CERTIFICADOS_FSYNC = os.getenv('CERTIFICADOS_FSYNC', 'True') == 'True'
+    CERTIFICADOS_RECONCILIAR = os.getenv('CERTIFICADOS_RECONCILIAR', 'True') == 'True'
+    # Edad mínima (s) de un archivo para considerarlo huérfano y qué hacer con él
+    CERTIFICADOS_HUERFANOS_GRACIA = int(os.getenv('CERTIFICADOS_HUERFANOS_GRACIA', 3600))
+    CERTIFICADOS_HUERFANOS_ACCION = os.getenv('CERTIFICADOS_HUERFANOS_ACCION', 'reportar')  # reportar | cuarentena | borrar
+    
+    # Entrega de los PDFs almacenados (/api/v1/certificados/archivo/<filename>):
+    # prefijo de la location 'internal' de nginx para X-Accel-Redirect, o X-Sendfile
+    CERTIFICADOS_X_ACCEL_PREFIJO = os.getenv('CERTIFICADOS_X_ACCEL_PREFIJO', '')  # p. ej. /protegido/certificados
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'False') == 'True'
+    
+    # Caché de PDFs de /download-certificate (memoria LRU + disco)
+    PDF_CACHE_FOLDER = os.path.join(CERTIFICADOS_FOLDER, "cache")
+    PDF_CACHE_MAX_ENTRADAS = int(os.getenv('PDF_CACHE_MAX_ENTRADAS', 256))
+    PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    PDF_CACHE_MAX_BYTES_DISCO = int(os.getenv('PDF_CACHE_MAX_BYTES_DISCO', 512 * 1024 * 1024))
+    PDF_CACHE_TTL = int(os.getenv('PDF_CACHE_TTL', 24 * 3600))
+    
+    # Cache-Control (segundos) de las descargas y de los resultados públicos de verificación;
+    # 0 obliga al cliente a revalidar con If-None-Match en cada uso. Las descargas se pueden
+    # revocar: con 0 (por defecto) la revalidación es un 304 que ya ve la revocación
+    DESCARGA_CACHE_MAX_AGE = int(os.getenv('DESCARGA_CACHE_MAX_AGE', 0))
+    VERIFICACION_CACHE_MAX_AGE = int(os.getenv('VERIFICACION_CACHE_MAX_AGE', 60))
+    VERIFICACION_CACHE_MAX_AGE_NEGATIVA = int(os.getenv('VERIFICACION_CACHE_MAX_AGE_NEGATIVA', 0))
+    # PDFs almacenados (/api/v1/certificados/archivo/): se pueden revocar, así que por defecto
+    # no-cache (revalidación con ETag en cada uso) en lugar del max-age de las descargas
+    ARCHIVO_CACHE_MAX_AGE = int(os.getenv('ARCHIVO_CACHE_MAX_AGE', 0))
+    
+    # Verificación por lotes (POST /api/v1/certificados/verificar): códigos por petición
+    # e hilos para recalcular hashes de archivos en paralelo
+    VERIFICACION_LOTE_MAX = int(os.getenv('VERIFICACION_LOTE_MAX', 100))
+    VERIFICACION_LOTE_WORKERS = int(os.getenv('VERIFICACION_LOTE_WORKERS', 8))
+    
+    # Tokens firmados (HMAC-SHA256) impresos en cada PDF y su QR para verificar sin base de
+    # datos; el secreto debe ser el mismo en todas las réplicas que verifiquen.
+    # Obligatorio con DEBUG=False (la app no arranca sin él); en DEBUG, si falta, se usa
+    # uno de desarrollo
+    CERTIFICADO_TOKEN_SECRETO = os.getenv('CERTIFICADO_TOKEN_SECRETO', '')
+    
+    # Revocaciones en memoria (filtro de Bloom + lista ordenada + log por versión): segundos
+    # entre sincronizaciones incrementales, falsos positivos del filtro y tamaño de los deltas
+    REVOCACIONES_INTERVALO = int(os.getenv('REVOCACIONES_INTERVALO', 30))
+    REVOCACIONES_TASA_FALSOS = float(os.getenv('REVOCACIONES_TASA_FALSOS', 0.01))
+    REVOCACIONES_DELTA_LIMITE = int(os.getenv('REVOCACIONES_DELTA_LIMITE', 1000))
+    
+    # Escritor asíncrono de logs de verificación
+    LOG_VERIFICACION_ASINCRONO = os.getenv('LOG_VERIFICACION_ASINCRONO', 'True') == 'True'
+    LOG_VERIFICACION_COLA_MAX = int(os.getenv('LOG_VERIFICACION_COLA_MAX', 10000))
+    LOG_VERIFICACION_LOTE = int(os.getenv('LOG_VERIFICACION_LOTE', 200))
+    LOG_VERIFICACION_INTERVALO_MS = int(os.getenv('LOG_VERIFICACION_INTERVALO_MS', 500))
+    LOG_VERIFICACION_DESBORDE = os.getenv('LOG_VERIFICACION_DESBORDE', 'drop')  # drop | block | spill
+    LOG_VERIFICACION_BLOQUEO_MS = int(os.getenv('LOG_VERIFICACION_BLOQUEO_MS', 1000))
+    # Solo con 'spill' (obligatorio en ese caso), p. ej. <backend>/log_verificaciones_desborde.jsonl
+    # (cada proceso escribe en <nombre>.<pid>.jsonl junto a esa ruta)
+    LOG_VERIFICACION_ARCHIVO_DESBORDE = os.getenv('LOG_VERIFICACION_ARCHIVO_DESBORDE', '')
+    
+    # Cálculo de hashes de archivos: auto | file_digest | mmap | bloques
+    HASH_ESTRATEGIA = os.getenv('HASH_ESTRATEGIA', 'auto')
+    HASH_TAMANO_BLOQUE = int(os.getenv('HASH_TAMANO_BLOQUE', 1024 * 1024))
+    
+    # Caché de hashes para verificar integridad (clave: ruta, tamaño, mtime_ns, inodo)
+    HASH_CACHE_MAX_ENTRADAS = int(os.getenv('HASH_CACHE_MAX_ENTRADAS', 50000))
+    # Segundos entre cada scrub (recalcular todos los hashes en caché); 0 lo desactiva
+    HASH_SCRUB_INTERVALO = int(os.getenv('HASH_SCRUB_INTERVALO', 0))
+    
+    # Resolución código -> estudiante en /download-certificate (caché en memoria)
+    RESOLVEDOR_CODIGOS_MAX_ENTRADAS = int(os.getenv('RESOLVEDOR_CODIGOS_MAX_ENTRADAS', 10000))
+    RESOLVEDOR_CODIGOS_TTL = int(os.getenv('RESOLVEDOR_CODIGOS_TTL', 300))
+    # Aceptar los códigos de demostración del frontend si el código no está en la DB
+    RESOLVEDOR_CODIGOS_DEMO = os.getenv('RESOLVEDOR_CODIGOS_DEMO', 'True') == 'True'
+    
+    # Cabecera X-SQL-Consultas con el número de sentencias SQL de cada petición (desarrollo)
+    SQL_CONTAR_CONSULTAS = os.getenv('SQL_CONTAR_CONSULTAS', 'False') == 'True'
+    
+    # Presupuesto de arranque (import + create_app de un worker) para diagnosticar.py --startup-profile
+    ARRANQUE_PRESUPUESTO_MS = float(os.getenv('ARRANQUE_PRESUPUESTO_MS', 1500))
+    
+    # Proxies inversos de confianza delante de la app (nginx = 1). Con 0 no se leen
+    # X-Forwarded-For/-Proto y request.remote_addr es la dirección del socket; gunicorn.conf.py
+    # usa 1 por defecto porque escucha en 127.0.0.1 detrás de nginx
+    PROXY_SALTOS_CONFIABLES = int(os.getenv('PROXY_SALTOS_CONFIABLES', 0))
+
     # URL base
     BASE_URL = "http://localhost:5000"
     
@@ -5,21 +5,102 @@ from .usuario import Usuario
 from .estudiante import Estudiante 
 from .certificado import Certificado
 from .log_verificacion import LogVerificacion
+from .revocacion import Revocacion
 
 def init_db(app):
-    """Inicializar la base de datos"""
+    """Inicializar la base de datos: motores (principal y de solo lectura) con su pool y PRAGMA"""
+    from app.utils.base_datos import BIND_LECTURA, configurar_binds, configurar_sqlite
+
+    configurar_binds(app)
     db.init_app(app)
-    
     with app.app_context():
+        for bind, engine in db.engines.items():
+            configurar_sqlite(engine, app.config, solo_lectura=(bind == BIND_LECTURA))
+
+
+def verificar_esquema():
+    """
+    Crea las tablas que falten y muestra estadísticas. Es trabajo de una sola vez
+    por despliegue: en producción se ejecuta en el proceso maestro (ver wsgi.py).
+    Requiere un contexto de aplicación.
+    """
+    # Crear todas las tablas
+    nueva_revocaciones = not db.inspect(db.engine).has_table(Revocacion.__tablename__)
+    db.create_all()
+    cambios = migrar_esquema()
+    if nueva_revocaciones:
+        rellenar_revocaciones()
+    print("Base de datos inicializada" + (f" ({len(cambios)} cambios de esquema)" if cambios else ""))
+    
+    # Mostrar estadísticas
+    num_usuarios = Usuario.query.count()
+    num_estudiantes = Estudiante.query.count()
+    num_certificados = Certificado.query.count()
+    
+    print(f" Usuarios: {num_usuarios} | Estudiantes: {num_estudiantes} | Certificados: {num_certificados}")
+
+
+def rellenar_revocaciones():
+    """Al crear la tabla revocaciones, registra los certificados que ya estaban revocados."""
+    revocados = db.session.query(Certificado.codigo_unico).filter(
+        Certificado.estado == 'Revocado', Certificado.codigo_unico.isnot(None)
+    ).order_by(Certificado.id).all()
+    if revocados:
+        db.session.bulk_insert_mappings(Revocacion, [{'codigo_unico': codigo} for (codigo,) in revocados])
+        db.session.commit()
+        print(f" Esquema: {len(revocados)} revocaciones existentes registradas")
+
+
+# Columnas nuevas que se rellenan con otra columna de la misma fila al agregarlas
+RELLENOS = {
+    ('certificados', 'codigo_unico'): 'codigo',
+}
+
+
+def migrar_esquema() -> list[str]:
+    """
+    create_all() solo crea tablas nuevas: en las que ya existen agrega las columnas
+    declaradas en los modelos que falten (ALTER TABLE ... ADD COLUMN) y crea los
+    índices que falten. Retorna la lista de cambios aplicados.
+    """
+    cambios = []
+    with db.engine.begin() as conexion:
+        inspector = db.inspect(conexion)
+        citar = conexion.dialect.identifier_preparer.quote
+        for tabla in db.metadata.sorted_tables:
+            if not inspector.has_table(tabla.name):
+                continue
+            existentes = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in existentes:
+                    continue
+                ddl = f"ALTER TABLE {citar(tabla.name)} ADD COLUMN {citar(columna.name)} {columna.type.compile(conexion.dialect)}"
+                if columna.server_default is not None:
+                    valor = str(columna.server_default.arg).replace("'", "''")
+                    ddl += f" DEFAULT '{valor}'"
+                    if not columna.nullable:
+                        ddl += " NOT NULL"
+                conexion.exec_driver_sql(ddl)
+                cambios.append(f"{tabla.name}.{columna.name}")
+
+                origen = RELLENOS.get((tabla.name, columna.name))
+                if origen:
+                    conexion.exec_driver_sql(
+                        f"UPDATE {citar(tabla.name)} SET {citar(columna.name)} = {citar(origen)} "
+                        f"WHERE {citar(columna.name)} IS NULL"
+                    )
 
+            indices = {indice['name'] for indice in inspector.get_indexes(tabla.name)}
+            for indice in tabla.indexes:
+                if indice.name in indices:
+                    continue
+                try:
+                    with conexion.begin_nested():
+                        indice.create(conexion)
+                    cambios.append(indice.name)
+                except Exception as e:
+                    print(f" No se pudo crear el índice {indice.name}: {e}")
 
-        # Crear todas las tablas
-        db.create_all()
-        print("Base de datos inicializada")
-        
-        # Mostrar estadísticas
-        num_usuarios = Usuario.query.count()
-        num_estudiantes = Estudiante.query.count()
-        num_certificados = Certificado.query.count()
-        
-        print(f" Usuarios: {num_usuarios} | Estudiantes: {num_estudiantes} | Certificados: {num_certificados}")
\ No newline at end of file
+    for cambio in cambios:
+        print(f" Esquema: agregado {cambio}")
+    return cambios
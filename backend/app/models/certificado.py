@@ -3,13 +3,23 @@ from datetime import datetime
 
 class Certificado(db.Model):
     __tablename__ = 'certificados'
+    __table_args__ = (
+        # Certificados de un estudiante por fecha (y búsquedas por estudiante_id solo)
+        db.Index('ix_certificados_estudiante_fecha', 'estudiante_id', 'fecha_emision'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     codigo = db.Column(db.String(50), unique=True, nullable=False)
     titulo = db.Column(db.String(200), nullable=False)
-    fecha_emision = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_emision = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     estudiante_id = db.Column(db.Integer, db.ForeignKey('estudiantes.id'))
     
+    # Emisión con firma (CertificadoService / EmisionLoteService) y verificación
+    codigo_unico = db.Column(db.String(36), unique=True, index=True, nullable=True)
+    hash_firma = db.Column(db.String(64), nullable=True)
+    ruta_archivo = db.Column(db.String(500), nullable=True, index=True)
+    estado = db.Column(db.String(20), nullable=False, default='Válido', server_default='Válido')
+    
     # Relación
     estudiante = db.relationship('Estudiante', backref='certificados')
     
@@ -22,5 +32,7 @@ class Certificado(db.Model):
             'codigo': self.codigo,
             'titulo': self.titulo,
             'fecha_emision': self.fecha_emision.strftime('%d/%m/%Y'),
-            'estudiante_id': self.estudiante_id
+            'estudiante_id': self.estudiante_id,
+            'codigo_unico': self.codigo_unico,
+            'estado': self.estado
         }
\ No newline at end of file
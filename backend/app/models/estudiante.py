@@ -8,6 +8,13 @@ class Estudiante(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False)
     password = db.Column(db.String(100), nullable=False)
     
+    # Datos de matrícula (listado de estudiantes y nombre del PDF)
+    nombres = db.Column(db.String(100), nullable=True)
+    apellido_paterno = db.Column(db.String(50), nullable=True)
+    apellido_materno = db.Column(db.String(50), nullable=True)
+    dni = db.Column(db.String(15), unique=True, index=True, nullable=True)
+    matricula = db.Column(db.String(30), unique=True, index=True, nullable=True)
+    
     def __repr__(self):
         return f'<Estudiante {self.nombre_completo}>'
     
@@ -15,5 +22,7 @@ class Estudiante(db.Model):
         return {
             'id': self.id,
             'nombre_completo': self.nombre_completo,
-            'email': self.email
+            'email': self.email,
+            'dni': self.dni,
+            'matricula': self.matricula
         }
\ No newline at end of file
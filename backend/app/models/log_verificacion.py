@@ -5,6 +5,10 @@ from flask import request, current_app
 class LogVerificacion(db.Model):
     """Modelo para registrar intentos de verificación de certificados"""
     __tablename__ = 'log_verificaciones'
+    __table_args__ = (
+        # Reportes por rango de fechas, opcionalmente solo válidas / inválidas
+        db.Index('ix_log_verificaciones_fecha_valido', 'fecha_verificacion', 'es_valido'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     
@@ -18,26 +22,52 @@ class LogVerificacion(db.Model):
 
 
     
+    @staticmethod
+    def nuevo_registro(codigo_unico: str, es_valido: bool, notas: str, certificado_id: int = None) -> dict:
+        """Columnas de un evento de verificación (con la IP de la petición actual, si la hay)."""
+        try:
+            ip_address = request.remote_addr if request and request.remote_addr else 'CLI/SYSTEM'
+        except RuntimeError:
+            ip_address = 'CLI/SYSTEM'
+
+        return {
+            'certificado_id': certificado_id,
+            'codigo_unico': codigo_unico,
+            'fecha_verificacion': datetime.utcnow(),
+            'es_valido': es_valido,
+            'ip_verificacion': ip_address,
+            'notas': notas,
+        }
+
     @staticmethod
     def registrar(codigo_unico: str, es_valido: bool, notas: str, certificado_id: int = None):
         """
         Registra un evento de verificación.
         Si el certificado_id es conocido (verificación exitosa), se guarda.
+        Si la aplicación tiene el escritor asíncrono activo, el registro solo se encola
+        y no se hace commit en la sesión de quien llama.
         """
-        try:
-            ip_address = request.remote_addr if request and request.remote_addr else 'CLI/SYSTEM'
-        except RuntimeError:
-            ip_address = 'CLI/SYSTEM'
+        LogVerificacion.registrar_lote([
+            LogVerificacion.nuevo_registro(codigo_unico, es_valido, notas, certificado_id)
+        ])
+
+    @staticmethod
+    def registrar_lote(registros: list):
+        """
+        Registra varios eventos (dicts de nuevo_registro) de una vez: se encolan en el
+        escritor asíncrono o, si no está activo, se escriben con un solo INSERT multi-fila.
+        """
+        if not registros:
+            return
+
+        sink = current_app.extensions.get('log_verificacion_sink')
+        if sink is not None:
+            for registro in registros:
+                sink.registrar(registro)
+            return
 
-        nuevo_log = LogVerificacion(
-            certificado_id=certificado_id,
-            codigo_unico=codigo_unico,
-            es_valido=es_valido,
-            ip_verificacion=ip_address,
-            notas=notas
-        )
-        db.session.add(nuevo_log)
         try:
+            db.session.bulk_insert_mappings(LogVerificacion, registros)
             db.session.commit()
         except Exception as e:
             db.session.rollback()
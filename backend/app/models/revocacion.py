@@ -0,0 +1,19 @@
+from app.models import db
+from datetime import datetime
+
+class Revocacion(db.Model):
+    """
+    Registro de revocaciones en orden de llegada. `version` es monótona (AUTOINCREMENT:
+    no se reutiliza aunque se borren filas) y es lo que sincronizan los verificadores:
+    cada uno pide las revocaciones con version mayor a la última que aplicó. Por eso las
+    versiones deben confirmarse en orden (ver CertificadoService.revocar_certificado).
+    """
+    __tablename__ = 'revocaciones'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    version = db.Column(db.Integer, primary_key=True)
+    codigo_unico = db.Column(db.String(36), nullable=False, index=True)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Revocacion {self.version} {self.codigo_unico}>'
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.models import db
+from app.utils.contrasenas import hashear_password, verificar_password, necesita_rehash
 
 class Usuario(db.Model):
     __tablename__ = 'usuarios'
@@ -21,11 +21,15 @@ class Usuario(db.Model):
 
     # MÉTODOS DE CONTRASEÑA
 
+    # El cálculo se hace en el pool de PasswordService (ver app/utils/contrasenas.py)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hashear_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verificar_password(password, self.password_hash)
+
+    def password_necesita_rehash(self):
+        return necesita_rehash(self.password_hash)
 
     # MANEJO DE INTENTOS
     def increment_login_attempts(self):
@@ -34,6 +38,11 @@ class Usuario(db.Model):
         if self.login_attempts >= 5:
             self.locked_until = datetime.utcnow() + timedelta(minutes=15)
 
+    def lock_account(self, attempts, minutes=15):
+        # El conteo de fallos vive en LimitadorLogin; aquí solo se persiste el bloqueo
+        self.login_attempts = attempts
+        self.locked_until = datetime.utcnow() + timedelta(minutes=minutes)
+
     def reset_login_attempts(self):
         self.login_attempts = 0
         self.locked_until = None
@@ -1,16 +1,600 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4, letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Flowable
 from reportlab.lib.units import inch
 from reportlab.lib import colors
+from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
+from reportlab.lib.rl_accel import fp_str
+from xml.sax.saxutils import escape
+from functools import lru_cache
 import io
+import zlib
+import hashlib
+import threading
 from datetime import datetime
 
+
+# ---------------------------------------------
+# PLANTILLAS COMPILADAS
+# ---------------------------------------------
+# Todo lo que no cambia entre estudiantes (estilos, encabezado, párrafos del cuerpo,
+# tabla de firmas, pie e incluso la estructura del PDF: fuentes, catálogo, árbol de
+# páginas, tabla xref) se maqueta y serializa una sola vez por proceso. Por cada
+# certificado solo se maquetan los campos variables (nombre, código, fecha, título)
+# y se arma el flujo de contenido de la página.
+
+class DesbordePlantilla(Exception):
+    """El contenido variable no cabe en la página de la plantilla compilada."""
+
+
+class Variable:
+    """Bloque de la plantilla que se construye por certificado a partir de sus datos."""
+
+    def __init__(self, construir):
+        self.construir = construir
+
+
+_MARCA_CONTENIDO = '%%CONTENIDO_CERTIFICADO%%'
+
+
+@lru_cache(maxsize=None)
+def internos_reportlab_disponibles() -> bool:
+    """
+    Comprueba una vez por proceso los internos de ReportLab de los que depende la
+    plantilla compilada (requirements.txt fija la versión probada): la lista de
+    operadores del canvas (_code), las fuentes del documento (_doc.fontMapping,
+    getInternalFontName) y Flowable._drawOn. Si falta alguno, las plantillas se
+    renderizan solo con la API pública (más lento, mismo contenido).
+    """
+    try:
+        c = canvas.Canvas(io.BytesIO())
+        inicio = len(c._code)
+        prueba = Paragraph('x', getSampleStyleSheet()['Normal'])
+        prueba.wrap(100, 100)
+        prueba._drawOn(c)
+        return (len(c._code) > inicio and isinstance(c._doc.fontMapping, dict)
+                and callable(c._doc.getInternalFontName))
+    except (AttributeError, TypeError):
+        return False
+
+
+def _alinear(flowable, x: float, sobrante: float) -> float:
+    """x del flowable según su hAlign dentro del ancho sobrante (como hace Frame)."""
+    alineacion = getattr(flowable, 'hAlign', 'LEFT')
+    if not sobrante or alineacion in ('LEFT', TA_LEFT):
+        return x
+    if alineacion in ('CENTER', 'CENTRE', TA_CENTER):
+        return x + sobrante / 2
+    if alineacion in ('RIGHT', TA_RIGHT):
+        return x + sobrante
+    raise ValueError(f"hAlign inválido: {alineacion}")
+
+
+class PlantillaCompilada:
+    """
+    Plantilla de una página cuyo contenido fluye de arriba hacia abajo como en un
+    Frame de platypus (spaceBefore/spaceAfter, hAlign).
+
+    Al compilar:
+      - cada bloque estático se envuelve (wrap) y se dibuja una vez sobre un canvas
+        auxiliar para capturar sus operadores PDF;
+      - se genera un PDF "esqueleto" cuyo único objeto variable es el flujo de
+        contenido de la página (el último objeto antes de la tabla xref).
+    Al renderizar solo se dibujan los bloques variables; los operadores estáticos se
+    copian en su posición y el flujo resultante se inserta en el esqueleto.
+
+    Sin los internos de ReportLab (internos_reportlab_disponibles) no se compila nada:
+    cada certificado se dibuja completo sobre un canvas con la API pública.
+    """
+
+    def __init__(self, pagesize, x, y_superior, y_inferior, ancho, bloques,
+                 fijos=(), dibujar=None, datos_ejemplo=None):
+        self.pagesize = pagesize
+        self.x = x
+        self.y_superior = y_superior
+        self.y_inferior = y_inferior
+        self.ancho = ancho
+        self._local = threading.local()
+        self._dibujar = dibujar
+        self._dibujo = ''
+        self._fuentes = []
+        self._esqueleto = None
+
+        if not internos_reportlab_disponibles():
+            # Los bloques estáticos se comparten entre hilos y drawOn les asigna el canvas
+            self._lock_canvas = threading.Lock()
+            self._bloques = [self._compilar(bloque, None) for bloque in bloques]
+            self._fijos = [(flowable, None, fx, fy) for flowable, fx, fy in fijos]
+            for flowable, *_ in self._fijos:
+                if not isinstance(flowable, Variable):
+                    flowable.wrap(self.ancho, self.y_superior - self.y_inferior)
+            return
+        self._lock_canvas = None
+
+        auxiliar = canvas.Canvas(io.BytesIO(), pagesize=pagesize)
+        self._bloques = [self._compilar(bloque, auxiliar) for bloque in bloques]
+        # Bloques con posición absoluta: (bloque, operadores, x, y); los variables
+        # (p. ej. el QR del certificado) tienen operadores None y se dibujan al renderizar
+        self._fijos = []
+        for flowable, fx, fy in fijos:
+            if isinstance(flowable, Variable):
+                self._fijos.append((flowable, None, fx, fy))
+                continue
+            flowable.wrap(self.ancho, self.y_superior - self.y_inferior)
+            self._fijos.append((flowable, self._capturar(flowable, auxiliar), fx, fy))
+        # Trazos sueltos (líneas, textos) dibujados directamente sobre el canvas
+        if dibujar:
+            inicio = len(auxiliar._code)
+            dibujar(auxiliar)
+            self._dibujo = '\n'.join(auxiliar._code[inicio:])
+            del auxiliar._code[inicio:]
+        # Las fuentes de los bloques variables también deben existir en el esqueleto
+        if datos_ejemplo:
+            for bloque, operadores, *_ in self._bloques + self._fijos:
+                if operadores is None:
+                    flowable = bloque.construir(datos_ejemplo)
+                    flowable.wrap(self.ancho, self.y_superior - self.y_inferior)
+                    self._capturar(flowable, auxiliar)
+
+        # Los operadores capturados hacen referencia a las fuentes por su nombre
+        # interno (/F1, /F2...), que depende del orden de registro en el documento
+        self._fuentes = list(auxiliar._doc.fontMapping)
+        self._esqueleto = self._compilar_esqueleto()
+
+    @staticmethod
+    def _capturar(flowable, auxiliar) -> str:
+        """Dibuja el flowable en el origen del canvas auxiliar y retorna sus operadores."""
+        inicio = len(auxiliar._code)
+        flowable._drawOn(auxiliar)
+        operadores = '\n'.join(auxiliar._code[inicio:])
+        del auxiliar._code[inicio:]
+        return operadores
+
+    def _compilar(self, bloque, auxiliar):
+        if isinstance(bloque, Variable):
+            return bloque, None, None, None, 0, 0
+        ancho, alto = bloque.wrap(self.ancho, self.y_superior - self.y_inferior)
+        operadores = self._capturar(bloque, auxiliar) if auxiliar is not None else None
+        return bloque, operadores, ancho, alto, bloque.getSpaceBefore(), bloque.getSpaceAfter()
+
+    def _nuevo_canvas(self, destino):
+        """
+        Canvas con las fuentes registradas en el mismo orden que al compilar. Con
+        invariant=1 la fecha de creación y el ID del documento son fijos: los mismos
+        datos dan los mismos bytes en cualquier proceso (el ETag de /download-certificate
+        es el digest de los datos y lo supone).
+        """
+        c = canvas.Canvas(destino, pagesize=self.pagesize, invariant=1)
+        for fuente in self._fuentes:
+            c._doc.getInternalFontName(fuente)
+        return c
+
+    def _compilar_esqueleto(self):
+        """
+        Serializa un PDF con una marca en el flujo de contenido y lo parte en trozos
+        reutilizables. Retorna None si la salida de ReportLab no tiene la forma esperada
+        (en ese caso se usa siempre el canvas).
+        """
+        buffer = io.BytesIO()
+        c = self._nuevo_canvas(buffer)
+        c.setPageCompression(0)
+        c._code.append(_MARCA_CONTENIDO)
+        c.showPage()
+        c.save()
+        pdf = buffer.getvalue().decode('latin-1')
+
+        marca = pdf.find(_MARCA_CONTENIDO)
+        inicio_stream = pdf.rfind('stream\n', 0, marca)
+        fin_stream = pdf.find('endstream', marca)
+        inicio_objeto = pdf.rfind('\nendobj\n', 0, inicio_stream) + len('\nendobj\n')
+        inicio_xref = pdf.find('xref\n', fin_stream)
+        inicio_startxref = pdf.find('startxref\n', inicio_xref)
+        objeto = pdf[inicio_objeto:inicio_stream]
+        if min(marca, inicio_stream, fin_stream, inicio_xref, inicio_startxref) < 0 \
+                or pdf[fin_stream:inicio_xref].strip() != 'endstream\nendobj' \
+                or not objeto.endswith('<<\n/Length %d\n>>\n' % (fin_stream - inicio_stream - len('stream\n'))):
+            return None
+
+        cabecera = objeto[:objeto.index('<<')]
+        trailer = pdf[inicio_xref:inicio_startxref]
+        id_inicio = trailer.find('[<')
+        id_fin = trailer.find('>]', id_inicio)
+        return {
+            'prefijo': pdf[:inicio_objeto].encode('latin-1'),
+            'cabecera_objeto': cabecera,
+            'preambulo': pdf[inicio_stream + len('stream\n'):marca],
+            'epilogo': pdf[marca + len(_MARCA_CONTENIDO):fin_stream],
+            'trailer': (trailer[:id_inicio], trailer[id_fin + 2:]) if id_inicio >= 0 and id_fin >= 0 else (trailer, None),
+        }
+
+    def _auxiliar_local(self):
+        auxiliar = getattr(self._local, 'canvas', None)
+        if auxiliar is None:
+            auxiliar = self._local.canvas = self._nuevo_canvas(io.BytesIO())
+        return auxiliar
+
+    def _maquetar(self, datos):
+        """
+        Ubica cada bloque en la página. Retorna una lista de (flowable, operadores, x, y);
+        `operadores` es None para los bloques variables, que se construyen aquí (y para
+        todos si no hay plantilla compilada).
+        """
+        posiciones = []
+        y = self.y_superior
+        al_inicio = True
+        espacio_previo = 0
+        for bloque, operadores, ancho, alto, antes, despues in self._bloques:
+            flowable = bloque
+            if isinstance(bloque, Variable):
+                flowable = bloque.construir(datos)
+                ancho, alto = flowable.wrap(self.ancho, self.y_superior - self.y_inferior)
+                antes, despues = flowable.getSpaceBefore(), flowable.getSpaceAfter()
+            # Igual que Frame: el spaceBefore se solapa con el spaceAfter del bloque anterior
+            if not al_inicio:
+                y -= max(antes - espacio_previo, 0)
+            y -= alto
+            if y < self.y_inferior:
+                raise DesbordePlantilla("El contenido del certificado no cabe en una página.")
+            posiciones.append((flowable, operadores, _alinear(flowable, self.x, self.ancho - ancho), y))
+            y -= despues
+            espacio_previo = despues
+            if alto:
+                al_inicio = False
+        return posiciones
+
+    def renderizar(self, datos: dict) -> bytes:
+        """Genera el PDF de un certificado y retorna sus bytes."""
+        if self._esqueleto is None:
+            return self._renderizar_con_canvas(datos)
+
+        auxiliar = self._auxiliar_local()
+        partes = []
+        for flowable, operadores, x, y in self._maquetar(datos):
+            if operadores is None:
+                operadores = self._capturar(flowable, auxiliar)
+            partes.extend(('q', '1 0 0 1 %s cm' % fp_str(x, y), operadores, 'Q'))
+        for bloque, operadores, fx, fy in self._fijos:
+            if operadores is None:
+                flowable = bloque.construir(datos)
+                flowable.wrap(self.ancho, self.y_superior - self.y_inferior)
+                operadores = self._capturar(flowable, auxiliar)
+            partes.extend(('q', '1 0 0 1 %s cm' % fp_str(fx, fy), operadores, 'Q'))
+        if self._dibujo:
+            partes.append(self._dibujo)
+
+        if len(auxiliar._doc.fontMapping) != len(self._fuentes):
+            # Un bloque variable usó una fuente que no está en el esqueleto
+            self._local.canvas = None
+            return self._renderizar_con_canvas(datos)
+
+        e = self._esqueleto
+        contenido = zlib.compress((e['preambulo'] + '\n'.join(partes) + e['epilogo']).encode('latin-1'))
+        objeto = (
+            e['cabecera_objeto'] +
+            '<<\n/Filter [ /FlateDecode ] /Length %d\n>>\nstream\n' % len(contenido)
+        ).encode('latin-1') + contenido + b'endstream\nendobj\n'
+
+        inicio_trailer, fin_trailer = e['trailer']
+        if fin_trailer is not None:
+            digest = hashlib.md5(contenido).hexdigest()
+            trailer = '%s[<%s><%s>]%s' % (inicio_trailer, digest, digest, fin_trailer)
+        else:
+            trailer = inicio_trailer
+        startxref = len(e['prefijo']) + len(objeto)
+        return b''.join((
+            e['prefijo'], objeto,
+            ('%sstartxref\n%d\n%%%%EOF\n' % (trailer, startxref)).encode('latin-1'),
+        ))
+
+    def _renderizar_con_canvas(self, datos: dict) -> bytes:
+        """Mismo resultado que renderizar(), pero serializando con el canvas de ReportLab."""
+        if self._lock_canvas is None:
+            return self._dibujar_en_canvas(datos)
+        with self._lock_canvas:
+            return self._dibujar_en_canvas(datos)
+
+    def _dibujar_en_canvas(self, datos: dict) -> bytes:
+        buffer = io.BytesIO()
+        c = self._nuevo_canvas(buffer)
+
+        for flowable, operadores, x, y in self._maquetar(datos):
+            if operadores is None:
+                flowable.drawOn(c, x, y)
+            else:
+                self._insertar(c, operadores, x, y)
+        for bloque, operadores, fx, fy in self._fijos:
+            if operadores is not None:
+                self._insertar(c, operadores, fx, fy)
+                continue
+            flowable = bloque
+            if isinstance(bloque, Variable):
+                flowable = bloque.construir(datos)
+                flowable.wrap(self.ancho, self.y_superior - self.y_inferior)
+            flowable.drawOn(c, fx, fy)
+        if self._dibujo:
+            c._code.append(self._dibujo)
+        elif self._dibujar:
+            self._dibujar(c)
+
+        c.showPage()
+        c.save()
+        return buffer.getvalue()
+
+    @staticmethod
+    def _insertar(c, operadores, x, y):
+        c.saveState()
+        c.translate(x, y)
+        c._code.append(operadores)
+        c.restoreState()
+
+
+@lru_cache(maxsize=None)
+def _estilos_descarga():
+    """Estilos del certificado de descarga, construidos una sola vez."""
+    styles = getSampleStyleSheet()
+    content_style = ParagraphStyle(
+        'CustomContent', parent=styles['Normal'], fontSize=12, spaceAfter=12, alignment=0
+    )
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle', parent=styles['Heading1'], fontSize=20, spaceAfter=30,
+            alignment=1, textColor=colors.darkblue, fontName='Helvetica-Bold'
+        ),
+        'subtitle': ParagraphStyle(
+            'CustomSubtitle', parent=styles['Heading2'], fontSize=16, spaceAfter=20,
+            alignment=1, textColor=colors.darkblue
+        ),
+        'content': content_style,
+        'name': ParagraphStyle(
+            'NameStyle', parent=content_style, fontSize=16, textColor=colors.darkred,
+            spaceAfter=20, alignment=1, fontName='Helvetica-Bold'
+        ),
+        'footer': ParagraphStyle('Footer', parent=content_style, fontSize=9, textColor=colors.grey),
+    }
+
+
+def _tabla_info(cert_data):
+    info_data = [
+        ['Código del certificado:', cert_data['codigo']],
+        ['Fecha de emisión:', cert_data['fecha_emision']],
+        ['Título otorgado:', cert_data['titulo']],
+        ['Estado del certificado:', 'VÁLIDO']
+    ]
+    info_table = Table(info_data, colWidths=[2.5*inch, 3.5*inch])
+    info_table.setStyle(_ESTILO_TABLA_INFO)
+    return info_table
+
+
+_ESTILO_TABLA_INFO = TableStyle([
+    ('FONT', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LINEBELOW', (0, 0), (-1, -1), 1, colors.grey),
+    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ('PADDING', (0, 0), (-1, -1), 8),
+])
+
+
+@lru_cache(maxsize=None)
+def plantilla_descarga() -> PlantillaCompilada:
+    """
+    Plantilla A4 usada por /download-certificate. Si cambia lo que dibuja, incrementar
+    VERSION_RENDER en pdf_cache_service (clave de la caché y ETag de la descarga).
+    """
+    estilos = _estilos_descarga()
+    title_style = estilos['title']
+    content_style = estilos['content']
+
+    firma_table = Table([
+        ['', ''],
+        ['_________________________', '_________________________'],
+        ['Director Académico', 'Secretaria General'],
+        ['Centro Educativo Breña', 'Centro Educativo Breña']
+    ], colWidths=[2.5*inch, 2.5*inch])
+    firma_table.setStyle(TableStyle([
+        ('FONT', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+
+    bloques = [
+        # Encabezado
+        Paragraph("CENTRO EDUCATIVO BREÑA", title_style),
+        Paragraph("Institución Educativa Privada", estilos['subtitle']),
+        Spacer(1, 20),
+        Paragraph("CERTIFICADO DE ESTUDIOS", title_style),
+        Spacer(1, 30),
+        # Cuerpo
+        Paragraph("Se hace constar por medio del presente documento que:", content_style),
+        Spacer(1, 15),
+        Variable(lambda datos: Paragraph(escape(datos['nombre_completo']), estilos['name'])),
+        Spacer(1, 15),
+        Paragraph("ha culminado satisfactoriamente sus estudios de educación secundaria en nuestra institución educativa, habiendo demostrado dedicación, compromiso y excelencia académica durante su formación.", content_style),
+        Spacer(1, 25),
+        Paragraph("Este certificado se expide a solicitud del interesado para los fines que estime conveniente.", content_style),
+        Spacer(1, 30),
+        Variable(_tabla_info),
+        Spacer(1, 40),
+        # Firma y pie
+        firma_table,
+        Spacer(1, 20),
+        Paragraph("Lima, Perú", content_style),
+        Spacer(1, 10),
+        Paragraph("Documento generado", estilos['footer']),
+    ]
+
+    # Mismo marco que SimpleDocTemplate(A4, márgenes de 1 pulgada, padding de 6 pt)
+    width, height = A4
+    return PlantillaCompilada(
+        pagesize=A4,
+        x=inch + 6,
+        y_superior=height - inch - 6,
+        y_inferior=inch + 6,
+        ancho=width - 2*inch - 12,
+        bloques=bloques,
+        datos_ejemplo={
+            'nombre_completo': 'Nombre', 'codigo': 'CEB-000',
+            'fecha_emision': '01/01/2000', 'titulo': 'Título',
+        },
+    )
+
+
+TAMANO_QR = 80
+
+
+class CodigoQR(Flowable):
+    """
+    QR vectorial: un solo trazo con un rectángulo por cada racha de módulos oscuros de
+    una fila. La matriz se calcula con `qrcode` y máscara fija (elegir la mejor de las
+    8 máscaras multiplica el costo), y sin PIL: el QR del PDF no pasa por una imagen.
+    """
+
+    def __init__(self, contenido: str, tamano: float):
+        super().__init__()
+        import qrcode
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, border=0, mask_pattern=0)
+        qr.add_data(contenido)
+        qr.make(fit=True)
+        self.matriz = qr.get_matrix()
+        self.tamano = tamano
+
+    def wrap(self, ancho_disponible, alto_disponible):
+        return self.tamano, self.tamano
+
+    def draw(self):
+        # Coordenadas en módulos (enteros) y una sola transformación de escala: los
+        # operadores se escriben directamente, sin formatear flotantes por rectángulo
+        n = len(self.matriz)
+        rectangulos = []
+        for fila, valores in enumerate(self.matriz):
+            y = n - fila - 1
+            columna = 0
+            while columna < n:
+                if not valores[columna]:
+                    columna += 1
+                    continue
+                inicio = columna
+                while columna < n and valores[columna]:
+                    columna += 1
+                rectangulos.append((inicio, y, columna - inicio))
+        self.canv.saveState()
+        self.canv.scale(self.tamano / n, self.tamano / n)
+        if internos_reportlab_disponibles():
+            self.canv._code.append('\n'.join(f"{x} {y} {ancho} 1 re" for x, y, ancho in rectangulos) + ' f')
+        else:
+            trazo = self.canv.beginPath()
+            for x, y, ancho in rectangulos:
+                trazo.rect(x, y, ancho, 1)
+            self.canv.drawPath(trazo, stroke=0, fill=1)
+        self.canv.restoreState()
+
+
+@lru_cache(maxsize=None)
+def plantilla_registro() -> PlantillaCompilada:
+    """Plantilla carta usada al emitir y registrar certificados en la base de datos."""
+    styles = getSampleStyleSheet()
+    style_title = ParagraphStyle(
+        'TitleStyle', parent=styles['Title'], fontSize=24, textColor=colors.darkblue, alignment=1, spaceAfter=20
+    )
+    style_body = ParagraphStyle(
+        'BodyStyle', parent=styles['Normal'], fontSize=14, textColor=colors.black, alignment=1, leading=20, spaceAfter=5
+    )
+    width, height = letter
+
+    def linea(texto):
+        return Paragraph(texto, style_body)
+
+    bloques = [
+        linea("La institución educativa certifica que:"),
+        linea(""),
+        Variable(lambda d: linea(f"<font size=20 color=red>{escape(d['nombre_completo'])}</font>")),
+        Variable(lambda d: linea(f"con matrícula: <b>{escape(str(d['matricula']))}</b>")),
+        linea(""),
+        linea("ha completado satisfactoriamente el programa de:"),
+        Variable(lambda d: linea(f"<b>{escape(d['titulo'])}</b>")),
+        linea(""),
+        Variable(lambda d: linea(f"Emitido el {d['fecha_emision']} en conformidad con los estándares educativos.")),
+        linea(""),
+        linea("Código Único de Verificación:"),
+        Variable(lambda d: linea(f"<font size=12 color=gray>{escape(d['codigo_unico'])}</font>")),
+    ]
+
+    titulo = Paragraph("CERTIFICADO DE FINALIZACIÓN", style_title)
+
+    # Token firmado para verificar sin conexión: impreso al pie y, en el QR, dentro de
+    # la URL de verificación. Los certificados sin token no llevan ninguno de los dos.
+    style_token = ParagraphStyle(
+        'TokenStyle', parent=styles['Normal'], fontSize=6, leading=7, textColor=colors.gray
+    )
+
+    def token(d):
+        if not d.get('token'):
+            return Spacer(0, 0)
+        return Paragraph(f"Verificación sin conexión: {escape(d['token'])}", style_token)
+
+    def qr(d):
+        if not d.get('url_token'):
+            return Spacer(0, 0)
+        return CodigoQR(d['url_token'], TAMANO_QR)
+
+    def dibujar(c):
+        c.line(width/4, 150, 3*width/4, 150)
+        c.drawString(width/2 - 50, 135, "Firma del Director/Autoridad")
+
+    return PlantillaCompilada(
+        pagesize=letter,
+        x=50,
+        y_superior=height - 130,
+        y_inferior=160,
+        ancho=width - 100,
+        bloques=bloques,
+        fijos=[
+            (titulo, 50, height - 80),
+            (Variable(qr), width - 50 - TAMANO_QR, 55),
+            (Variable(token), 50, 25),
+        ],
+        dibujar=dibujar,
+        datos_ejemplo={
+            'nombre_completo': 'Nombre', 'matricula': '000', 'titulo': 'Título',
+            'fecha_emision': '01/01/2000', 'codigo_unico': '0', 'token': '0', 'url_token': '0',
+        },
+    )
+
+
+def generar_certificado_registro(datos: dict) -> bytes:
+    """
+    Genera el PDF de un certificado emitido.
+    `datos` requiere: nombre_completo, matricula, titulo, fecha_emision (dd/mm/aaaa), codigo_unico;
+    opcionales: token (firmado, ver TokenCertificados) y url_token (contenido del QR).
+    """
+    return plantilla_registro().renderizar(datos)
+
+
+def calentar_plantillas():
+    """Compila las plantillas por adelantado (estilos, fuentes y maquetación estática)."""
+    if not internos_reportlab_disponibles():
+        import reportlab
+        print(f" ReportLab {reportlab.Version}: faltan los internos que usan las plantillas "
+              f"compiladas; los PDFs se generan con la API pública (más lento)")
+    plantilla_descarga()
+    plantilla_registro()
+
+
 def generate_simple_certificate(cert_data):
+    """Genera el certificado de descarga usando la plantilla compilada."""
+    try:
+        return io.BytesIO(plantilla_descarga().renderizar(cert_data))
+    except DesbordePlantilla:
+        # Contenido demasiado largo para una página: maquetación completa con platypus
+        return generate_simple_certificate_platypus(cert_data)
+
+
+def generate_simple_certificate_platypus(cert_data):
 
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch)
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch, invariant=1)
     
     # Contenido del certificado
     content = []
@@ -67,7 +651,7 @@ def generate_simple_certificate(cert_data):
     content.append(Spacer(1, 15))
     
     # Nombre del estudiante (destacado)
-    content.append(Paragraph(cert_data['nombre_completo'], name_style))
+    content.append(Paragraph(escape(cert_data['nombre_completo']), name_style))
     content.append(Spacer(1, 15))
     
     content.append(Paragraph("ha culminado satisfactoriamente sus estudios de educación secundaria en nuestra institución educativa, habiendo demostrado dedicación, compromiso y excelencia académica durante su formación.", content_style))
@@ -125,4 +709,4 @@ def generate_simple_certificate(cert_data):
     # Construir PDF
     doc.build(content)
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.services.auth_service import AuthService
-from app.utils.auth_middleware import token_requerido
+from app.services.mfa_service import MotorTOTP
+from app.utils.auth_middleware import token_requerido, token_mfa_requerido, rol_requerido
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/v1/auth')
 
@@ -54,7 +55,7 @@ def login():
 
     username = data["username"]
     password = data["password"]
-    success, message, token, usuario = AuthService.login(username, password)
+    success, message, token, usuario = AuthService.login(username, password, ip=request.remote_addr)
 
     if not success:
         # Fallo de credenciales o bloqueo
@@ -121,7 +122,7 @@ def cambiar_password(usuario_actual):
 def mfa_setup(usuario_actual):
     """
     Genera el secreto MFA para el usuario autenticado, lo guarda 
-    y devuelve el URL del Código QR.
+    y devuelve el Código QR como data URI (PNG).
     """
     # Llama al método del servicio que genera el secreto y el QR
     success, message, qrcode_url = AuthService.generar_mfa_setup(usuario_actual)
@@ -171,7 +172,7 @@ def mfa_activate(usuario_actual):
 # MFA VERIFICACIÓN EN LOGIN 
 
 @auth_bp.route('/mfa/verify', methods=['POST'])
-@token_requerido 
+@token_mfa_requerido
 def mfa_verify(usuario_actual):
     """
     Verifica el código TOTP después de un login exitoso que requiere MFA.
@@ -196,4 +197,14 @@ def mfa_verify(usuario_actual):
         "success": True,
         "message": message,
         "token": token
-    }), 200
\ No newline at end of file
+    }), 200
+
+
+# MÉTRICAS DEL MOTOR TOTP
+
+@auth_bp.route('/mfa/metricas', methods=['GET'])
+@rol_requerido('admin')
+def mfa_metricas(usuario_actual):
+    """Verificaciones, éxitos, repeticiones rechazadas y throughput del motor TOTP."""
+    motor = MotorTOTP.desde_app(current_app)
+    return jsonify({"success": True, "metricas": motor.estadisticas()}), 200
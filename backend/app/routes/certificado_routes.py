@@ -1,25 +1,19 @@
-from flask import Blueprint, request, send_file, jsonify
+from flask import Blueprint, request, send_file, jsonify, current_app, make_response, Response, stream_with_context
+import os
 import io
-from app.pdf_generator import generate_simple_certificate
+import json
+from app.services.pdf_cache_service import PdfCacheService
+from app.services.certificado_service import CertificadoService
+from app.services.emision_lote_service import EmisionLoteService
+from app.services.resolucion_codigo_service import ResolvedorCodigos
+from app.services.token_certificado_service import TokenCertificados
+from app.services.revocacion_service import RegistroRevocaciones
+from app.utils.auth_middleware import rol_requerido
+from app.utils.cache_http import no_modificado, aplicar_cache_control
 from datetime import datetime
 
 certificado_bp = Blueprint('certificado', __name__)
 
-# Base de datos simulada con los 5 estudiantes
-ESTUDIANTES_DB = {
-    "CEB-001": "Ana Sofía Gómez López",
-    "CEB-002": "Juan Pablo Rodríguez López", 
-    "CEB-003": "María Fernanda Cruz Salazar",
-    "CEB-004": "Luis Alberto Medina Torres",
-    "CEB-005": "Mónica Villavicienzo Hurtado",
-    # También mapear códigos generados automáticamente
-    "ANA": "Ana Sofía Gómez López",
-    "JUAN": "Juan Pablo Rodríguez López",
-    "MARIA": "María Fernanda Cruz Salazar", 
-    "LUIS": "Luis Alberto Medina Torres",
-    "MONICA": "Mónica Villavicienzo Hurtado"
-}
-
 @certificado_bp.route('/download-certificate', methods=['GET'])
 def download_certificate():
     try:
@@ -28,107 +22,295 @@ def download_certificate():
         if not code:
             return jsonify({'error': 'Código de certificado requerido'}), 400
         
-        # Buscar el nombre del estudiante basado en el código
-        nombre_estudiante = "Estudiante Demo"
-        
-        # Método 1: Buscar por código exacto en nuestra base de datos 
-        if code in ESTUDIANTES_DB:
-            nombre_estudiante = ESTUDIANTES_DB[code]
-        else:
-            # Método 2: Buscar por partes del código
-            code_upper = code.upper()
-            if '001' in code or 'ANA' in code_upper:
-                nombre_estudiante = "Ana Sofía Gómez López"
-            elif '002' in code or 'JUAN' in code_upper:
-                nombre_estudiante = "Juan Pablo Rodríguez López"
-            elif '003' in code or 'MARIA' in code_upper or 'FERNANDA' in code_upper:
-                nombre_estudiante = "María Fernanda Cruz Salazar"
-            elif '004' in code or 'LUIS' in code_upper:
-                nombre_estudiante = "Luis Alberto Medina Torres" 
-            elif '005' in code or 'MONICA' in code_upper:
-                nombre_estudiante = "Mónica Villavicienzo Hurtado"
-            else:
-                # Método 3: Intentar extraer del código generado
-                nombre_estudiante = mapear_codigo_a_estudiante(code)
+        # Buscar el estudiante por el índice único de Certificado.codigo (con caché)
+        proyeccion = ResolvedorCodigos.desde_app(current_app).resolver(code)
+        if proyeccion is None:
+            return jsonify({'error': 'Certificado no encontrado'}), 404
+        # El estado viene de la proyección (en caché hasta RESOLVEDOR_CODIGOS_TTL en otros
+        # procesos); el registro de revocaciones se sincroniza antes, cada REVOCACIONES_INTERVALO
+        revocado = proyeccion['estado'] == 'Revocado'
+        if not revocado and proyeccion['codigo_unico']:
+            registro = RegistroRevocaciones.desde_app(current_app)
+            registro.sincronizar_si_vence()
+            revocado = registro.esta_revocado(proyeccion['codigo_unico'])
+        if revocado:
+            respuesta = make_response(jsonify({'error': 'Certificado revocado'}), 410)
+            return aplicar_cache_control(respuesta, 0)
+        nombre_estudiante = proyeccion['nombre_completo'] or "Estudiante Demo"
+        fecha_emision = proyeccion['fecha_emision'] or datetime.now()
         
         # Datos para el certificado
         cert_data = {
             'nombre_completo': nombre_estudiante,
             'codigo': code,
-            'fecha_emision': datetime.now().strftime('%d/%m/%Y'),
-            'titulo': 'Certificado de Estudios - Culminación Satisfactoria'
+            'fecha_emision': fecha_emision.strftime('%d/%m/%Y'),
+            'titulo': proyeccion['titulo'] or 'Certificado de Estudios - Culminación Satisfactoria'
         }
         
+        # El PDF queda determinado por cert_data (el render es invariante: sin fecha de
+        # creación ni ID por proceso), así que su digest es un ETag fuerte y, si el
+        # cliente ya lo tiene, se responde 304 sin tocar ReportLab ni la caché
+        etag = PdfCacheService.calcular_clave(cert_data)
+        last_modified = proyeccion['fecha_emision']
+        max_age = current_app.config.get('DESCARGA_CACHE_MAX_AGE', 0)
+        if no_modificado(etag, last_modified):
+            respuesta = make_response('', 304)
+            respuesta.set_etag(etag)
+            return aplicar_cache_control(respuesta, max_age)
+        
         print(f" Generando certificado para: {nombre_estudiante} con código: {code}")
         
-        # Generar PDF
-        pdf_buffer = generate_simple_certificate(cert_data)
+        # Generar PDF (o servirlo desde la caché si ya se generó con los mismos datos)
+        def generar():
+            # ReportLab se importa en la primera generación, no al arrancar
+            from app.pdf_generator import generate_simple_certificate
+            return generate_simple_certificate(cert_data).getvalue()
+
+        cache = PdfCacheService.desde_app(current_app)
+        _, pdf_bytes = cache.obtener_o_generar(cert_data, generar)
         
-        # Devolver el PDF
+        # Devolver el PDF (send_file atiende Range / If-Range con respuestas 206)
         filename = f"Certificado_{nombre_estudiante.replace(' ', '_')}.pdf"
         
-        return send_file(
-            pdf_buffer,
+        respuesta = send_file(
+            io.BytesIO(pdf_bytes),
             as_attachment=True,
             download_name=filename,
-            mimetype='application/pdf'
+            mimetype='application/pdf',
+            etag=etag,
+            last_modified=last_modified,
+            conditional=True
         )
+        return aplicar_cache_control(respuesta, max_age)
         
     except Exception as e:
         print(f" Error generando certificado: {str(e)}")
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
-def mapear_codigo_a_estudiante(codigo):
+@certificado_bp.route('/download-certificate/cache', methods=['GET'])
+def estadisticas_cache():
+    """Contadores de aciertos/fallos de la caché de PDFs y del resolvedor de códigos."""
+    cache = PdfCacheService.desde_app(current_app)
+    resolvedor = ResolvedorCodigos.desde_app(current_app)
+    return jsonify({
+        'success': True,
+        'cache': cache.estadisticas(),
+        'resolvedor_codigos': resolvedor.estadisticas()
+    }), 200
+
+@certificado_bp.route('/api/v1/certificados/verificar/<codigo_unico>', methods=['GET'])
+def verificar_certificado(codigo_unico):
+    """Verificación pública: integridad del PDF y estado del certificado."""
+    success, message, data = CertificadoService.verificar_integridad(codigo_unico)
+    if not success:
+        respuesta = make_response(jsonify({'success': False, 'message': message}), 404)
+        return aplicar_cache_control(respuesta, current_app.config.get('VERIFICACION_CACHE_MAX_AGE_NEGATIVA', 0))
+
+    # ETag fuerte del resultado (cambia con la firma o el estado, p. ej. al revocar)
+    respuesta = make_response(jsonify({'success': True, 'message': message, 'certificado': data}), 200)
+    respuesta.add_etag()
+    aplicar_cache_control(respuesta, current_app.config.get('VERIFICACION_CACHE_MAX_AGE', 60))
+    return respuesta.make_conditional(request)
+
+@certificado_bp.route('/api/v1/certificados/token/<token>', methods=['GET'])
+def verificar_token(token):
+    """
+    Verificación sin estado del token impreso en el PDF (y en su QR): solo valida la
+    firma y consulta el registro de revocaciones en memoria. No lee la base de datos por
+    petición ni el archivo, y no registra la verificación en LogVerificacion.
+    """
+    tokens = TokenCertificados.desde_app(current_app)
+    success, message, data = tokens.verificar(token)
+    if not success:
+        respuesta = make_response(jsonify({'success': False, 'message': message, 'certificado': data}), 404)
+        aplicar_cache_control(respuesta, current_app.config.get('VERIFICACION_CACHE_MAX_AGE_NEGATIVA', 0))
+    else:
+        respuesta = make_response(jsonify({'success': True, 'message': message, 'certificado': data}), 200)
+        respuesta.add_etag()
+        aplicar_cache_control(respuesta, current_app.config.get('VERIFICACION_CACHE_MAX_AGE', 60))
+    # Versión de revocaciones con la que se respondió (ver /api/v1/revocaciones/version)
+    respuesta.headers['X-Revocaciones-Version'] = str(tokens.revocaciones.version)
+    return respuesta.make_conditional(request) if success else respuesta
+
+@certificado_bp.route('/api/v1/certificados/verificar', methods=['POST'])
+def verificar_certificados_lote():
     """
-    Función para mapear códigos a estudiantes específicos
+    Verificación de varios certificados en una petición.
+    Cuerpo: {"codigos": ["...", "..."]} (hasta VERIFICACION_LOTE_MAX). La respuesta es
+    NDJSON: una línea por código distinto, en el orden en que termina cada verificación.
     """
-    # Mapeo exacto basado en los códigos que genera el frontend
-    mapeo_exacto = {
-        "CEB-ANA-001": "Ana Sofía Gómez López",
-        "CEB-JUAN-002": "Juan Pablo Rodríguez López",
-        "CEB-MARIA-003": "María Fernanda Cruz Salazar",
-        "CEB-LUIS-004": "Luis Alberto Medina Torres",
-        "CEB-MONICA-005": "Mónica Villavicienzo Hurtado"
-    }
-    
-    # Primero buscar coincidencia exacta
-    if codigo in mapeo_exacto:
-        return mapeo_exacto[codigo]
-    
-    # Luego buscar por partes del código
-    codigo_upper = codigo.upper()
-    
-    if 'ANA' in codigo_upper or '001' in codigo:
-        return "Ana Sofía Gómez López"
-    elif 'JUAN' in codigo_upper or '002' in codigo:
-        return "Juan Pablo Rodríguez López"
-    elif 'MARIA' in codigo_upper or '003' in codigo or 'FERNANDA' in codigo_upper:
-        return "María Fernanda Cruz Salazar"
-    elif 'LUIS' in codigo_upper or '004' in codigo:
-        return "Luis Alberto Medina Torres"
-    elif 'MONICA' in codigo_upper or '005' in codigo:
-        return "Mónica Villavicienzo Hurtado"
-    
-    # Si no se encuentra, usar lógica de fallback
-    estudiantes = [
-        "Ana Sofía Gómez López",
-        "Juan Pablo Rodríguez López", 
-        "María Fernanda Cruz Salazar",
-        "Luis Alberto Medina Torres",
-        "Mónica Villavicienzo Hurtado"
-    ]
-    
-    # Intentar extraer número del código
+    data = request.get_json(silent=True) or {}
+    codigos = data.get('codigos')
+    maximo = current_app.config.get('VERIFICACION_LOTE_MAX', 100)
+    if not isinstance(codigos, list) or not codigos or not all(isinstance(c, str) and c for c in codigos):
+        return jsonify({'success': False, 'message': "Se requiere 'codigos': una lista de códigos."}), 400
+    if len(codigos) > maximo:
+        return jsonify({'success': False, 'message': f"Se admiten como máximo {maximo} códigos por petición."}), 413
+
+    def generar():
+        for codigo, success, message, certificado in CertificadoService.verificar_lote(codigos):
+            linea = {'codigo_unico': codigo, 'success': success, 'message': message}
+            if certificado is not None:
+                linea['certificado'] = certificado
+            yield json.dumps(linea, ensure_ascii=False) + '\n'
+
+    respuesta = Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+    respuesta.cache_control.no_store = True
+    return respuesta
+
+@certificado_bp.route('/api/v1/certificados/archivo/<filename>', methods=['GET'])
+def descargar_archivo(filename):
+    """
+    PDF almacenado de un certificado vigente. La ruta solo autoriza; los bytes los
+    entrega, según la configuración:
+      - el proxy (nginx) con X-Accel-Redirect, si CERTIFICADOS_X_ACCEL_PREFIJO está definido;
+      - el servidor (Apache/lighttpd) con X-Sendfile, si USE_X_SENDFILE=True;
+      - el propio worker con send_file en otro caso.
+    El ETag es la firma (hash SHA256) guardada del PDF; las filas sin firma solo
+    revalidan con Last-Modified. Como el certificado se puede revocar, las cachés
+    compartidas deben revalidar (ARCHIVO_CACHE_MAX_AGE, 0 por defecto: no-cache).
+    """
+    success, message, archivo = CertificadoService.autorizar_archivo(filename)
+    if not success:
+        return jsonify({'success': False, 'message': message}), 404
+
+    etag = archivo['hash_firma'] or None
+    max_age = current_app.config.get('ARCHIVO_CACHE_MAX_AGE', 0)
+    if no_modificado(etag, archivo['fecha_emision']):
+        respuesta = make_response('', 304)
+        if etag:
+            respuesta.set_etag(etag)
+        return aplicar_cache_control(respuesta, max_age)
+
+    prefijo = current_app.config.get('CERTIFICADOS_X_ACCEL_PREFIJO')
+    if prefijo:
+        # nginx atiende Range y envía el archivo con sendfile(); aquí no se abre
+        respuesta = make_response('', 200)
+        respuesta.headers['X-Accel-Redirect'] = f"{prefijo.rstrip('/')}/{filename}"
+        respuesta.headers['Content-Type'] = 'application/pdf'
+        respuesta.headers['Content-Disposition'] = f'inline; filename="{filename}"'
+        if etag:
+            respuesta.set_etag(etag)
+        if archivo['fecha_emision']:
+            respuesta.last_modified = archivo['fecha_emision']
+        return aplicar_cache_control(respuesta, max_age)
+
+    # send_file usa X-Sendfile si la aplicación tiene USE_X_SENDFILE activado
     try:
-        numeros = ''.join(filter(str.isdigit, codigo))
-        if numeros:
-            indice = (int(numeros) % len(estudiantes)) - 1
-            if 0 <= indice < len(estudiantes):
-                return estudiantes[indice]
-    except:
-        pass
-    
-    # Último recurso: primer estudiante
-    return estudiantes[0]
+        respuesta = send_file(
+            archivo['ruta_archivo'],
+            mimetype='application/pdf',
+            download_name=filename,
+            etag=etag or False,
+            last_modified=archivo['fecha_emision'],
+            conditional=True
+        )
+    except FileNotFoundError:
+        return jsonify({'success': False, 'message': "Archivo no encontrado."}), 404
+    return aplicar_cache_control(respuesta, max_age)
+
+@certificado_bp.route('/api/v1/certificados/recientes', methods=['GET'])
+@rol_requerido('admin')
+def certificados_recientes(usuario_actual):
+    """Últimos certificados con el nombre del estudiante y su código único (solo administradores)."""
+    try:
+        limite = min(max(int(request.args.get('limite', 20)), 1), 100)
+    except ValueError:
+        limite = 20
+    return jsonify({'success': True, 'certificados': CertificadoService.listar_recientes(limite)}), 200
+
+@certificado_bp.route('/api/v1/certificados/<codigo_unico>/revocar', methods=['POST'])
+@rol_requerido('admin')
+def revocar_certificado(usuario_actual, codigo_unico):
+    success, message = CertificadoService.revocar_certificado(codigo_unico)
+    if not success:
+        return jsonify({'success': False, 'message': message}), 400
+    return jsonify({'success': True, 'message': message}), 200
+
+# REVOCACIONES (sincronización de cachés y verificadores de borde)
+
+@certificado_bp.route('/api/v1/revocaciones/version', methods=['GET'])
+def version_revocaciones():
+    """Versión actual del log de revocaciones; ETag = versión, así el sondeo suele ser un 304."""
+    registro = RegistroRevocaciones.desde_app(current_app)
+    registro.sincronizar_si_vence()
+    estadisticas = registro.estadisticas()
+    respuesta = make_response(jsonify({
+        'success': True, 'version': estadisticas['version'], 'revocados': estadisticas['revocados']
+    }), 200)
+    respuesta.set_etag(str(estadisticas['version']))
+    aplicar_cache_control(respuesta, 0)
+    return respuesta.make_conditional(request)
+
+@certificado_bp.route('/api/v1/revocaciones', methods=['GET'])
+def delta_revocaciones():
+    """
+    Revocaciones posteriores a ?desde=<version> (0: todas), en orden de versión. Si
+    'completo' es false, se vuelve a pedir con desde=<version de la respuesta>.
+    """
+    maximo = current_app.config.get('REVOCACIONES_DELTA_LIMITE', 1000)
+    try:
+        desde = max(int(request.args.get('desde', 0)), 0)
+        limite = min(max(int(request.args.get('limite', maximo)), 1), maximo)
+    except ValueError:
+        return jsonify({'success': False, 'message': "'desde' y 'limite' deben ser enteros."}), 400
+
+    registro = RegistroRevocaciones.desde_app(current_app)
+    registro.sincronizar_si_vence()
+    return jsonify({'success': True, **registro.delta(desde, limite)}), 200
+
+# EMISIÓN MASIVA (LOTES)
+
+@certificado_bp.route('/api/v1/certificados/lote', methods=['POST'])
+@rol_requerido('admin')
+def emitir_lote(usuario_actual):
+    """
+    Crea un lote de emisión y lo ejecuta en segundo plano.
+    Cuerpo: {"titulo": "...", "estudiante_ids": [1, 2, 3]} o {"titulo": "...", "cohorte": true}
+    y opcionalmente "workers" (procesos de renderizado, como mucho la cantidad de CPUs).
+    """
+    data = request.get_json() or {}
+
+    workers = data.get('workers')
+    if workers is not None:
+        if not isinstance(workers, int) or isinstance(workers, bool) or workers < 1:
+            return jsonify({'success': False, 'message': "'workers' debe ser un entero positivo"}), 400
+        workers = min(workers, os.cpu_count() or 1)
+
+    success, message, lote = EmisionLoteService.crear_lote(
+        data.get('titulo'),
+        estudiante_ids=data.get('estudiante_ids'),
+        cohorte=bool(data.get('cohorte'))
+    )
+    if not success:
+        return jsonify({'success': False, 'message': message}), 400
+
+    EmisionLoteService.ejecutar_en_segundo_plano(lote['lote_id'], max_workers=workers)
+
+    return jsonify({
+        'success': True,
+        'message': message,
+        'lote_id': lote['lote_id'],
+        'estado_url': f"/api/v1/certificados/lote/{lote['lote_id']}"
+    }), 202
+
+@certificado_bp.route('/api/v1/certificados/lote/<lote_id>', methods=['GET'])
+@rol_requerido('admin')
+def estado_lote(usuario_actual, lote_id):
+    estado = EmisionLoteService.estado_lote(lote_id)
+    if not estado:
+        return jsonify({'success': False, 'message': 'Lote no encontrado.'}), 404
+    return jsonify({'success': True, 'lote': estado}), 200
 
+@certificado_bp.route('/api/v1/certificados/lote/<lote_id>/reanudar', methods=['POST'])
+@rol_requerido('admin')
+def reanudar_lote(usuario_actual, lote_id):
+    """Reanuda un lote interrumpido; los PDFs ya generados no se vuelven a generar."""
+    estado = EmisionLoteService.estado_lote(lote_id)
+    if not estado:
+        return jsonify({'success': False, 'message': 'Lote no encontrado.'}), 404
+    if EmisionLoteService.en_ejecucion(lote_id):
+        return jsonify({'success': False, 'message': 'El lote ya se está ejecutando.'}), 409
 
+    EmisionLoteService.ejecutar_en_segundo_plano(lote_id)
+    return jsonify({'success': True, 'lote_id': lote_id, 'estado_url': f"/api/v1/certificados/lote/{lote_id}"}), 202
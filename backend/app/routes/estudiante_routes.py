@@ -1,26 +1,75 @@
-from flask import Blueprint, jsonify
-from app.models import Estudiante
+import json
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from app.models import db, Estudiante
 
 estudiantes_bp = Blueprint('estudiantes_bp', __name__, url_prefix='/api/v1/estudiantes')
 
+# Columnas que se exponen en el listado (se consultan solo estas, sin hidratar objetos ORM)
+COLUMNAS_LISTADO = ('id', 'nombres', 'apellido_paterno', 'apellido_materno', 'dni', 'matricula')
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+# Filas que se traen por cada viaje a la base de datos en modo streaming
+TAMANO_LOTE_STREAMING = 1000
+
+
+def _consulta_proyectada():
+    columnas = [getattr(Estudiante, nombre) for nombre in COLUMNAS_LISTADO]
+    return db.session.query(*columnas).order_by(Estudiante.id)
+
+
+def _fila_a_dict(fila) -> dict:
+    return dict(zip(COLUMNAS_LISTADO, fila))
+
+
+def _entero(valor, por_defecto):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+
+
 @estudiantes_bp.route('/', methods=['GET'])
 def listar_estudiantes():
-    estudiantes = Estudiante.query.all()
-
-    lista = [
-        {
-            "id": e.id,
-            "nombres": e.nombres,
-            "apellido_paterno": e.apellido_paterno,
-            "apellido_materno": e.apellido_materno,
-            "dni": e.dni,
-            "matricula": e.matricula
-        }
-        for e in estudiantes
-    ]
+    """
+    Listado de estudiantes ordenado por id.
+      - Paginado (por defecto): ?limite=100&despues_de=<id>. Usa paginación por clave
+        (WHERE id > despues_de LIMIT n), así que cada página cuesta lo mismo sin
+        importar qué tan adelante esté. 'siguiente' es el valor de despues_de para la
+        próxima página, o null si no hay más.
+      - Streaming: ?formato=ndjson (o Accept: application/x-ndjson) devuelve un
+        estudiante JSON por línea, leyendo la tabla por lotes con yield_per.
+    """
+    if request.args.get('formato') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        return _listar_ndjson()
+
+    limite = min(max(_entero(request.args.get('limite'), LIMITE_POR_DEFECTO), 1), LIMITE_MAXIMO)
+    despues_de = _entero(request.args.get('despues_de'), None)
+
+    consulta = _consulta_proyectada()
+    if despues_de is not None:
+        consulta = consulta.filter(Estudiante.id > despues_de)
+    # Se pide una fila extra para saber si hay otra página sin hacer un COUNT
+    filas = consulta.limit(limite + 1).all()
+
+    hay_mas = len(filas) > limite
+    lista = [_fila_a_dict(fila) for fila in filas[:limite]]
 
     return jsonify({
         "success": True,
-        "estudiantes": lista
+        "estudiantes": lista,
+        "siguiente": lista[-1]['id'] if hay_mas else None
     }), 200
 
+
+def _listar_ndjson():
+    despues_de = _entero(request.args.get('despues_de'), None)
+
+    def generar():
+        consulta = _consulta_proyectada()
+        if despues_de is not None:
+            consulta = consulta.filter(Estudiante.id > despues_de)
+        for fila in consulta.yield_per(TAMANO_LOTE_STREAMING):
+            yield json.dumps(_fila_a_dict(fila), ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
@@ -0,0 +1,196 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from flask import current_app
+from app.models import db
+from app.models.certificado import Certificado
+from app.utils.hashing import hashear_archivos
+
+
+def _h(*partes) -> str:
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(str(parte).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def _clave_stat(ruta: str | None) -> str:
+    if not ruta:
+        return 'ausente'
+    try:
+        info = os.stat(ruta)
+    except OSError:
+        return 'ausente'
+    return f"{info.st_size}:{info.st_mtime_ns}:{info.st_ino}"
+
+
+class AuditoriaService:
+    """
+    Auditoría de integridad de todo el archivo de certificados.
+
+    Los certificados se reparten en 256 cubetas según los dos primeros caracteres del
+    SHA256 de su codigo_unico. Cada hoja del árbol de Merkle es
+    H(codigo_unico, hash_firma, ruta, stat del archivo); cada cubeta es el hash de sus
+    hojas ordenadas y la raíz es el hash de las 256 cubetas.
+
+    El manifiesto de la última auditoría se guarda en CERTIFICADOS_FOLDER/auditoria.
+    En la siguiente auditoría solo se vuelven a leer los archivos de las cubetas cuyo
+    hash cambió (o que no estaban limpias); el resto se da por verificado.
+    """
+
+    NUM_CUBETAS = 256
+    TAMANO_LOTE_DB = 1000
+
+    @staticmethod
+    def _ruta_manifiesto() -> str:
+        return os.path.join(current_app.config['CERTIFICADOS_FOLDER'], 'auditoria', 'manifiesto.json')
+
+    @staticmethod
+    def _leer_manifiesto() -> dict | None:
+        try:
+            with open(AuditoriaService._ruta_manifiesto(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _guardar_manifiesto(manifiesto: dict):
+        ruta = AuditoriaService._ruta_manifiesto()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, indent=1)
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def _cubeta(codigo_unico: str) -> str:
+        return hashlib.sha256(str(codigo_unico).encode('utf-8')).hexdigest()[:2]
+
+    @staticmethod
+    def _recorrer_certificados():
+        """
+        Genera (cubeta, codigo_unico, hash_firma, ruta_archivo) en streaming (yield_per),
+        proyectando solo las columnas necesarias y sin acumular las filas. El orden por
+        codigo_unico deja las hojas de cada cubeta ya ordenadas.
+        """
+        consulta = db.session.query(
+            Certificado.codigo_unico, Certificado.hash_firma, Certificado.ruta_archivo
+        ).order_by(Certificado.codigo_unico).yield_per(AuditoriaService.TAMANO_LOTE_DB)
+
+        for codigo_unico, hash_firma, ruta_archivo in consulta:
+            yield AuditoriaService._cubeta(codigo_unico), codigo_unico, hash_firma, ruta_archivo
+
+    @staticmethod
+    def _pdfs_en_carpeta() -> dict:
+        """{ruta normalizada: ruta} de los PDFs en la carpeta de certificados."""
+        carpeta = current_app.config['CERTIFICADOS_FOLDER']
+        if not os.path.isdir(carpeta):
+            return {}
+        return {
+            os.path.normcase(os.path.abspath(entrada.path)): entrada.path
+            for entrada in os.scandir(carpeta)
+            if entrada.is_file() and entrada.name.endswith('.pdf')
+        }
+
+    @staticmethod
+    def auditar(completo: bool = False, max_workers: int | None = None, progreso=None) -> dict:
+        """
+        Ejecuta la auditoría y retorna el reporte:
+          {raiz, total, cubetas_revisadas, archivos_leidos, faltantes, alterados, huerfanos}
+        Con completo=True se ignora el manifiesto anterior y se leen todos los archivos.
+        `progreso(mensaje)` recibe avisos de cada fase.
+        """
+        inicio = datetime.utcnow()
+        anterior = None if completo else AuditoriaService._leer_manifiesto()
+        cubetas_previas = (anterior or {}).get('cubetas', {})
+
+        # 1. Árbol de Merkle con los datos de la DB y el stat de cada archivo, a medida
+        #    que llegan las filas: cada cubeta es un SHA256 incremental de sus hojas
+        #    (igual a _h(*hojas)). De paso, los PDFs registrados salen de los candidatos
+        #    a huérfanos.
+        hashers = {}
+        sin_registro = AuditoriaService._pdfs_en_carpeta()
+        total = 0
+        for cubeta, codigo, firma, ruta in AuditoriaService._recorrer_certificados():
+            hasher = hashers.get(cubeta)
+            if hasher is None:
+                hasher = hashers[cubeta] = hashlib.sha256()
+            hasher.update(_h(codigo, firma, ruta, _clave_stat(ruta)).encode('utf-8'))
+            hasher.update(b'\x00')
+            if ruta:
+                sin_registro.pop(os.path.normcase(os.path.abspath(ruta)), None)
+            total += 1
+        hashes_cubetas = {cubeta: hasher.hexdigest() for cubeta, hasher in hashers.items()}
+        raiz = _h(*(hashes_cubetas.get(f"{i:02x}", '') for i in range(AuditoriaService.NUM_CUBETAS)))
+        if progreso:
+            progreso(f"{total} certificados leídos de la base de datos")
+
+        # 2. Solo se revisan las cubetas que cambiaron o que tenían problemas
+        por_revisar = {
+            cubeta for cubeta, hash_cubeta in hashes_cubetas.items()
+            if cubetas_previas.get(cubeta, {}).get('hash') != hash_cubeta
+            or not cubetas_previas.get(cubeta, {}).get('limpia')
+        }
+        if progreso:
+            progreso(f"{len(por_revisar)} de {len(hashes_cubetas)} cubetas por revisar")
+
+        # Segunda pasada, solo si hay algo que revisar: se guardan únicamente las filas
+        # de esas cubetas (en una auditoría sin cambios la tabla se lee una sola vez)
+        faltantes, alterados = [], []
+        problemas_por_cubeta = {}
+        a_leer = {}
+        if por_revisar:
+            for cubeta, codigo, firma, ruta in AuditoriaService._recorrer_certificados():
+                if cubeta not in por_revisar:
+                    continue
+                if _clave_stat(ruta) == 'ausente':
+                    faltantes.append(codigo)
+                    problemas_por_cubeta[cubeta] = True
+                else:
+                    a_leer[ruta] = (cubeta, codigo, firma)
+
+        # 3. Hash en paralelo de los archivos de las cubetas a revisar
+        hashes = hashear_archivos(
+            a_leer.keys(),
+            max_workers=max_workers,
+            estrategia=current_app.config.get('HASH_ESTRATEGIA', 'auto'),
+        )
+        for ruta, digest in hashes.items():
+            cubeta, codigo, firma = a_leer[ruta]
+            if digest is None:
+                faltantes.append(codigo)
+                problemas_por_cubeta[cubeta] = True
+            elif digest != firma:
+                alterados.append(codigo)
+                problemas_por_cubeta[cubeta] = True
+        if progreso:
+            progreso(f"{len(hashes)} archivos leídos")
+
+        # 4. Archivos huérfanos: los PDFs de la carpeta que ninguna fila reclamó
+        huerfanos = sorted(sin_registro.values())
+
+        # Las cubetas que no se revisaron conservan su estado (estaban limpias)
+        AuditoriaService._guardar_manifiesto({
+            'fecha': inicio.isoformat(),
+            'raiz': raiz,
+            'total': total,
+            'cubetas': {
+                cubeta: {'hash': hash_cubeta, 'limpia': not problemas_por_cubeta.get(cubeta, False)}
+                for cubeta, hash_cubeta in hashes_cubetas.items()
+            },
+        })
+
+        return {
+            'fecha': inicio.isoformat(),
+            'raiz': raiz,
+            'raiz_anterior': (anterior or {}).get('raiz'),
+            'total': total,
+            'cubetas_revisadas': len(por_revisar),
+            'archivos_leidos': len(hashes),
+            'faltantes': sorted(faltantes),
+            'alterados': sorted(alterados),
+            'huerfanos': huerfanos,
+            'duracion_segundos': round((datetime.utcnow() - inicio).total_seconds(), 3),
+        }
@@ -1,12 +1,64 @@
 from datetime import datetime, timedelta
 import jwt
-from flask import current_app, request, jsonify 
+from flask import current_app, request, jsonify, g
 from functools import wraps 
 from app.models import db
 from app.models.usuario import Usuario
-import pyotp
-import qrcode
-import os
+from app.services.mfa_service import MotorTOTP
+from app.services.password_service import ServicioSaturado
+from app.services.qr_service import renderizar_qr, a_data_uri
+from app.services.rate_limit_service import LimitadorLogin
+from app.utils.cache_ttl import CacheTTL
+
+
+class UsuarioAutenticado:
+    """
+    Proyección del usuario autenticado que se guarda en caché (sin hash de contraseña
+    ni secreto MFA). Cualquier otro atributo o método (check_password, mfa_secret, ...)
+    carga el Usuario de la base de datos la primera vez que se usa y se delega en él,
+    así que las rutas lo pueden seguir usando como una instancia de Usuario.
+    """
+
+    CAMPOS = ('id', 'username', 'email', 'rol', 'is_active', 'mfa_enabled')
+
+    def __init__(self, datos: dict):
+        object.__setattr__(self, '_datos', datos)
+        object.__setattr__(self, '_modelo', None)
+
+    @staticmethod
+    def proyectar(usuario: Usuario) -> dict:
+        return {campo: getattr(usuario, campo) for campo in UsuarioAutenticado.CAMPOS}
+
+    @property
+    def modelo(self) -> Usuario:
+        if self._modelo is None:
+            object.__setattr__(self, '_modelo', Usuario.query.get(self._datos['id']))
+        return self._modelo
+
+    def __getattr__(self, nombre):
+        # Una vez cargado el modelo, sus valores (posiblemente modificados) tienen prioridad
+        if self._modelo is None and nombre in self._datos:
+            return self._datos[nombre]
+        return getattr(self.modelo, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self.modelo, nombre, valor)
+
+    def to_dict(self, include_mfa_status=False):
+        if self._modelo is not None:
+            return self._modelo.to_dict(include_mfa_status=include_mfa_status)
+        data = {
+            "id": self._datos['id'],
+            "username": self._datos['username'],
+            "email": self._datos['email'],
+            "rol": self._datos['rol']
+        }
+        if include_mfa_status:
+            data["mfa_enabled"] = self._datos['mfa_enabled']
+        return data
+
+    def __repr__(self):
+        return f"<UsuarioAutenticado {self._datos['username']}>"
 
 class AuthService:
     """Servicio para manejar autenticación y autorización"""
@@ -80,19 +132,31 @@ class AuthService:
             
             return True, "Usuario registrado exitosamente", nuevo_usuario
         
+        except ServicioSaturado:
+            db.session.rollback()
+            raise
+        
         except Exception as e:
             db.session.rollback()
             return False, f"Error al registrar usuario: {str(e)}", None
     
     @staticmethod
-    def login(username, password):
+    def login(username, password, ip=None):
         """
         Autentica un usuario con username y password, e inicia el flujo MFA si está activo.
+        Los intentos fallidos se cuentan en memoria (LimitadorLogin); la base de datos
+        solo se escribe cuando el bloqueo se activa o hay algo que limpiar/rehashear.
         Retorna: (success: bool, message: str, token: str, user: dict)
         """
+        limitador = LimitadorLogin.desde_app(current_app)
+        if not limitador.ip_permitida(ip):
+            minutos = limitador.ventana // 60
+            return False, f"Demasiados intentos desde esta dirección. Intente en {minutos} minutos", None, None
+        
         usuario = Usuario.query.filter_by(username=username).first()
         
         if not usuario:
+            limitador.registrar_fallo(username, ip)
             return False, "Usuario o contraseña incorrectos", None, None
         
         if not usuario.is_active:
@@ -103,18 +167,31 @@ class AuthService:
             return False, f"Cuenta bloqueada. Intente en {tiempo_restante} minutos", None, None
         
         if not usuario.check_password(password):
-            usuario.increment_login_attempts()
-            db.session.commit()
+            fallos = limitador.registrar_fallo(username, ip)
             
-            intentos_restantes = 5 - usuario.login_attempts
+            intentos_restantes = limitador.max_intentos_usuario - fallos
             if intentos_restantes > 0:
                 return False, f"Contraseña incorrecta. {intentos_restantes} intentos restantes", None, None
-            else:
-                return False, "Cuenta bloqueada por múltiples intentos fallidos", None, None
+            
+            # Solo se escribe en la DB cuando el bloqueo se activa
+            usuario.lock_account(fallos, current_app.config.get('LOGIN_BLOQUEO_MINUTOS', 15))
+            db.session.commit()
+            limitador.registrar_bloqueo(username)
+            AuthService.invalidar_usuario(usuario.id)
+            return False, "Cuenta bloqueada por múltiples intentos fallidos", None, None
         
-        # Login exitoso - resetear intentos
-        usuario.reset_login_attempts()
-        db.session.commit()
+        # Login exitoso - resetear intentos (solo si hay algo que resetear)
+        limitador.registrar_exito(username)
+        cambios = False
+        if usuario.login_attempts or usuario.locked_until:
+            usuario.reset_login_attempts()
+            cambios = True
+        # Si el hash es de otro algoritmo o factor de trabajo, se regenera con el actual
+        if usuario.password_necesita_rehash():
+            usuario.set_password(password)
+            cambios = True
+        if cambios:
+            db.session.commit()
         
         # LÓGICA DE FLUJO MFA
         if usuario.mfa_enabled:
@@ -127,18 +204,42 @@ class AuthService:
             return True, "Login exitoso", access_token, usuario.to_dict(include_mfa_status=True)
 
     
+    @staticmethod
+    def _cache_tokens() -> CacheTTL:
+        return CacheTTL.desde_app(
+            current_app, 'cache_tokens',
+            max_entradas=current_app.config.get('AUTH_CACHE_TOKENS_MAX_ENTRADAS', 10000),
+            ttl=current_app.config.get('AUTH_CACHE_TOKENS_TTL', 300),
+        )
+
+    @staticmethod
+    def _cache_usuarios() -> CacheTTL:
+        return CacheTTL.desde_app(
+            current_app, 'cache_usuarios',
+            max_entradas=current_app.config.get('AUTH_CACHE_USUARIOS_MAX_ENTRADAS', 10000),
+            ttl=current_app.config.get('AUTH_CACHE_USUARIOS_TTL', 30),
+        )
+
     @staticmethod
     def verificar_token(token):
         """
         Verifica y decodifica un token JWT.
+        Los tokens ya verificados se guardan en caché hasta su 'exp' (o el TTL de la caché),
+        así que un token repetido no vuelve a verificar la firma.
         Retorna: (valid: bool, payload: dict)
         """
+        cache = AuthService._cache_tokens()
+        payload = cache.obtener(token)
+        if payload is not None:
+            return True, payload
+
         try:
             payload = jwt.decode(
                 token,
                 current_app.config['JWT_SECRET_KEY'],
                 algorithms=['HS256']
             )
+            cache.guardar(token, payload, expira_en=payload.get('exp'))
             return True, payload
         
         except jwt.ExpiredSignatureError:
@@ -151,6 +252,61 @@ class AuthService:
     def obtener_usuario_por_id(user_id):
         """Obtiene un usuario por su ID"""
         return Usuario.query.get(user_id)
+
+    @staticmethod
+    def obtener_usuario_autenticado(user_id):
+        """
+        Devuelve un UsuarioAutenticado desde la caché de proyecciones (TTL corto);
+        solo consulta la base de datos si no está en caché.
+        """
+        cache = AuthService._cache_usuarios()
+        datos = cache.obtener(user_id)
+        if datos is None:
+            usuario = Usuario.query.get(user_id)
+            if not usuario:
+                return None
+            datos = UsuarioAutenticado.proyectar(usuario)
+            cache.guardar(user_id, datos)
+        return UsuarioAutenticado(datos)
+
+    @staticmethod
+    def invalidar_usuario(user_id):
+        """
+        Descarta la proyección en caché del usuario. Debe llamarse al cambiar su
+        contraseña, rol, estado MFA, bloqueo o al desactivarlo.
+        """
+        AuthService._cache_usuarios().invalidar(user_id)
+
+    @staticmethod
+    def extraer_token():
+        """Token del header 'Authorization: Bearer <token>' o None."""
+        partes = request.headers.get('Authorization', '').split(" ")
+        return partes[1] if len(partes) > 1 and partes[1] else None
+
+    @staticmethod
+    def contexto_request() -> dict:
+        """
+        Contexto de autenticación de la petición actual: el token se decodifica una
+        sola vez por request y se comparte entre decoradores apilados
+        (token_requerido, mfa_requerido, rol_requerido).
+        Retorna {'token', 'valido', 'payload'}; el usuario se carga con usuario_de_request().
+        """
+        contexto = g.get('auth')
+        if contexto is None:
+            token = AuthService.extraer_token()
+            valido, payload = AuthService.verificar_token(token) if token else (False, {})
+            contexto = {'token': token, 'valido': valido, 'payload': payload}
+            g.auth = contexto
+        return contexto
+
+    @staticmethod
+    def usuario_de_request():
+        """Usuario del token de la petición actual (se resuelve una sola vez por request)."""
+        contexto = AuthService.contexto_request()
+        if 'usuario' not in contexto:
+            user_id = contexto['payload'].get('user_id') if contexto['valido'] else None
+            contexto['usuario'] = AuthService.obtener_usuario_autenticado(user_id) if user_id else None
+        return contexto['usuario']
     
     @staticmethod
     def cambiar_password(usuario, password_actual, password_nueva):
@@ -167,8 +323,13 @@ class AuthService:
         try:
             usuario.set_password(password_nueva)
             db.session.commit()
+            AuthService.invalidar_usuario(usuario.id)
             return True, "Contraseña cambiada exitosamente"
         
+        except ServicioSaturado:
+            db.session.rollback()
+            raise
+        
         except Exception as e:
             db.session.rollback()
             return False, f"Error al cambiar contraseña: {str(e)}"
@@ -176,18 +337,20 @@ class AuthService:
     @staticmethod
     def generar_mfa_setup(usuario):
         """
-        Genera el secreto TOTP, lo guarda en el usuario y devuelve el URL 
-        para el código QR.
+        Genera el secreto TOTP, lo guarda en el usuario y devuelve el código QR
+        como data URI (PNG en base64), utilizable directamente como src de una imagen.
         Retorna: (success: bool, message: str, qrcode_url: str)
         """
         if usuario.mfa_enabled:
             return False, "La autenticación multifactor ya está activada.", None
         
+        import pyotp
         secreto = pyotp.random_base32()
         
         # Guardar el secreto TEMPORALMENTE en el usuario
         usuario.mfa_secret = secreto
         db.session.commit()
+        MotorTOTP.desde_app(current_app).olvidar(usuario.id)
         
         # Generar URL de aprovisionamiento (otpauth://...)
         app_name = "SistemaCertificados" 
@@ -196,22 +359,16 @@ class AuthService:
             issuer_name=app_name
         )
         
-        # Generar y guardar el código QR como imagen
+        # El QR va en la propia respuesta: no se guarda en disco ni en la memoria
+        # de un worker (cualquier worker puede atender la petición siguiente)
         try:
-            qr_filename = f"{usuario.username}_mfa_setup.png"
-            qr_path = os.path.join(current_app.config['QR_CODES_FOLDER'], qr_filename)
-            
-            img = qrcode.make(otp_uri)
-            img.save(qr_path)
-            
-            base_url = current_app.config['BASE_URL']
-            qrcode_url = f"{base_url}/static/qrcodes/{qr_filename}"
+            qrcode_url = a_data_uri(renderizar_qr(otp_uri, 'png'))
             
             return True, "Secreto MFA generado. Escanee el código QR y verifique.", qrcode_url
             
         except Exception as e:
             db.session.rollback()
-            return False, f"Error al generar QR. Revise la configuración de la carpeta: {str(e)}", None
+            return False, f"Error al generar QR: {str(e)}", None
 
     @staticmethod
     def verificar_y_activar_mfa(usuario, codigo_totp):
@@ -225,12 +382,13 @@ class AuthService:
         if not usuario.mfa_secret:
             return False, "El secreto MFA no ha sido generado. Ejecute /mfa/setup primero."
 
-        totp = pyotp.TOTP(usuario.mfa_secret)
+        motor = MotorTOTP.desde_app(current_app)
 
-        if totp.verify(codigo_totp):
+        if motor.verificar(usuario.id, usuario.mfa_secret, codigo_totp):
             # Código Válido: Activar la MFA permanentemente
             usuario.mfa_enabled = True
             db.session.commit()
+            AuthService.invalidar_usuario(usuario.id)
             return True, "Autenticación multifactor activada exitosamente."
         else:
             # Código Inválido
@@ -248,9 +406,10 @@ class AuthService:
         if not usuario.mfa_secret:
             return False, "Error interno: Secreto MFA no encontrado.", None
 
-        totp = pyotp.TOTP(usuario.mfa_secret)
+        motor = MotorTOTP.desde_app(current_app)
         
-        if totp.verify(codigo_totp):
+        # Un código ya usado dentro de su ventana se rechaza (protección contra repetición)
+        if motor.verificar(usuario.id, usuario.mfa_secret, codigo_totp):
             # Código válido: generar el token JWT de acceso final
             access_token = AuthService.generar_token(usuario)
             return True, "Verificación MFA exitosa.", access_token
@@ -263,39 +422,27 @@ def token_requerido(f):
     Decorador para proteger rutas, asegurando que el request contenga
     un token JWT válido en el header 'Authorization'.
     
-    Pasa el objeto `usuario_actual` (instancia de app.models.Usuario) a la ruta.
+    Pasa el objeto `usuario_actual` (UsuarioAutenticado, se comporta como app.models.Usuario) a la ruta.
     """
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        #Obtener el token del header Authorization
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                # El formato es "Bearer <token>"
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                # Si no tiene el formato correcto, ignorar
-                pass
-        
-        if not token:
-            return jsonify({'success': False, 'message': 'Token de autenticación es requerido.'}), 401
+        #Decodificar el token una sola vez por request (compartido con otros decoradores)
+        contexto = AuthService.contexto_request()
 
-        #Verificar y decodificar el token
-        valid, payload = AuthService.verificar_token(token)
+        if not contexto['token']:
+            return jsonify({'success': False, 'message': 'Token de autenticación es requerido.'}), 401
 
-        if not valid:
+        if not contexto['valido']:
             # El mensaje de error (expirado, inválido) ya viene en el payload
-            error_message = payload.get('error', 'Token inválido o expirado')
+            error_message = contexto['payload'].get('error', 'Token inválido o expirado')
             return jsonify({'success': False, 'message': error_message}), 401
 
         #Validar el tipo de token (debe ser 'access' para acceder a rutas protegidas)
-        if payload.get('type') != 'access':
+        if contexto['payload'].get('type') != 'access':
              return jsonify({'success': False, 'message': 'Token incorrecto. Se requiere un token de acceso.'}), 401
 
-        #Encontrar el usuario en la base de datos
-        user_id = payload.get('user_id')
-        usuario_actual = AuthService.obtener_usuario_por_id(user_id)
+        #Encontrar el usuario (caché de proyecciones; la DB solo se consulta si no está)
+        usuario_actual = AuthService.usuario_de_request()
         
         if not usuario_actual:
             return jsonify({'success': False, 'message': 'Usuario asociado al token no encontrado.'}), 401
@@ -306,4 +453,4 @@ def token_requerido(f):
         #Pasar el objeto usuario a la función decorada
         return f(usuario_actual, *args, **kwargs)
 
-    return decorated
\ No newline at end of file
+    return decorated
@@ -1,17 +1,23 @@
 import os
 import uuid
 import hashlib
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from flask import current_app, request
+from sqlalchemy import text
 from datetime import datetime
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import Paragraph
 from app.models import db
 from app.models.certificado import Certificado
 from app.models.estudiante import Estudiante 
 from app.models.log_verificacion import LogVerificacion 
+from app.models.revocacion import Revocacion
+from app.services.resolucion_codigo_service import ResolvedorCodigos
+from app.services.token_certificado_service import TokenCertificados
+from app.services.revocacion_service import RegistroRevocaciones
+from app.utils.cache_integridad import CacheHashArchivos
+from app.utils.base_datos import sesion_lectura, en_bloques
+from app.utils.almacenamiento import escribir_atomico
+from app.utils.hashing import calcular_hash_archivo, TAMANO_BLOQUE
 
 class CertificadoService:
     """Servicio para generar, guardar y gestionar los certificados PDF."""
@@ -22,12 +28,11 @@ class CertificadoService:
         Calcula el hash SHA256 de un archivo para usarlo como firma digital.
         """
         try:
-            hash_sha256 = hashlib.sha256()
-            with open(filepath, 'rb') as f:
-                # Lee el archivo en bloques para manejar archivos grandes
-                for chunk in iter(lambda: f.read(4096), b''):
-                    hash_sha256.update(chunk)
-            return hash_sha256.hexdigest()
+            return calcular_hash_archivo(
+                filepath,
+                estrategia=current_app.config.get('HASH_ESTRATEGIA', 'auto'),
+                tamano_bloque=current_app.config.get('HASH_TAMANO_BLOQUE', TAMANO_BLOQUE),
+            )
         except FileNotFoundError:
             current_app.logger.error(f"Archivo no encontrado: {filepath}")
             return None
@@ -74,67 +79,43 @@ class CertificadoService:
             return False, f"Error de configuración de carpeta: {str(e)}", codigo_unico, None
 
 
-        # 3. GENERACIÓN DEL PDF con ReportLab
+        # 3. GENERACIÓN DEL PDF en memoria con la plantilla compilada (ReportLab)
         try:
-            c = canvas.Canvas(filepath, pagesize=letter)
-            width, height = letter
-
-            styles = getSampleStyleSheet()
-            style_title = ParagraphStyle(
-                'TitleStyle', parent=styles['Title'], fontSize=24, textColor=colors.darkblue, alignment=1, spaceAfter=20
-            )
-            style_body = ParagraphStyle(
-                'BodyStyle', parent=styles['Normal'], fontSize=14, textColor=colors.black, alignment=1, leading=20
-            )
-
-            # --- Contenido del Certificado ---
-            title = Paragraph(f"CERTIFICADO DE FINALIZACIÓN", style_title)
-            title.wrapOn(c, width - 100, height)
-            title.drawOn(c, 50, height - 80)
-            
-            text_lines = [
-                f"La institución educativa certifica que:",
-                "",
-                # CORRECCIÓN CLAVE: Usar la propiedad nombre_completo
-                f"<font size=20 color=red>{estudiante.nombre_completo}</font>", 
-                f"con matrícula: <b>{estudiante.matricula}</b>",
-                "",
-                f"ha completado satisfactoriamente el programa de:",
-                f"<b>{titulo_certificado}</b>",
-                "",
-                f"Emitido el {fecha_emision.strftime('%d/%m/%Y')} en conformidad con los estándares educativos.",
-                "",
-                f"Código Único de Verificación:",
-                f"<font size=12 color=gray>{codigo_unico}</font>",
-            ]
-            
-            y_position = height - 150
-            for line in text_lines:
-                p = Paragraph(line, style_body)
-                p.wrapOn(c, width - 100, height)
-                p.drawOn(c, 50, y_position)
-                y_position -= p.height + 5
-
-            c.line(width/4, 150, 3*width/4, 150)
-            c.drawString(width/2 - 50, 135, "Firma del Director/Autoridad")
-
-            c.save()
+            from app.pdf_generator import generar_certificado_registro
+            pdf_bytes = generar_certificado_registro({
+                'nombre_completo': estudiante.nombre_completo,
+                'matricula': estudiante.matricula,
+                'titulo': titulo_certificado,
+                'fecha_emision': fecha_emision.strftime('%d/%m/%Y'),
+                'codigo_unico': codigo_unico,
+                # Token firmado (texto al pie y QR) para verificar sin consultar la base de datos
+                **TokenCertificados.desde_app(current_app).datos_pdf(
+                    current_app.config['BASE_URL'], codigo_unico, estudiante.nombre_completo,
+                    estudiante.matricula, titulo_certificado, fecha_emision
+                ),
+            })
 
         except Exception as e:
             # CORRECCIÓN 4: Devolver 4 valores
             return False, f"Error ReportLab al generar PDF: {str(e)}", codigo_unico, None
 
 
-        # 4. CALCULAR HASH (Firma Digital)
-        pdf_hash = CertificadoService._calcular_hash_archivo(filepath)
-        if not pdf_hash:
+        # 4. CALCULAR HASH (Firma Digital) sobre los mismos bytes, sin releer el archivo,
+        #    y escribirlo de forma atómica (temporal + fsync + rename). Si el proceso cae
+        #    antes del commit, el PDF queda sin registro y lo limpia el reconciliador.
+        pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+        try:
+            escribir_atomico(filepath, pdf_bytes, sincronizar=current_app.config.get('CERTIFICADOS_FSYNC', True))
+        except OSError as e:
             # CORRECCIÓN 5: Devolver 4 valores
-            return False, "Error al calcular el hash del certificado.", codigo_unico, None
+            return False, f"Error al guardar el PDF del certificado: {str(e)}", codigo_unico, None
+        CacheHashArchivos.desde_app(current_app).registrar(filepath, pdf_hash)
         
         # 5. Guardar la metadata en la Base de Datos
         try:
             nuevo_certificado = Certificado(
                 estudiante_id=estudiante_id,
+                codigo=codigo_unico,
                 codigo_unico=codigo_unico,
                 hash_firma=pdf_hash,
                 fecha_emision=fecha_emision,
@@ -143,6 +124,7 @@ class CertificadoService:
             )
             db.session.add(nuevo_certificado)
             db.session.commit()
+            ResolvedorCodigos.desde_app(current_app).invalidar(codigo_unico)
             
             # URL pública para que el cliente pueda descargarlo
             base_url = current_app.config.get('BASE_URL', 'http://localhost:5000')
@@ -159,6 +141,44 @@ class CertificadoService:
             # CORRECCIÓN 7: Devolver 4 valores
             return False, f"Error DB al registrar certificado: {str(e)}", codigo_unico, None
 
+    @staticmethod
+    def revocar_certificado(codigo_unico: str) -> tuple[bool, str]:
+        """
+        Marca el certificado como 'Revocado'. Las verificaciones posteriores lo rechazan.
+        Retorna: (success, message)
+        """
+        certificado = Certificado.query.filter_by(codigo_unico=codigo_unico).first()
+        if not certificado:
+            return False, "Código de certificado no encontrado o inválido."
+        if certificado.estado == 'Revocado':
+            return False, "El certificado ya estaba revocado."
+
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                # La versión sale de la secuencia al insertar, pero se hace visible al hacer
+                # commit: dos revocaciones concurrentes podrían confirmarse en otro orden y
+                # un verificador que ya leyó la mayor se saltaría la menor. El lock (hasta el
+                # commit, no bloquea lecturas) confirma las versiones en orden. En SQLite las
+                # escrituras ya se serializan.
+                db.session.execute(text('LOCK TABLE revocaciones IN SHARE ROW EXCLUSIVE MODE'))
+            certificado.estado = 'Revocado'
+            # Misma transacción: la fila del log de revocaciones recibe la siguiente versión
+            db.session.add(Revocacion(codigo_unico=codigo_unico))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return False, f"Error DB al revocar certificado: {str(e)}"
+
+        ResolvedorCodigos.desde_app(current_app).invalidar(certificado.codigo, codigo_unico)
+        RegistroRevocaciones.desde_app(current_app).registrar_local(codigo_unico)
+        return True, "Certificado revocado exitosamente."
+
+    # Columnas que necesita la respuesta de verificación
+    COLUMNAS_VERIFICACION = (
+        Certificado.id, Certificado.codigo_unico, Certificado.titulo, Certificado.fecha_emision,
+        Certificado.hash_firma, Certificado.ruta_archivo, Certificado.estado, Estudiante.nombre_completo,
+    )
+
     @staticmethod
     def verificar_integridad(codigo_unico: str) -> tuple[bool, str, dict | None]:
         """
@@ -166,54 +186,201 @@ class CertificadoService:
         Busca el certificado por código, recalcula el hash del archivo y 
         lo compara con la firma digital almacenada.
         """
-        certificado = Certificado.query.filter_by(codigo_unico=codigo_unico).first()
+        # Una sola consulta (certificado + nombre del estudiante, solo las columnas de la
+        # respuesta) por el motor de solo lectura: no compite con las escrituras
+        with sesion_lectura(db) as sesion:
+            certificado = sesion.query(*CertificadoService.COLUMNAS_VERIFICACION).outerjoin(
+                Estudiante, Estudiante.id == Certificado.estudiante_id
+            ).filter(Certificado.codigo_unico == codigo_unico).first()
 
         if not certificado:
             # Registrar intento fallido
             LogVerificacion.registrar(codigo_unico=codigo_unico, es_valido=False, notas="Código no encontrado")
             return False, "Código de certificado no encontrado o inválido.", None
 
+        hash_actual = None
         try:
-            # 1. Recalcular el hash del archivo almacenado (Verificación de Integridad)
-            hash_actual = CertificadoService._calcular_hash_archivo(certificado.ruta_archivo)
-            
-            # 2. Verificar la integridad y el estado
-            integridad_valida = hash_actual == certificado.hash_firma
-            estado_valido = certificado.estado == 'Válido'
+            # 1. Recalcular el hash del archivo almacenado (Verificación de Integridad).
+            #    Solo se vuelve a leer el archivo si su stat cambió desde el último cálculo.
+            #    Los certificados anteriores al registro de archivos no tienen ruta.
+            if certificado.ruta_archivo:
+                hash_actual = CacheHashArchivos.desde_app(current_app).obtener_hash(
+                    certificado.ruta_archivo, CertificadoService._calcular_hash_archivo
+                )
+        except Exception as e:
+            hash_actual = e
 
-            es_valido_final = integridad_valida and estado_valido
-            
-            # 3. Registrar la verificación
-            LogVerificacion.registrar(
-                codigo_unico=codigo_unico, 
-                es_valido=es_valido_final, 
-                notas=f"Integridad: {integridad_valida}. Estado: {certificado.estado}",
-                # certificado_id=certificado.id # Asumiendo que LogVerificacion tiene un FK
-            )
-            
-            if not integridad_valida:
-                 return False, "La integridad del documento ha sido comprometida (Hash no coincide).", None
-            
-            if not estado_valido:
-                return False, f"Certificado encontrado, pero su estado es: {certificado.estado}.", None
-
-            # Éxito:
-            data = {
-                # CORRECCIÓN CLAVE: Usar la propiedad nombre_completo
-                "estudiante": certificado.estudiante.nombre_completo,
-                "titulo": certificado.titulo,
-                "emision": certificado.fecha_emision.strftime("%d/%m/%Y"),
-                "codigo_unico": certificado.codigo_unico,
-                "firma_digital_db": certificado.hash_firma[:15] + "...",
-                "estado": certificado.estado,
-                "url_descarga_publica": f"{current_app.config['BASE_URL']}/certificados/{os.path.basename(certificado.ruta_archivo)}"
+        # 2. Verificar la integridad y el estado, y 3. registrar la verificación
+        success, message, data, registro = CertificadoService._evaluar(codigo_unico, certificado, hash_actual)
+        LogVerificacion.registrar_lote([registro])
+        return success, message, data
+
+    @staticmethod
+    def _evaluar(codigo_unico: str, certificado, hash_actual) -> tuple[bool, str, dict | None, dict]:
+        """
+        Compara el hash recalculado (o la excepción al leer el archivo) con la firma y el
+        estado guardados. Retorna (success, message, data, registro para LogVerificacion).
+        """
+        if not certificado.ruta_archivo or not certificado.hash_firma:
+            # Filas anteriores al registro de archivos (rellenadas por migrar_esquema)
+            return False, "El certificado no tiene un archivo registrado: no se puede verificar su integridad.", None, \
+                LogVerificacion.nuevo_registro(codigo_unico, False, "Certificado sin archivo registrado.",
+                                               certificado_id=certificado.id)
+        if isinstance(hash_actual, FileNotFoundError):
+            return False, "Error interno: El archivo físico del certificado no se encuentra en el servidor.", None, \
+                LogVerificacion.nuevo_registro(codigo_unico, False, "Archivo PDF no encontrado en el servidor.")
+        if isinstance(hash_actual, Exception):
+            return False, f"Error inesperado durante la verificación: {str(hash_actual)}", None, \
+                LogVerificacion.nuevo_registro(codigo_unico, False, f"Error inesperado durante la verificación: {str(hash_actual)}")
+
+        integridad_valida = hash_actual == certificado.hash_firma
+        estado_valido = certificado.estado == 'Válido'
+        registro = LogVerificacion.nuevo_registro(
+            codigo_unico,
+            integridad_valida and estado_valido,
+            f"Integridad: {integridad_valida}. Estado: {certificado.estado}",
+            certificado_id=certificado.id,
+        )
+
+        if not integridad_valida:
+            return False, "La integridad del documento ha sido comprometida (Hash no coincide).", None, registro
+
+        if not estado_valido:
+            return False, f"Certificado encontrado, pero su estado es: {certificado.estado}.", None, registro
+
+        # Éxito:
+        data = {
+            # CORRECCIÓN CLAVE: Usar la propiedad nombre_completo
+            "estudiante": certificado.nombre_completo,
+            "titulo": certificado.titulo,
+            "emision": certificado.fecha_emision.strftime("%d/%m/%Y"),
+            "codigo_unico": certificado.codigo_unico,
+            "firma_digital_db": certificado.hash_firma[:15] + "...",
+            "estado": certificado.estado,
+            "url_descarga_publica": f"{current_app.config['BASE_URL']}/api/v1/certificados/archivo/{os.path.basename(certificado.ruta_archivo)}"
+        }
+        return True, "Certificado verificado. La integridad y el estado son válidos.", data, registro
+
+    @staticmethod
+    def verificar_lote(codigos: list):
+        """
+        Verificación de varios códigos a la vez. Genera (codigo_unico, success, message, data)
+        a medida que cada resultado está listo:
+          - una sola consulta IN (...) para todos los códigos (distintos);
+          - cada archivo se hashea una vez aunque lo compartan varios códigos, y los
+            hashes se calculan en paralelo (la caché de hashes evita releer los que no cambiaron);
+          - los registros de LogVerificacion se escriben juntos al final (un INSERT
+            multi-fila), también si el cliente corta la respuesta a mitad.
+        """
+        codigos = list(dict.fromkeys(codigos))
+        filas = {}
+        with sesion_lectura(db) as sesion:
+            for bloque in en_bloques(codigos):
+                for fila in sesion.query(*CertificadoService.COLUMNAS_VERIFICACION).outerjoin(
+                    Estudiante, Estudiante.id == Certificado.estudiante_id
+                ).filter(Certificado.codigo_unico.in_(bloque)):
+                    filas[fila.codigo_unico] = fila
+
+        registros = []
+        try:
+            por_ruta = {}
+            for codigo in codigos:
+                fila = filas.get(codigo)
+                if fila is None:
+                    registros.append(LogVerificacion.nuevo_registro(codigo, False, "Código no encontrado"))
+                    yield codigo, False, "Código de certificado no encontrado o inválido.", None
+                elif not fila.ruta_archivo:
+                    success, message, data, registro = CertificadoService._evaluar(codigo, fila, None)
+                    registros.append(registro)
+                    yield codigo, success, message, data
+                else:
+                    por_ruta.setdefault(fila.ruta_archivo, []).append(codigo)
+
+            for ruta, hash_actual in CertificadoService._hashear_concurrente(list(por_ruta)):
+                for codigo in por_ruta[ruta]:
+                    success, message, data, registro = CertificadoService._evaluar(codigo, filas[codigo], hash_actual)
+                    registros.append(registro)
+                    yield codigo, success, message, data
+        finally:
+            LogVerificacion.registrar_lote(registros)
+
+    @staticmethod
+    def _hashear_concurrente(rutas: list):
+        """
+        Genera (ruta, hash o excepción) en orden de terminación. Los hilos no usan el
+        contexto de la aplicación: la configuración del hash se fija antes de repartir.
+        """
+        cache = CacheHashArchivos.desde_app(current_app)
+        calcular = partial(
+            calcular_hash_archivo,
+            estrategia=current_app.config.get('HASH_ESTRATEGIA', 'auto'),
+            tamano_bloque=current_app.config.get('HASH_TAMANO_BLOQUE', TAMANO_BLOQUE),
+        )
+
+        def hashear(ruta):
+            try:
+                return ruta, cache.obtener_hash(ruta, calcular)
+            except Exception as e:
+                return ruta, e
+
+        workers = min(current_app.config.get('VERIFICACION_LOTE_WORKERS', 8), len(rutas))
+        if workers <= 1:
+            # Con un solo archivo, despachar a un hilo cuesta más que el stat() de la caché
+            for ruta in rutas:
+                yield hashear(ruta)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for futuro in as_completed([pool.submit(hashear, ruta) for ruta in rutas]):
+                yield futuro.result()
+
+    @staticmethod
+    def listar_recientes(limite: int = 20) -> list[dict]:
+        """
+        Últimos certificados emitidos con el nombre del estudiante: una sola consulta
+        con JOIN y solo las columnas del listado (sin cargar objetos ni relaciones).
+        """
+        with sesion_lectura(db) as sesion:
+            filas = sesion.query(
+                Certificado.codigo_unico, Certificado.codigo, Certificado.titulo,
+                Certificado.fecha_emision, Certificado.estado, Estudiante.nombre_completo
+            ).outerjoin(Estudiante, Estudiante.id == Certificado.estudiante_id).order_by(
+                Certificado.fecha_emision.desc(), Certificado.id.desc()
+            ).limit(limite).all()
+
+        return [
+            {
+                'codigo_unico': fila.codigo_unico or fila.codigo,
+                'estudiante': fila.nombre_completo,
+                'titulo': fila.titulo,
+                'emision': fila.fecha_emision.strftime("%d/%m/%Y") if fila.fecha_emision else None,
+                'estado': fila.estado,
             }
-            return True, "Certificado verificado. La integridad y el estado son válidos.", data
+            for fila in filas
+        ]
 
-        except FileNotFoundError:
-            LogVerificacion.registrar(codigo_unico=codigo_unico, es_valido=False, notas="Archivo PDF no encontrado en el servidor.")
-            return False, "Error interno: El archivo físico del certificado no se encuentra en el servidor.", None
-        
-        except Exception as e:
-            LogVerificacion.registrar(codigo_unico=codigo_unico, es_valido=False, notas=f"Error inesperado durante la verificación: {str(e)}")
-            return False, f"Error inesperado durante la verificación: {str(e)}", None
\ No newline at end of file
+    @staticmethod
+    def autorizar_archivo(filename: str) -> tuple[bool, str, dict | None]:
+        """
+        Autoriza la descarga pública de un PDF almacenado: el nombre debe ser el de un
+        certificado registrado y vigente. No lee el archivo (lo entrega la ruta o el proxy).
+        Retorna: (success, message, {ruta_archivo, hash_firma, fecha_emision})
+        """
+        if filename != os.path.basename(filename) or not filename.endswith('.pdf'):
+            return False, "Archivo no encontrado.", None
+
+        ruta = os.path.join(current_app.config['CERTIFICADOS_FOLDER'], filename)
+        with sesion_lectura(db) as sesion:
+            fila = sesion.query(
+                Certificado.ruta_archivo, Certificado.hash_firma, Certificado.fecha_emision, Certificado.estado
+            ).filter(Certificado.ruta_archivo == ruta).first()
+
+        if fila is None:
+            return False, "Archivo no encontrado.", None
+        if fila.estado != 'Válido':
+            return False, f"El certificado no está vigente (estado: {fila.estado}).", None
+        return True, "Autorizado.", {
+            'ruta_archivo': fila.ruta_archivo,
+            'hash_firma': fila.hash_firma,
+            'fecha_emision': fila.fecha_emision,
+        }
@@ -0,0 +1,316 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from flask import current_app
+from app.models import db
+from app.models.certificado import Certificado
+from app.models.estudiante import Estudiante
+from app.services.resolucion_codigo_service import ResolvedorCodigos
+from app.services.token_certificado_service import TokenCertificados
+from app.utils.almacenamiento import escribir_atomico
+from app.utils.base_datos import en_bloques
+
+
+# El pool se crea desde un hilo en segundo plano de un worker con varios hilos: fork()
+# copiaría locks tomados por otros hilos. forkserver (spawn donde no existe) arranca los
+# procesos desde un servidor limpio, que ya trae importado el generador de PDFs
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    _CONTEXTO_POOL = multiprocessing.get_context('forkserver')
+    _CONTEXTO_POOL.set_forkserver_preload(['app.pdf_generator'])
+else:
+    _CONTEXTO_POOL = multiprocessing.get_context('spawn')
+
+
+def _renderizar_certificado(tarea: dict) -> dict:
+    """
+    Trabajo ejecutado en los procesos del pool: genera el PDF, calcula su hash
+    sobre los bytes en memoria y lo escribe en disco de forma atómica. No usa la
+    base de datos.
+    """
+    from app.pdf_generator import generar_certificado_registro
+    pdf_bytes = generar_certificado_registro(tarea['datos'])
+    pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    escribir_atomico(tarea['ruta_archivo'], pdf_bytes, sincronizar=tarea.get('sincronizar', True))
+    return {
+        'estudiante_id': tarea['estudiante_id'],
+        'codigo_unico': tarea['datos']['codigo_unico'],
+        'ruta_archivo': tarea['ruta_archivo'],
+        'hash_firma': pdf_hash,
+        'fecha_emision': tarea['fecha_emision'],
+    }
+
+
+class EmisionLoteService:
+    """
+    Emisión masiva de certificados (p. ej. toda una promoción al graduarse).
+
+    Cada lote vive en CERTIFICADOS_FOLDER/lotes/<lote_id>/:
+      - lote.json: parámetros y estado del lote.
+      - progreso.jsonl: una línea por PDF ya generado (código, ruta y hash).
+    Si el proceso se cae a mitad de camino, al reanudar solo se generan los
+    estudiantes que no aparecen en progreso.jsonl. Los registros Certificado se
+    insertan todos juntos en una sola transacción al final.
+    """
+
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_EN_PROCESO = 'en_proceso'
+    ESTADO_COMPLETADO = 'completado'
+    ESTADO_ERROR = 'error'
+
+    # Lotes que se están ejecutando en este proceso
+    _en_ejecucion = set()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _carpeta_lote(lote_id: str) -> str:
+        return os.path.join(current_app.config['CERTIFICADOS_FOLDER'], 'lotes', lote_id)
+
+    @staticmethod
+    def _leer_lote(lote_id: str) -> dict | None:
+        ruta = os.path.join(EmisionLoteService._carpeta_lote(lote_id), 'lote.json')
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _guardar_lote(lote: dict):
+        carpeta = EmisionLoteService._carpeta_lote(lote['lote_id'])
+        ruta = os.path.join(carpeta, 'lote.json')
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(lote, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def _leer_progreso(lote_id: str) -> dict:
+        """Retorna {estudiante_id: registro} de los PDFs ya generados en este lote."""
+        ruta = os.path.join(EmisionLoteService._carpeta_lote(lote_id), 'progreso.jsonl')
+        hechos = {}
+        if not os.path.exists(ruta):
+            return hechos
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    # Última línea incompleta por una caída: se vuelve a generar
+                    continue
+                if os.path.exists(registro['ruta_archivo']):
+                    hechos[registro['estudiante_id']] = registro
+        return hechos
+
+    @staticmethod
+    def crear_lote(titulo_certificado: str, estudiante_ids: list[int] | None = None,
+                   cohorte: bool = False) -> tuple[bool, str, dict | None]:
+        """
+        Registra un lote nuevo. Recibe una lista de estudiante_id o cohorte=True para
+        incluir a todos los estudiantes.
+        Retorna: (success, message, lote)
+        """
+        if not titulo_certificado:
+            return False, "Se requiere el título del certificado.", None
+
+        if cohorte:
+            ids = [fila.id for fila in db.session.query(Estudiante.id).order_by(Estudiante.id)]
+        elif estudiante_ids:
+            ids = sorted({int(i) for i in estudiante_ids})
+        else:
+            return False, "Indique una lista de estudiantes o la cohorte completa.", None
+
+        lote = {
+            'lote_id': uuid.uuid4().hex[:12],
+            'titulo': titulo_certificado,
+            'estudiante_ids': ids,
+            'estado': EmisionLoteService.ESTADO_PENDIENTE,
+            'creado': datetime.utcnow().isoformat(),
+            'mensaje': None,
+        }
+        os.makedirs(EmisionLoteService._carpeta_lote(lote['lote_id']), exist_ok=True)
+        EmisionLoteService._guardar_lote(lote)
+        return True, f"Lote creado con {len(ids)} estudiantes.", lote
+
+    @staticmethod
+    def ejecutar_lote(lote_id: str, max_workers: int | None = None, progreso=None) -> tuple[bool, str, dict | None]:
+        """
+        Genera los PDFs pendientes del lote en un ProcessPoolExecutor y registra todos
+        los certificados en una sola transacción. Es seguro volver a llamarlo sobre un
+        lote interrumpido. `progreso(hechos, total)` se llama por cada PDF terminado.
+        Retorna: (success, message, resumen)
+        """
+        lote = EmisionLoteService._leer_lote(lote_id)
+        if not lote:
+            return False, "Lote no encontrado.", None
+        if lote['estado'] == EmisionLoteService.ESTADO_COMPLETADO:
+            return True, "El lote ya fue completado.", lote.get('resumen')
+
+        lote['estado'] = EmisionLoteService.ESTADO_EN_PROCESO
+        EmisionLoteService._guardar_lote(lote)
+        titulo = lote['titulo']
+
+        # Estudiantes que ya tienen este certificado registrado (p. ej. una ejecución
+        # anterior que llegó a hacer commit) no se vuelven a emitir
+        ya_emitidos = set()
+        for bloque in en_bloques(lote['estudiante_ids']):
+            ya_emitidos.update(
+                fila.estudiante_id for fila in db.session.query(Certificado.estudiante_id).filter(
+                    Certificado.titulo == titulo,
+                    Certificado.estudiante_id.in_(bloque)
+                )
+            )
+        estudiantes = []
+        for bloque in en_bloques([i for i in lote['estudiante_ids'] if i not in ya_emitidos]):
+            estudiantes.extend(Estudiante.query.filter(Estudiante.id.in_(bloque)).order_by(Estudiante.id))
+
+        errores = []
+        encontrados = {e.id for e in estudiantes}
+        for estudiante_id in lote['estudiante_ids']:
+            if estudiante_id not in encontrados and estudiante_id not in ya_emitidos:
+                errores.append({'estudiante_id': estudiante_id, 'error': "Estudiante no encontrado."})
+
+        hechos = EmisionLoteService._leer_progreso(lote_id)
+        output_dir = current_app.config['CERTIFICADOS_FOLDER']
+        os.makedirs(output_dir, exist_ok=True)
+
+        tokens = TokenCertificados.desde_app(current_app)
+        base_url = current_app.config['BASE_URL']
+        tareas = []
+        for estudiante in estudiantes:
+            if estudiante.id in hechos:
+                continue
+            if not estudiante.matricula:
+                errores.append({'estudiante_id': estudiante.id, 'error': "El estudiante no tiene matrícula registrada."})
+                continue
+            codigo_unico = str(uuid.uuid4())
+            fecha_emision = datetime.utcnow()
+            tareas.append({
+                'estudiante_id': estudiante.id,
+                'ruta_archivo': os.path.join(output_dir, f"certificado_{estudiante.matricula}_{codigo_unico[:8]}.pdf"),
+                'fecha_emision': fecha_emision.isoformat(),
+                'sincronizar': current_app.config.get('CERTIFICADOS_FSYNC', True),
+                'datos': {
+                    'nombre_completo': estudiante.nombre_completo,
+                    'matricula': estudiante.matricula,
+                    'titulo': titulo,
+                    'fecha_emision': fecha_emision.strftime('%d/%m/%Y'),
+                    'codigo_unico': codigo_unico,
+                    # Se firma aquí: los procesos del pool no tienen la configuración
+                    **tokens.datos_pdf(base_url, codigo_unico, estudiante.nombre_completo,
+                                       estudiante.matricula, titulo, fecha_emision),
+                },
+            })
+
+        previos = len([e for e in estudiantes if e.id in hechos])
+        total = previos + len(tareas)
+        if progreso:
+            progreso(previos, total)
+
+        # 1. Renderizado en paralelo; cada resultado se anota en progreso.jsonl en cuanto llega
+        if tareas:
+            ruta_progreso = os.path.join(EmisionLoteService._carpeta_lote(lote_id), 'progreso.jsonl')
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=_CONTEXTO_POOL) as pool, \
+                    open(ruta_progreso, 'a', encoding='utf-8') as diario:
+                futuros = {pool.submit(_renderizar_certificado, tarea): tarea for tarea in tareas}
+                for futuro in as_completed(futuros):
+                    tarea = futuros[futuro]
+                    try:
+                        registro = futuro.result()
+                    except Exception as e:
+                        errores.append({'estudiante_id': tarea['estudiante_id'], 'error': f"Error ReportLab al generar PDF: {str(e)}"})
+                        continue
+                    diario.write(json.dumps(registro) + '\n')
+                    diario.flush()
+                    hechos[registro['estudiante_id']] = registro
+                    previos += 1
+                    if progreso:
+                        progreso(previos, total)
+
+        # 2. Inserción masiva en una sola transacción
+        filas = [
+            {
+                'estudiante_id': registro['estudiante_id'],
+                'codigo': registro['codigo_unico'],
+                'codigo_unico': registro['codigo_unico'],
+                'hash_firma': registro['hash_firma'],
+                'fecha_emision': datetime.fromisoformat(registro['fecha_emision']),
+                'titulo': titulo,
+                'ruta_archivo': registro['ruta_archivo'],
+                'estado': 'Válido',
+            }
+            for registro in hechos.values() if registro['estudiante_id'] in encontrados
+        ]
+        try:
+            db.session.bulk_insert_mappings(Certificado, filas)
+            db.session.commit()
+            ResolvedorCodigos.desde_app(current_app).invalidar(*(fila['codigo'] for fila in filas))
+        except Exception as e:
+            db.session.rollback()
+            lote['estado'] = EmisionLoteService.ESTADO_ERROR
+            lote['mensaje'] = f"Error DB al registrar certificados: {str(e)}"
+            EmisionLoteService._guardar_lote(lote)
+            # Los PDFs quedan anotados en progreso.jsonl: al reanudar no se vuelven a generar
+            return False, lote['mensaje'], None
+
+        resumen = {
+            'emitidos': len(filas),
+            'ya_emitidos': len(ya_emitidos),
+            'errores': errores,
+        }
+        lote['estado'] = EmisionLoteService.ESTADO_COMPLETADO
+        lote['mensaje'] = f"{len(filas)} certificados emitidos."
+        lote['resumen'] = resumen
+        EmisionLoteService._guardar_lote(lote)
+        return True, lote['mensaje'], resumen
+
+    @staticmethod
+    def ejecutar_en_segundo_plano(lote_id: str, max_workers: int | None = None):
+        """Lanza ejecutar_lote en un hilo con su propio contexto de aplicación."""
+        app = current_app._get_current_object()
+        with EmisionLoteService._lock:
+            EmisionLoteService._en_ejecucion.add(lote_id)
+
+        def tarea():
+            with app.app_context():
+                try:
+                    EmisionLoteService.ejecutar_lote(lote_id, max_workers=max_workers)
+                except Exception as e:
+                    lote = EmisionLoteService._leer_lote(lote_id)
+                    if lote:
+                        lote['estado'] = EmisionLoteService.ESTADO_ERROR
+                        lote['mensaje'] = f"Error inesperado: {str(e)}"
+                        EmisionLoteService._guardar_lote(lote)
+                finally:
+                    with EmisionLoteService._lock:
+                        EmisionLoteService._en_ejecucion.discard(lote_id)
+
+        hilo = threading.Thread(target=tarea, name=f"lote-{lote_id}", daemon=True)
+        hilo.start()
+        return hilo
+
+    @staticmethod
+    def en_ejecucion(lote_id: str) -> bool:
+        with EmisionLoteService._lock:
+            return lote_id in EmisionLoteService._en_ejecucion
+
+    @staticmethod
+    def estado_lote(lote_id: str) -> dict | None:
+        """Estado y progreso (PDFs generados / total) de un lote."""
+        lote = EmisionLoteService._leer_lote(lote_id)
+        if not lote:
+            return None
+        generados = len(EmisionLoteService._leer_progreso(lote_id))
+        return {
+            'lote_id': lote['lote_id'],
+            'titulo': lote['titulo'],
+            'estado': lote['estado'],
+            'total': len(lote['estudiante_ids']),
+            'generados': generados,
+            'mensaje': lote.get('mensaje'),
+            'resumen': lote.get('resumen'),
+        }
@@ -0,0 +1,319 @@
+import os
+import glob
+import json
+import queue
+import atexit
+import threading
+import time
+from datetime import datetime
+
+
+class _Marca:
+    """Elemento especial de la cola: pide al escritor vaciar su lote y avisar."""
+
+    def __init__(self):
+        self.evento = threading.Event()
+
+
+class LogVerificacionSink:
+    """
+    Escritor en segundo plano de LogVerificacion.
+
+    Las verificaciones solo encolan un diccionario; un hilo escritor los agrupa y
+    los inserta con bulk_insert_mappings cada `tamano_lote` registros o cada
+    `intervalo_ms` milisegundos, lo que ocurra primero. Cuando la cola está llena
+    se aplica la política de desborde:
+      - 'drop':  se descarta el registro (se cuenta en 'descartados').
+      - 'block': quien registra espera hasta `bloqueo_ms` a que haya espacio.
+      - 'spill': el registro se anexa a un archivo JSONL que el escritor vuelve a
+                 cargar en la base de datos cuando la cola se desocupa.
+    Un lote que falla al insertarse va también al archivo solo con 'spill'; con las
+    otras políticas se descarta (se cuenta en 'errores' y 'descartados').
+    """
+
+    POLITICAS = ('drop', 'block', 'spill')
+
+    def __init__(self, app, max_cola: int = 10000, tamano_lote: int = 200, intervalo_ms: int = 500,
+                 politica: str = 'drop', bloqueo_ms: int = 1000, archivo_desborde: str | None = None):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política de desborde inválida: {politica}")
+        if politica == 'spill' and not archivo_desborde:
+            raise ValueError("La política 'spill' requiere LOG_VERIFICACION_ARCHIVO_DESBORDE")
+
+        self.app = app
+        self.max_cola = max_cola
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo_ms / 1000
+        self.politica = politica
+        self.bloqueo = bloqueo_ms / 1000
+        # El archivo solo se usa con 'spill': con las otras políticas ni se escribe ni se relee
+        self.archivo_desborde = archivo_desborde if politica == 'spill' else None
+
+        self._lock = threading.Lock()
+        self._lock_desborde = threading.Lock()
+        self._cola = None
+        self._hilo = None
+        self._pid = None
+        self._detenido = False
+        self._contadores = {
+            'encolados': 0,
+            'escritos': 0,
+            'descartados': 0,
+            'desbordados': 0,
+            'lotes': 0,
+            'errores': 0,
+        }
+        atexit.register(self.detener)
+
+    @staticmethod
+    def iniciar_para_app(app) -> 'LogVerificacionSink':
+        """Crea el escritor de la aplicación según su configuración."""
+        sink = LogVerificacionSink(
+            app,
+            max_cola=app.config.get('LOG_VERIFICACION_COLA_MAX', 10000),
+            tamano_lote=app.config.get('LOG_VERIFICACION_LOTE', 200),
+            intervalo_ms=app.config.get('LOG_VERIFICACION_INTERVALO_MS', 500),
+            politica=app.config.get('LOG_VERIFICACION_DESBORDE', 'drop'),
+            bloqueo_ms=app.config.get('LOG_VERIFICACION_BLOQUEO_MS', 1000),
+            archivo_desborde=app.config.get('LOG_VERIFICACION_ARCHIVO_DESBORDE'),
+        )
+        app.extensions['log_verificacion_sink'] = sink
+        return sink
+
+    # API PÚBLICA
+
+    def registrar(self, registro: dict) -> bool:
+        """
+        Encola un registro (columnas de LogVerificacion). No toca la base de datos.
+        Retorna False si el registro se descartó por desborde.
+        """
+        cola = self._asegurar_hilo()
+        try:
+            if self.politica == 'block':
+                cola.put(registro, timeout=self.bloqueo)
+            else:
+                cola.put_nowait(registro)
+        except queue.Full:
+            if self.politica == 'spill' and self._desbordar([registro]):
+                with self._lock:
+                    self._contadores['desbordados'] += 1
+                return True
+            with self._lock:
+                self._contadores['descartados'] += 1
+            return False
+
+        with self._lock:
+            self._contadores['encolados'] += 1
+        return True
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """Espera a que todo lo encolado hasta ahora esté escrito en la base de datos."""
+        if self._hilo is None:
+            return True
+        if not self._detenido:
+            self._asegurar_hilo()
+        if not self._hilo.is_alive():
+            return True
+        marca = _Marca()
+        try:
+            self._cola.put(marca, timeout=timeout)
+        except queue.Full:
+            return False
+        return marca.evento.wait(timeout)
+
+    def detener(self, timeout: float = 5.0):
+        """Vacía la cola y termina el hilo escritor (se llama también al salir del proceso)."""
+        with self._lock:
+            if self._detenido:
+                return
+            self._detenido = True
+            hilo, cola = self._hilo, self._cola
+        if hilo is None or not hilo.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            cola.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        hilo.join(timeout)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._contadores)
+        datos['en_cola'] = self._cola.qsize() if self._cola is not None else 0
+        datos['politica'] = self.politica
+        return datos
+
+    # HILO ESCRITOR
+
+    def _asegurar_hilo(self) -> queue.Queue:
+        """
+        Arranca el escritor en el primer uso, de nuevo en cada proceso hijo tras un fork
+        y si el hilo murió (la cola se conserva: lo encolado no se pierde).
+        """
+        pid = os.getpid()
+        hilo = self._hilo
+        if self._pid == pid and hilo is not None and hilo.is_alive():
+            return self._cola
+        with self._lock:
+            if self._pid != pid:
+                self._cola = queue.Queue(maxsize=self.max_cola)
+                self._pid = pid
+                self._detenido = False
+                self._hilo = None
+            if (self._hilo is None or not self._hilo.is_alive()) and not self._detenido:
+                if self._hilo is not None:
+                    self.app.logger.error("El escritor de logs de verificación había terminado; se reinicia")
+                self._hilo = threading.Thread(target=self._bucle, name='log-verificacion-writer', daemon=True)
+                self._hilo.start()
+        return self._cola
+
+    def _bucle(self):
+        lote = []
+        limite = time.monotonic() + self.intervalo
+        while True:
+            espera = max(limite - time.monotonic(), 0)
+            try:
+                elemento = self._cola.get(timeout=espera)
+            except queue.Empty:
+                elemento = False
+
+            # _escribir no lanza excepciones; el resto (archivo de desborde) puede fallar
+            # con un error de E/S que no debe terminar el hilo
+            try:
+                if elemento is None:
+                    self._escribir(lote)
+                    self._recuperar_desborde()
+                    return
+                if isinstance(elemento, _Marca):
+                    self._escribir(lote)
+                    lote = []
+                    elemento.evento.set()
+                    continue
+                if elemento is not False:
+                    lote.append(elemento)
+
+                if len(lote) >= self.tamano_lote or time.monotonic() >= limite:
+                    self._escribir(lote)
+                    lote = []
+                    limite = time.monotonic() + self.intervalo
+                    if self._cola.empty():
+                        self._recuperar_desborde()
+            except Exception as e:
+                with self._lock:
+                    self._contadores['errores'] += 1
+                self.app.logger.error(f"Error en el escritor de logs de verificación: {str(e)}")
+                if elemento is None:
+                    return
+
+    def _escribir(self, lote: list):
+        if not lote:
+            return
+        from app.models import db
+        from app.models.log_verificacion import LogVerificacion
+
+        with self.app.app_context():
+            try:
+                db.session.bulk_insert_mappings(LogVerificacion, lote)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                with self._lock:
+                    self._contadores['errores'] += 1
+                self.app.logger.error(f"Error al escribir lote de logs de verificación: {str(e)}")
+                if self.archivo_desborde and self._desbordar(lote):
+                    return
+                with self._lock:
+                    self._contadores['descartados'] += len(lote)
+                return
+            finally:
+                db.session.remove()
+
+        with self._lock:
+            self._contadores['escritos'] += len(lote)
+            self._contadores['lotes'] += 1
+
+    # ARCHIVO DE DESBORDE
+    # Cada proceso escribe y relee su propio archivo (<archivo>.<pid><ext>): los workers
+    # de gunicorn no se pisan al recuperar. Los archivos de procesos que ya no existen
+    # los adopta el primero que consigue renombrarlos (os.replace es atómico).
+
+    def _archivo_propio(self) -> str:
+        base, extension = os.path.splitext(self.archivo_desborde)
+        return f"{base}.{os.getpid()}{extension}"
+
+    def _desbordar(self, registros: list) -> bool:
+        """Anexa los registros al archivo de desborde del proceso. False si no se pudo."""
+        try:
+            with self._lock_desborde:
+                with open(self._archivo_propio(), 'a', encoding='utf-8') as f:
+                    for registro in registros:
+                        f.write(json.dumps(registro, default=_serializar) + '\n')
+            return True
+        except OSError as e:
+            with self._lock:
+                self._contadores['errores'] += 1
+            self.app.logger.error(f"No se pudo escribir el archivo de desborde de logs: {str(e)}")
+            return False
+
+    def _pendientes(self) -> list[str]:
+        """Archivos de desborde a recuperar: el propio y los de procesos terminados."""
+        base, extension = os.path.splitext(self.archivo_desborde)
+        propio = self._archivo_propio()
+        pendientes = [propio] if os.path.exists(propio) else []
+        # Los archivos sin pid de versiones anteriores
+        for ruta in (self.archivo_desborde + '.procesando', self.archivo_desborde):
+            if os.path.exists(ruta):
+                pendientes.append(ruta)
+        for ruta in glob.glob(glob.escape(base) + '.*' + glob.escape(extension) + '*'):
+            pid = ruta[len(base) + 1:].split('.', 1)[0]
+            if ruta != propio and pid.isdigit() and not _proceso_vivo(int(pid)):
+                pendientes.append(ruta)
+        return pendientes
+
+    def _recuperar_desborde(self):
+        """Carga en la base de datos los registros que se desbordaron a archivo."""
+        if not self.archivo_desborde:
+            return
+        procesando = self._archivo_propio() + '.procesando'
+        # Un .procesando propio que quedó de un intento anterior va primero
+        for archivo in [procesando] + self._pendientes():
+            if archivo != procesando:
+                try:
+                    with self._lock_desborde:
+                        os.replace(archivo, procesando)
+                except FileNotFoundError:
+                    continue  # Lo adoptó otro proceso
+            if not os.path.exists(procesando):
+                continue
+
+            lote = []
+            with open(procesando, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        continue
+                    if registro.get('fecha_verificacion'):
+                        registro['fecha_verificacion'] = datetime.fromisoformat(registro['fecha_verificacion'])
+                    lote.append(registro)
+                    if len(lote) >= self.tamano_lote:
+                        self._escribir(lote)
+                        lote = []
+            self._escribir(lote)
+            os.remove(procesando)
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _serializar(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
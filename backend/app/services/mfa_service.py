@@ -0,0 +1,172 @@
+import hmac
+import time
+import base64
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def _clave_base32(secreto: str) -> bytes:
+    """Decodifica un secreto base32 (como los de pyotp.random_base32), tolerando el relleno faltante."""
+    secreto = secreto.strip().replace(' ', '').upper()
+    return base64.b32decode(secreto + '=' * (-len(secreto) % 8))
+
+
+def codigo_hotp(clave: bytes, contador: int, digitos: int = 6) -> str:
+    """Código HOTP (RFC 4226) con HMAC-SHA1, el mismo que calcula pyotp."""
+    digest = hmac.new(clave, struct.pack('>Q', contador), hashlib.sha1).digest()
+    desplazamiento = digest[-1] & 0x0F
+    valor = struct.unpack('>I', digest[desplazamiento:desplazamiento + 4])[0] & 0x7FFFFFFF
+    return str(valor % (10 ** digitos)).zfill(digitos)
+
+
+class _EstadoUsuario:
+    __slots__ = ('secreto', 'clave', 'paso', 'codigos')
+
+    def __init__(self, secreto: str):
+        self.secreto = secreto
+        self.clave = _clave_base32(secreto)
+        self.paso = None
+        self.codigos = {}  # codigo -> paso
+
+
+class MotorTOTP:
+    """
+    Verificación TOTP (RFC 6238, 30 s, 6 dígitos, SHA1: compatible con pyotp y las
+    apps autenticadoras).
+
+    Por usuario se guarda el secreto ya decodificado y los códigos de los pasos
+    actual ± `ventana`, que se recalculan una sola vez por paso de tiempo; verificar
+    un código es una búsqueda en un diccionario. Cada (usuario, paso) aceptado se
+    anota en una caché de repetición acotada del proceso y, si se da `compartido`
+    (el backend Redis del limitador de login), también ahí: así un código no se puede
+    usar dos veces dentro de su ventana en ningún worker. Sin backend compartido la
+    protección es solo por proceso: con N workers el mismo código puede aceptarse
+    hasta N veces.
+    """
+
+    def __init__(self, intervalo: int = 30, digitos: int = 6, ventana: int = 1,
+                 max_usuarios: int = 10000, max_repeticiones: int = 100000, compartido=None):
+        self.intervalo = intervalo
+        self.digitos = digitos
+        self.ventana = ventana
+        self.max_usuarios = max_usuarios
+        self.max_repeticiones = max_repeticiones
+        self.compartido = compartido
+
+        self._usuarios = OrderedDict()      # user_id -> _EstadoUsuario
+        self._consumidos = OrderedDict()    # (user_id, paso) -> True
+        self._lock = threading.Lock()
+        self._inicio = time.monotonic()
+        self._tiempo_total = 0.0
+        self._contadores = {
+            'verificaciones': 0,
+            'exitos': 0,
+            'fallos': 0,
+            'repeticiones': 0,
+            'recalculos': 0,
+        }
+
+    @staticmethod
+    def desde_app(app) -> 'MotorTOTP':
+        """Devuelve el motor asociado a la aplicación, creándolo la primera vez."""
+        motor = app.extensions.get('motor_totp')
+        if motor is None:
+            compartido = None
+            if app.config.get('LOGIN_LIMITE_BACKEND', 'memoria') == 'redis':
+                from app.services.rate_limit_service import LimitadorLogin
+                compartido = LimitadorLogin.desde_app(app).backend
+            motor = MotorTOTP(
+                ventana=app.config.get('MFA_VENTANA_PASOS', 1),
+                max_usuarios=app.config.get('MFA_CACHE_MAX_USUARIOS', 10000),
+                max_repeticiones=app.config.get('MFA_CACHE_MAX_REPETICIONES', 100000),
+                compartido=compartido,
+            )
+            app.extensions['motor_totp'] = motor
+        return motor
+
+    # API PÚBLICA
+
+    def verificar(self, user_id, secreto: str, codigo: str, ahora: float | None = None) -> bool:
+        """True si `codigo` es válido para el paso actual ± ventana y no se usó antes."""
+        inicio = time.perf_counter()
+        ahora = time.time() if ahora is None else ahora
+        paso_actual = int(ahora // self.intervalo)
+
+        with self._lock:
+            self._contadores['verificaciones'] += 1
+            try:
+                estado = self._estado(user_id, secreto, paso_actual)
+            except (ValueError, TypeError):
+                self._contadores['fallos'] += 1
+                return False
+            paso = estado.codigos.get(codigo)
+            repetido = paso is not None and (user_id, paso) in self._consumidos
+
+        # La anotación compartida va fuera del lock (es una llamada de red): el primer
+        # registro de (usuario, paso) en cualquier worker es el único que cuenta
+        if paso is not None and not repetido and self.compartido is not None:
+            ventana_s = (2 * self.ventana + 1) * self.intervalo
+            repetido = self.compartido.registrar(f"totp:{user_id}:{paso}", ahora, ventana_s) > 1
+
+        with self._lock:
+            if paso is None:
+                resultado = False
+                self._contadores['fallos'] += 1
+            elif repetido or (user_id, paso) in self._consumidos:
+                resultado = False
+                self._contadores['repeticiones'] += 1
+            else:
+                resultado = True
+                self._consumir(user_id, paso, paso_actual)
+                self._contadores['exitos'] += 1
+
+            self._tiempo_total += time.perf_counter() - inicio
+            return resultado
+
+    def olvidar(self, user_id):
+        """Descarta el estado en caché del usuario (p. ej. al cambiar o desactivar su MFA)."""
+        with self._lock:
+            self._usuarios.pop(user_id, None)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._contadores)
+            datos['usuarios_en_cache'] = len(self._usuarios)
+            datos['pasos_consumidos'] = len(self._consumidos)
+            verificaciones = datos['verificaciones']
+            datos['us_por_verificacion'] = round(self._tiempo_total / verificaciones * 1e6, 2) if verificaciones else 0.0
+        transcurrido = time.monotonic() - self._inicio
+        datos['verificaciones_por_segundo'] = round(datos['verificaciones'] / transcurrido, 2) if transcurrido else 0.0
+        return datos
+
+    # INTERNOS (se llaman con self._lock tomado)
+
+    def _estado(self, user_id, secreto: str, paso_actual: int) -> _EstadoUsuario:
+        estado = self._usuarios.get(user_id)
+        if estado is None or estado.secreto != secreto:
+            estado = _EstadoUsuario(secreto)
+            self._usuarios[user_id] = estado
+            while len(self._usuarios) > self.max_usuarios:
+                self._usuarios.popitem(last=False)
+        self._usuarios.move_to_end(user_id)
+
+        if estado.paso != paso_actual:
+            estado.codigos = {
+                codigo_hotp(estado.clave, paso, self.digitos): paso
+                for paso in range(paso_actual - self.ventana, paso_actual + self.ventana + 1)
+            }
+            estado.paso = paso_actual
+            self._contadores['recalculos'] += 1
+        return estado
+
+    def _consumir(self, user_id, paso: int, paso_actual: int):
+        self._consumidos[(user_id, paso)] = True
+        # Los pasos fuera de la ventana ya no pueden verificarse: no hace falta recordarlos
+        limite = paso_actual - self.ventana
+        while self._consumidos:
+            (_, paso_antiguo) = next(iter(self._consumidos))
+            if paso_antiguo >= limite and len(self._consumidos) <= self.max_repeticiones:
+                break
+            self._consumidos.popitem(last=False)
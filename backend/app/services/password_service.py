@@ -0,0 +1,116 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from app.utils.contrasenas import generar_hash, verificar_hash, rondas_de_hash
+
+
+class ServicioSaturado(Exception):
+    """No hay capacidad para otra operación de hash; el cliente debe reintentar más tarde."""
+
+
+class PasswordService:
+    """
+    Hash y verificación de contraseñas en un pool de hilos dedicado y acotado
+    (bcrypt y hashlib liberan el GIL mientras calculan), para que una ráfaga de
+    logins no acapare los hilos del servidor.
+
+    Control de admisión: como máximo `max_workers + max_cola` operaciones pueden
+    estar en curso o esperando. Si no hay cupo:
+      - 'queue':  se espera hasta `espera_ms` a que se libere uno.
+      - 'reject': se lanza ServicioSaturado de inmediato.
+    En ambos casos, si no se consigue cupo se lanza ServicioSaturado (HTTP 503).
+    """
+
+    POLITICAS = ('queue', 'reject')
+
+    def __init__(self, rondas: int = 12, max_workers: int | None = None, max_cola: int = 32,
+                 politica: str = 'queue', espera_ms: int = 2000):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política de saturación inválida: {politica}")
+        self.rondas = rondas
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_cola = max_cola
+        self.politica = politica
+        self.espera = espera_ms / 1000
+
+        self._cupos = threading.BoundedSemaphore(self.max_workers + self.max_cola)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._contadores = {
+            'hashes': 0,
+            'verificaciones': 0,
+            'rechazados': 0,
+        }
+
+    @staticmethod
+    def desde_app(app) -> 'PasswordService':
+        """Devuelve el servicio asociado a la aplicación, creándolo la primera vez."""
+        servicio = app.extensions.get('password_service')
+        if servicio is None:
+            servicio = PasswordService(
+                rondas=app.config.get('PASSWORD_BCRYPT_ROUNDS', 12),
+                max_workers=app.config.get('PASSWORD_HASH_WORKERS'),
+                max_cola=app.config.get('PASSWORD_HASH_COLA_MAX', 32),
+                politica=app.config.get('PASSWORD_HASH_SATURACION', 'queue'),
+                espera_ms=app.config.get('PASSWORD_HASH_ESPERA_MS', 2000),
+            )
+            app.extensions['password_service'] = servicio
+        return servicio
+
+    @staticmethod
+    def actual() -> 'PasswordService | None':
+        """Servicio de la aplicación activa, o None fuera de un contexto de aplicación."""
+        return PasswordService.desde_app(current_app) if has_app_context() else None
+
+    # API PÚBLICA
+
+    def hashear(self, password: str) -> str:
+        self._contar('hashes')
+        return self._ejecutar(generar_hash, password, self.rondas)
+
+    def verificar(self, password: str, password_hash: str) -> bool:
+        self._contar('verificaciones')
+        return self._ejecutar(verificar_hash, password, password_hash)
+
+    def necesita_rehash(self, password_hash: str) -> bool:
+        """True si el hash no es bcrypt o se generó con otro factor de trabajo."""
+        return rondas_de_hash(password_hash) != self.rondas
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._contadores)
+        datos['rondas'] = self.rondas
+        datos['workers'] = self.max_workers
+        datos['politica'] = self.politica
+        return datos
+
+    # POOL
+
+    def _contar(self, contador: str):
+        with self._lock:
+            self._contadores[contador] += 1
+
+    def _obtener_pool(self) -> ThreadPoolExecutor:
+        """Crea el pool en el primer uso (y de nuevo en cada proceso hijo tras un fork)."""
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='password-hash')
+                    self._pid = pid
+        return self._pool
+
+    def _ejecutar(self, funcion, *args):
+        if self.politica == 'queue':
+            admitido = self._cupos.acquire(timeout=self.espera)
+        else:
+            admitido = self._cupos.acquire(blocking=False)
+        if not admitido:
+            self._contar('rechazados')
+            raise ServicioSaturado("Demasiadas solicitudes de autenticación en curso. Intente de nuevo.")
+        try:
+            return self._obtener_pool().submit(funcion, *args).result()
+        finally:
+            self._cupos.release()
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Versión del render de los PDFs de descarga (plantillas de app/pdf_generator.py). Forma
+# parte de la clave: al cambiar la maquetación se incrementa, y las entradas en disco
+# (que sobreviven a los despliegues) y los ETag que guardan los clientes dejan de coincidir.
+VERSION_RENDER = 3
+
+
+class PdfCacheService:
+    """
+    Caché de PDFs generados, direccionada por contenido.
+    La clave es un digest SHA256 de los datos del certificado (cert_data), de modo que
+    dos descargas con los mismos datos comparten el mismo PDF ya renderizado.
+
+    Tiene dos niveles:
+      - Memoria: LRU acotado por número de entradas y por bytes totales.
+      - Disco: archivos <digest>.pdf dentro de CERTIFICADOS_FOLDER/cache, acotado por bytes.
+    Ambos niveles expiran las entradas según un TTL.
+    """
+
+    EXTENSION = '.pdf'
+
+    def __init__(self, carpeta: str, max_entradas: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: int = 3600, max_bytes_disco: int = 512 * 1024 * 1024):
+        self.carpeta = carpeta
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_bytes_disco = max_bytes_disco
+
+        self._memoria = OrderedDict()  # clave -> (timestamp, bytes)
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        # Un lock por clave para que varias descargas simultáneas del mismo código
+        # rendericen el PDF una sola vez
+        self._locks_clave = {}
+
+        self._contadores = {
+            'hits_memoria': 0,
+            'hits_disco': 0,
+            'misses': 0,
+            'escrituras': 0,
+            'desalojos': 0,
+            'expirados': 0,
+        }
+
+        if self.carpeta:
+            os.makedirs(self.carpeta, exist_ok=True)
+            self._bytes_disco = self._calcular_bytes_disco()
+        else:
+            self._bytes_disco = 0
+
+    @staticmethod
+    def calcular_clave(cert_data: dict) -> str:
+        """Digest estable (SHA256) de los datos que determinan el contenido del PDF y de la versión del render."""
+        serializado = json.dumps({'v': VERSION_RENDER, 'datos': cert_data}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def desde_app(app) -> 'PdfCacheService':
+        """Devuelve la caché asociada a la aplicación, creándola la primera vez."""
+        cache = app.extensions.get('pdf_cache')
+        if cache is None:
+            carpeta = app.config.get('PDF_CACHE_FOLDER') or os.path.join(app.config['CERTIFICADOS_FOLDER'], 'cache')
+            cache = PdfCacheService(
+                carpeta=carpeta,
+                max_entradas=app.config.get('PDF_CACHE_MAX_ENTRADAS', 256),
+                max_bytes=app.config.get('PDF_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+                ttl=app.config.get('PDF_CACHE_TTL', 3600),
+                max_bytes_disco=app.config.get('PDF_CACHE_MAX_BYTES_DISCO', 512 * 1024 * 1024),
+            )
+            app.extensions['pdf_cache'] = cache
+        return cache
+
+    # API PÚBLICA
+
+    def obtener(self, clave: str) -> bytes | None:
+        """Busca el PDF en memoria y luego en disco. Retorna None si no está o expiró."""
+        ahora = time.time()
+
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                timestamp, contenido = entrada
+                if ahora - timestamp <= self.ttl:
+                    self._memoria.move_to_end(clave)
+                    self._contadores['hits_memoria'] += 1
+                    return contenido
+                self._quitar_de_memoria(clave)
+                self._contadores['expirados'] += 1
+
+        contenido, timestamp = self._leer_disco(clave, ahora)
+        if contenido is not None:
+            with self._lock:
+                self._contadores['hits_disco'] += 1
+                self._guardar_en_memoria(clave, contenido, timestamp)
+            return contenido
+
+        with self._lock:
+            self._contadores['misses'] += 1
+        return None
+
+    def guardar(self, clave: str, contenido: bytes):
+        """Guarda el PDF en ambos niveles."""
+        ahora = time.time()
+        with self._lock:
+            self._guardar_en_memoria(clave, contenido, ahora)
+            self._contadores['escrituras'] += 1
+        self._escribir_disco(clave, contenido)
+
+    def obtener_o_generar(self, cert_data: dict, generar) -> tuple[str, bytes]:
+        """
+        Retorna (clave, bytes del PDF). Si no está en caché, llama a `generar()`
+        (que debe devolver los bytes del PDF) y guarda el resultado.
+        """
+        clave = self.calcular_clave(cert_data)
+        contenido = self.obtener(clave)
+        if contenido is not None:
+            return clave, contenido
+
+        with self._lock:
+            lock_clave = self._locks_clave.setdefault(clave, threading.Lock())
+
+        try:
+            with lock_clave:
+                # Otro hilo pudo haberlo generado mientras esperábamos
+                with self._lock:
+                    entrada = self._memoria.get(clave)
+                if entrada is not None:
+                    return clave, entrada[1]
+
+                contenido = generar()
+                self.guardar(clave, contenido)
+        finally:
+            # También si generar() falla: el lock no debe quedar en _locks_clave
+            with self._lock:
+                self._locks_clave.pop(clave, None)
+        return clave, contenido
+
+    def invalidar(self, clave: str):
+        """Elimina una entrada de ambos niveles."""
+        with self._lock:
+            self._quitar_de_memoria(clave)
+        self._borrar_disco(clave)
+
+    def limpiar(self):
+        """Vacía la caché completa (memoria y disco)."""
+        with self._lock:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+        if self.carpeta and os.path.isdir(self.carpeta):
+            for nombre in os.listdir(self.carpeta):
+                if nombre.endswith(self.EXTENSION):
+                    self._borrar_disco(nombre[:-len(self.EXTENSION)])
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._contadores)
+            datos['entradas_memoria'] = len(self._memoria)
+            datos['bytes_memoria'] = self._bytes_memoria
+            datos['bytes_disco'] = self._bytes_disco
+        consultas = datos['hits_memoria'] + datos['hits_disco'] + datos['misses']
+        datos['tasa_aciertos'] = round((datos['hits_memoria'] + datos['hits_disco']) / consultas, 4) if consultas else 0.0
+        return datos
+
+    # NIVEL MEMORIA (llamar con self._lock tomado)
+
+    def _guardar_en_memoria(self, clave, contenido, timestamp):
+        if len(contenido) > self.max_bytes:
+            return
+        self._quitar_de_memoria(clave)
+        self._memoria[clave] = (timestamp, contenido)
+        self._bytes_memoria += len(contenido)
+
+        while self._memoria and (len(self._memoria) > self.max_entradas or self._bytes_memoria > self.max_bytes):
+            _, (_, desalojado) = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(desalojado)
+            self._contadores['desalojos'] += 1
+
+    def _quitar_de_memoria(self, clave):
+        entrada = self._memoria.pop(clave, None)
+        if entrada is not None:
+            self._bytes_memoria -= len(entrada[1])
+
+    # NIVEL DISCO
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.carpeta, f"{clave}{self.EXTENSION}")
+
+    def _leer_disco(self, clave: str, ahora: float) -> tuple[bytes | None, float]:
+        if not self.carpeta:
+            return None, 0.0
+        ruta = self._ruta(clave)
+        try:
+            mtime = os.stat(ruta).st_mtime
+            if ahora - mtime > self.ttl:
+                self._borrar_disco(clave)
+                with self._lock:
+                    self._contadores['expirados'] += 1
+                return None, 0.0
+            with open(ruta, 'rb') as f:
+                return f.read(), mtime
+        except OSError:
+            return None, 0.0
+
+    def _escribir_disco(self, clave: str, contenido: bytes):
+        if not self.carpeta:
+            return
+        ruta = self._ruta(clave)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, 'wb') as f:
+                f.write(contenido)
+            previo = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+            os.replace(temporal, ruta)
+        except OSError:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return
+
+        with self._lock:
+            self._bytes_disco += len(contenido) - previo
+            excedido = self._bytes_disco > self.max_bytes_disco
+        if excedido:
+            self._desalojar_disco()
+
+    def _borrar_disco(self, clave: str):
+        if not self.carpeta:
+            return
+        ruta = self._ruta(clave)
+        try:
+            tamano = os.path.getsize(ruta)
+            os.remove(ruta)
+        except OSError:
+            return
+        with self._lock:
+            self._bytes_disco -= tamano
+
+    def _calcular_bytes_disco(self) -> int:
+        total = 0
+        for entrada in os.scandir(self.carpeta):
+            if entrada.is_file() and entrada.name.endswith(self.EXTENSION):
+                total += entrada.stat().st_size
+        return total
+
+    def _desalojar_disco(self):
+        """Elimina primero los expirados y luego los más antiguos hasta volver al límite."""
+        ahora = time.time()
+        archivos = []
+        for entrada in os.scandir(self.carpeta):
+            if entrada.is_file() and entrada.name.endswith(self.EXTENSION):
+                info = entrada.stat()
+                archivos.append((info.st_mtime, info.st_size, entrada.name[:-len(self.EXTENSION)]))
+        archivos.sort()
+
+        total = sum(tamano for _, tamano, _ in archivos)
+        for mtime, tamano, clave in archivos:
+            if total <= self.max_bytes_disco and ahora - mtime <= self.ttl:
+                break
+            self._borrar_disco(clave)
+            total -= tamano
+            with self._lock:
+                self._contadores['desalojos'] += 1
+
+        with self._lock:
+            self._bytes_disco = total
@@ -0,0 +1,43 @@
+import io
+import os
+import base64
+import fnmatch
+
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def renderizar_qr(contenido: str, formato: str = 'png') -> bytes:
+    """Renderiza el QR en memoria (sin tocar el disco)."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de QR desconocido: {formato}")
+    # qrcode (y PIL para PNG) se cargan en el primer QR, no al arrancar
+    import qrcode
+    import qrcode.image.svg
+    buffer = io.BytesIO()
+    if formato == 'svg':
+        qrcode.make(contenido, image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qrcode.make(contenido).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def a_data_uri(png: bytes) -> str:
+    return 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+
+
+def purgar_qr_en_disco(carpeta: str, patron: str = '*_mfa_setup.png') -> int:
+    """Elimina los QR de inscripción MFA que se guardaban en disco. Retorna cuántos borró."""
+    if not carpeta or not os.path.isdir(carpeta):
+        return 0
+    eliminados = 0
+    for entrada in os.scandir(carpeta):
+        if entrada.is_file() and fnmatch.fnmatch(entrada.name, patron):
+            try:
+                os.remove(entrada.path)
+                eliminados += 1
+            except OSError:
+                pass
+    return eliminados
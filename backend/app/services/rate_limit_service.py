@@ -0,0 +1,168 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+
+
+class BackendMemoria:
+    """
+    Ventana deslizante en memoria del proceso: por cada clave se guardan los
+    timestamps de los intentos dentro de la ventana. Acotado a `max_claves`
+    (LRU) para que un barrido de usuarios inventados no agote la memoria.
+    """
+
+    def __init__(self, max_claves: int = 100000):
+        self.max_claves = max_claves
+        self._claves = OrderedDict()  # clave -> deque de timestamps
+        self._lock = threading.Lock()
+
+    def _vigentes(self, clave, ahora, ventana):
+        intentos = self._claves.get(clave)
+        if intentos is None:
+            return None
+        while intentos and intentos[0] <= ahora - ventana:
+            intentos.popleft()
+        if not intentos:
+            del self._claves[clave]
+            return None
+        return intentos
+
+    def registrar(self, clave: str, ahora: float, ventana: float) -> int:
+        """Anota un intento y retorna cuántos hay dentro de la ventana."""
+        with self._lock:
+            intentos = self._vigentes(clave, ahora, ventana)
+            if intentos is None:
+                intentos = self._claves[clave] = deque()
+            intentos.append(ahora)
+            self._claves.move_to_end(clave)
+            while len(self._claves) > self.max_claves:
+                self._claves.popitem(last=False)
+            return len(intentos)
+
+    def contar(self, clave: str, ahora: float, ventana: float) -> int:
+        with self._lock:
+            intentos = self._vigentes(clave, ahora, ventana)
+            return len(intentos) if intentos else 0
+
+    def limpiar(self, clave: str):
+        with self._lock:
+            self._claves.pop(clave, None)
+
+    def total_claves(self) -> int:
+        with self._lock:
+            return len(self._claves)
+
+
+class BackendRedis:
+    """
+    Ventana deslizante compartida entre procesos/servidores con un sorted set de
+    Redis por clave (score = timestamp). Requiere el paquete `redis`.
+    """
+
+    def __init__(self, url: str, prefijo: str = 'login:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("LOGIN_LIMITE_BACKEND='redis' requiere el paquete 'redis' (pip install redis)")
+        self._redis = redis.Redis.from_url(url)
+        self.prefijo = prefijo
+
+    def registrar(self, clave: str, ahora: float, ventana: float) -> int:
+        clave = self.prefijo + clave
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(clave, 0, ahora - ventana)
+        pipe.zadd(clave, {f"{ahora}:{uuid.uuid4().hex[:8]}": ahora})
+        pipe.zcard(clave)
+        pipe.expire(clave, int(ventana) + 1)
+        return int(pipe.execute()[2])
+
+    def contar(self, clave: str, ahora: float, ventana: float) -> int:
+        clave = self.prefijo + clave
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(clave, 0, ahora - ventana)
+        pipe.zcard(clave)
+        return int(pipe.execute()[1])
+
+    def limpiar(self, clave: str):
+        self._redis.delete(self.prefijo + clave)
+
+    def total_claves(self) -> int | None:
+        return None
+
+
+class LimitadorLogin:
+    """
+    Limitador de intentos de login por ventana deslizante, por usuario y por IP.
+
+    Los intentos fallidos se cuentan en el backend (memoria o Redis), no en la
+    tabla usuarios: solo cuando un usuario alcanza `max_intentos_usuario` dentro
+    de la ventana se persiste el bloqueo (locked_until). Una IP que supera
+    `max_intentos_ip` queda rechazada hasta que sus intentos salgan de la ventana.
+    """
+
+    def __init__(self, backend=None, max_intentos_usuario: int = 5, max_intentos_ip: int = 20,
+                 ventana_segundos: int = 900):
+        self.backend = backend or BackendMemoria()
+        self.max_intentos_usuario = max_intentos_usuario
+        self.max_intentos_ip = max_intentos_ip
+        self.ventana = ventana_segundos
+        self._lock = threading.Lock()
+        self._contadores = {
+            'fallos': 0,
+            'rechazados_ip': 0,
+            'bloqueos': 0,
+        }
+
+    @staticmethod
+    def desde_app(app) -> 'LimitadorLogin':
+        """Devuelve el limitador asociado a la aplicación, creándolo la primera vez."""
+        limitador = app.extensions.get('limitador_login')
+        if limitador is None:
+            if app.config.get('LOGIN_LIMITE_BACKEND', 'memoria') == 'redis':
+                backend = BackendRedis(app.config['LOGIN_LIMITE_REDIS_URL'])
+            else:
+                backend = BackendMemoria(max_claves=app.config.get('LOGIN_LIMITE_MAX_CLAVES', 100000))
+            limitador = LimitadorLogin(
+                backend,
+                max_intentos_usuario=app.config.get('LOGIN_MAX_INTENTOS_USUARIO', 5),
+                max_intentos_ip=app.config.get('LOGIN_MAX_INTENTOS_IP', 20),
+                ventana_segundos=app.config.get('LOGIN_VENTANA_SEGUNDOS', 900),
+            )
+            app.extensions['limitador_login'] = limitador
+        return limitador
+
+    # API PÚBLICA
+
+    def ip_permitida(self, ip: str | None) -> bool:
+        if not ip:
+            return True
+        if self.backend.contar('ip:' + ip, time.time(), self.ventana) < self.max_intentos_ip:
+            return True
+        self._contar('rechazados_ip')
+        return False
+
+    def registrar_fallo(self, username: str, ip: str | None) -> int:
+        """Anota un intento fallido y retorna los fallos del usuario dentro de la ventana."""
+        ahora = time.time()
+        self._contar('fallos')
+        if ip:
+            self.backend.registrar('ip:' + ip, ahora, self.ventana)
+        return self.backend.registrar('u:' + username, ahora, self.ventana)
+
+    def registrar_bloqueo(self, username: str):
+        """El bloqueo ya quedó persistido: se reinicia la cuenta del usuario."""
+        self._contar('bloqueos')
+        self.backend.limpiar('u:' + username)
+
+    def registrar_exito(self, username: str):
+        self.backend.limpiar('u:' + username)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._contadores)
+        datos['claves'] = self.backend.total_claves()
+        return datos
+
+    def _contar(self, contador: str):
+        with self._lock:
+            self._contadores[contador] += 1
@@ -0,0 +1,97 @@
+import os
+import time
+import shutil
+from flask import current_app
+from app.models import db
+from app.models.certificado import Certificado
+from app.services.emision_lote_service import EmisionLoteService
+from app.utils.almacenamiento import SUFIJO_TEMPORAL
+
+
+def _nombre(ruta: str) -> str:
+    # Se compara solo el nombre dentro de CERTIFICADOS_FOLDER: las rutas absolutas
+    # guardadas cambian si se mueve la carpeta o se restaura la base en otro servidor
+    return os.path.normcase(os.path.basename(ruta.replace('\\', '/')))
+
+
+class ReconciliacionService:
+    """
+    Limpieza de lo que deja una emisión interrumpida. La emisión escribe el PDF
+    (temporal + fsync + rename) antes de hacer commit de su fila, así que una caída
+    puede dejar:
+      - temporales '.<nombre>.pdf.<pid>.<id>.tmp' de una escritura a medias;
+      - PDFs completos sin fila en la tabla certificados (huérfanos).
+    Se ejecuta al iniciar (inicializar_aplicacion). Solo toca archivos con más de
+    `gracia` segundos, para no competir con emisiones en curso en otros procesos, y
+    respeta los PDFs de lotes sin completar (se registran al reanudar el lote). Por
+    defecto solo reporta los huérfanos.
+    """
+
+    ACCIONES = ('cuarentena', 'borrar', 'reportar')
+
+    @staticmethod
+    def reconciliar(gracia: int | None = None, accion: str | None = None) -> dict:
+        """Retorna {temporales, huerfanos, accion}. Requiere un contexto de aplicación."""
+        config = current_app.config
+        carpeta = config['CERTIFICADOS_FOLDER']
+        gracia = config.get('CERTIFICADOS_HUERFANOS_GRACIA', 3600) if gracia is None else gracia
+        accion = accion or config.get('CERTIFICADOS_HUERFANOS_ACCION', 'reportar')
+        if accion not in ReconciliacionService.ACCIONES:
+            raise ValueError(f"Acción de reconciliación inválida: {accion}")
+
+        resultado = {'temporales': [], 'huerfanos': [], 'accion': accion}
+        if not os.path.isdir(carpeta):
+            return resultado
+
+        limite = time.time() - gracia
+        candidatos = [
+            entrada for entrada in os.scandir(carpeta)
+            if entrada.is_file() and entrada.stat().st_mtime < limite
+        ]
+        temporales = [e.path for e in candidatos if e.name.startswith('.') and e.name.endswith(SUFIJO_TEMPORAL)]
+        pdfs = [e.path for e in candidatos if e.name.endswith('.pdf')]
+
+        if pdfs:
+            conservar = ReconciliacionService._rutas_registradas() | ReconciliacionService._rutas_de_lotes_en_curso()
+            resultado['huerfanos'] = sorted(ruta for ruta in pdfs if _nombre(ruta) not in conservar)
+
+        for ruta in temporales:
+            try:
+                os.remove(ruta)
+                resultado['temporales'].append(ruta)
+            except OSError:
+                pass
+
+        if resultado['huerfanos'] and accion != 'reportar':
+            cuarentena = os.path.join(carpeta, 'huerfanos')
+            if accion == 'cuarentena':
+                os.makedirs(cuarentena, exist_ok=True)
+            for ruta in resultado['huerfanos']:
+                try:
+                    if accion == 'cuarentena':
+                        shutil.move(ruta, os.path.join(cuarentena, os.path.basename(ruta)))
+                    else:
+                        os.remove(ruta)
+                except OSError as e:
+                    current_app.logger.error(f"No se pudo reconciliar {ruta}: {e}")
+
+        return resultado
+
+    @staticmethod
+    def _rutas_registradas() -> set:
+        consulta = db.session.query(Certificado.ruta_archivo).filter(
+            Certificado.ruta_archivo.isnot(None)
+        ).yield_per(1000)
+        return {_nombre(ruta) for (ruta,) in consulta}
+
+    @staticmethod
+    def _rutas_de_lotes_en_curso() -> set:
+        carpeta_lotes = os.path.join(current_app.config['CERTIFICADOS_FOLDER'], 'lotes')
+        if not os.path.isdir(carpeta_lotes):
+            return set()
+        rutas = set()
+        for entrada in os.scandir(carpeta_lotes):
+            lote = EmisionLoteService._leer_lote(entrada.name) if entrada.is_dir() else None
+            if lote and lote['estado'] != EmisionLoteService.ESTADO_COMPLETADO:
+                rutas.update(_nombre(r['ruta_archivo']) for r in EmisionLoteService._leer_progreso(entrada.name).values())
+        return rutas
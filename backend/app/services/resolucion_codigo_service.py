@@ -0,0 +1,158 @@
+import time
+import threading
+from collections import OrderedDict
+from app.models import db
+from app.models.certificado import Certificado
+from app.models.estudiante import Estudiante
+from app.utils.base_datos import sesion_lectura
+
+# Códigos de demostración que usa el frontend (index.html) para los 5 estudiantes de
+# prueba. Se consultan solo si el código no existe en la base de datos.
+CODIGOS_DEMO = {
+    "CEB-001": "Ana Sofía Gómez López",
+    "CEB-002": "Juan Pablo Rodríguez López",
+    "CEB-003": "María Fernanda Cruz Salazar",
+    "CEB-004": "Luis Alberto Medina Torres",
+    "CEB-005": "Mónica Villavicienzo Hurtado",
+    "CEB-ANA-001": "Ana Sofía Gómez López",
+    "CEB-JUAN-002": "Juan Pablo Rodríguez López",
+    "CEB-MARIA-003": "María Fernanda Cruz Salazar",
+    "CEB-LUIS-004": "Luis Alberto Medina Torres",
+    "CEB-MONICA-005": "Mónica Villavicienzo Hurtado",
+}
+
+# Segmentos de los códigos aleatorios del frontend (CEB-<NOMBRE>-<XXXX>)
+SEGMENTOS_DEMO = {
+    "ANA": "Ana Sofía Gómez López", "001": "Ana Sofía Gómez López",
+    "JUAN": "Juan Pablo Rodríguez López", "002": "Juan Pablo Rodríguez López",
+    "MARIA": "María Fernanda Cruz Salazar", "FERNANDA": "María Fernanda Cruz Salazar",
+    "003": "María Fernanda Cruz Salazar",
+    "LUIS": "Luis Alberto Medina Torres", "004": "Luis Alberto Medina Torres",
+    "MONICA": "Mónica Villavicienzo Hurtado", "005": "Mónica Villavicienzo Hurtado",
+}
+
+_NO_ENCONTRADO = object()
+
+
+class ResolvedorCodigos:
+    """
+    Resuelve un código de certificado a la proyección del estudiante:
+      {codigo, codigo_unico, estudiante_id, nombre_completo, titulo, fecha_emision, estado}
+
+    La consulta usa el índice único de Certificado.codigo y trae solo las columnas
+    necesarias. Los resultados (también los códigos inexistentes) se guardan en una
+    caché LRU en memoria con TTL; la emisión o revocación de un certificado invalida
+    su entrada. El TTL acota cuánto puede tardar otro proceso del servidor en ver
+    esos cambios.
+    """
+
+    def __init__(self, max_entradas: int = 10000, ttl: int = 300, demo: bool = True):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.demo = demo
+        self._entradas = OrderedDict()  # codigo -> (timestamp, proyeccion | _NO_ENCONTRADO)
+        self._lock = threading.Lock()
+        self._contadores = {
+            'hits': 0,
+            'misses': 0,
+            'invalidaciones': 0,
+        }
+
+    @staticmethod
+    def desde_app(app) -> 'ResolvedorCodigos':
+        """Devuelve el resolvedor asociado a la aplicación, creándolo la primera vez."""
+        resolvedor = app.extensions.get('resolvedor_codigos')
+        if resolvedor is None:
+            resolvedor = ResolvedorCodigos(
+                max_entradas=app.config.get('RESOLVEDOR_CODIGOS_MAX_ENTRADAS', 10000),
+                ttl=app.config.get('RESOLVEDOR_CODIGOS_TTL', 300),
+                demo=app.config.get('RESOLVEDOR_CODIGOS_DEMO', True),
+            )
+            app.extensions['resolvedor_codigos'] = resolvedor
+        return resolvedor
+
+    # API PÚBLICA
+
+    def resolver(self, codigo: str) -> dict | None:
+        """Retorna la proyección del certificado o None si el código no existe."""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(codigo)
+            if entrada is not None and ahora - entrada[0] < self.ttl:
+                self._entradas.move_to_end(codigo)
+                self._contadores['hits'] += 1
+                return None if entrada[1] is _NO_ENCONTRADO else entrada[1]
+            self._contadores['misses'] += 1
+
+        proyeccion = self._consultar(codigo)
+        if proyeccion is None and self.demo:
+            proyeccion = self._resolver_demo(codigo)
+
+        with self._lock:
+            self._entradas[codigo] = (ahora, _NO_ENCONTRADO if proyeccion is None else proyeccion)
+            self._entradas.move_to_end(codigo)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return proyeccion
+
+    def invalidar(self, *codigos: str):
+        """Descarta las entradas de los códigos emitidos o revocados."""
+        with self._lock:
+            for codigo in codigos:
+                if self._entradas.pop(codigo, None) is not None:
+                    self._contadores['invalidaciones'] += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._contadores)
+            datos['entradas'] = len(self._entradas)
+        return datos
+
+    # CONSULTAS
+
+    @staticmethod
+    def _consultar(codigo: str) -> dict | None:
+        with sesion_lectura(db) as sesion:
+            fila = sesion.query(
+                Certificado.codigo, Certificado.codigo_unico, Certificado.titulo, Certificado.fecha_emision,
+                Certificado.estudiante_id, Certificado.estado, Estudiante.nombre_completo
+            ).outerjoin(Estudiante, Estudiante.id == Certificado.estudiante_id).filter(
+                Certificado.codigo == codigo
+            ).first()
+
+        if fila is None:
+            return None
+        return {
+            'codigo': fila.codigo,
+            'codigo_unico': fila.codigo_unico,
+            'estudiante_id': fila.estudiante_id,
+            'nombre_completo': fila.nombre_completo,
+            'titulo': fila.titulo,
+            'fecha_emision': fila.fecha_emision,
+            'estado': fila.estado,
+        }
+
+    @staticmethod
+    def _resolver_demo(codigo: str) -> dict | None:
+        nombre = CODIGOS_DEMO.get(codigo)
+        if nombre is None:
+            # Códigos CEB-<NOMBRE>-<XXXX>: búsqueda exacta de cada segmento
+            for segmento in codigo.upper().split('-')[:3]:
+                nombre = SEGMENTOS_DEMO.get(segmento)
+                if nombre is not None:
+                    break
+        if nombre is None:
+            return None
+        return {
+            'codigo': codigo,
+            'codigo_unico': None,
+            'estudiante_id': None,
+            'nombre_completo': nombre,
+            'titulo': None,
+            'fecha_emision': None,
+            'estado': 'Válido',
+        }
@@ -0,0 +1,168 @@
+import time
+import bisect
+from array import array
+import threading
+from app.models import db
+from app.models.revocacion import Revocacion
+from app.utils.base_datos import sesion_lectura
+from app.utils.filtro_bloom import FiltroBloom
+
+
+class RegistroRevocaciones:
+    """
+    Copia en memoria de la tabla revocaciones para los verificadores de alto volumen:
+      - un filtro de Bloom que descarta casi todos los códigos no revocados con unos
+        pocos accesos a un bytearray;
+      - la lista ordenada de códigos revocados, que confirma exactamente (bisect) los
+        positivos del filtro;
+      - el log (version, codigo) en orden de versión, del que salen los deltas que
+        piden las cachés y los verificadores de borde.
+
+    Se actualiza de forma incremental: cada sincronización trae solo las filas con
+    version mayor a la última aplicada, como mucho una vez cada `intervalo` segundos.
+    Las lecturas no toman el lock: el filtro y la lista nuevos se publican
+    reemplazando la referencia, y el log solo crece.
+
+    Memoria por código revocado, además de la cadena (compartida por la lista y el
+    log): ~1,2 bytes de filtro, 8 de la lista, 8 del log de códigos y 8 de la versión
+    (array de enteros de 64 bits). Un set del mismo tamaño ocupa 32-64 bytes por código
+    en su tabla; sin el filtro, los negativos pagarían una búsqueda binaria completa.
+    `python benchmark.py revocaciones` mide ambas cosas.
+    """
+
+    def __init__(self, intervalo: int = 30, capacidad_inicial: int = 1024, tasa_falsos: float = 0.01):
+        self.intervalo = intervalo
+        self.tasa_falsos = tasa_falsos
+        self.version = 0
+        self._filtro = FiltroBloom(capacidad_inicial, tasa_falsos)
+        self._ordenados = []   # códigos revocados, ordenados
+        self._versiones = array('q')   # versiones del log, ascendentes
+        self._codigos = []     # código de cada versión del log
+        self._sincronizado_en = None
+        self._lock = threading.Lock()
+        self._publicar_consulta()
+
+    @staticmethod
+    def desde_app(app) -> 'RegistroRevocaciones':
+        """Devuelve el registro asociado a la aplicación, creándolo la primera vez."""
+        registro = app.extensions.get('registro_revocaciones')
+        if registro is None:
+            registro = RegistroRevocaciones(
+                intervalo=app.config.get('REVOCACIONES_INTERVALO', 30),
+                tasa_falsos=app.config.get('REVOCACIONES_TASA_FALSOS', 0.01),
+            )
+            app.extensions['registro_revocaciones'] = registro
+        return registro
+
+    # CONSULTA
+
+    # esta_revocado(codigo_unico) -> bool: exacto; el filtro responde los negativos y la
+    # lista ordenada confirma los positivos. Es un atributo que se vuelve a publicar al
+    # reemplazar el filtro (ver _publicar_consulta), no un método: en la ruta caliente
+    # se ahorra la llamada ligada y las búsquedas de atributos.
+
+    def _publicar_consulta(self):
+        self.esta_revocado = self._filtro.consulta(confirmar=self._en_lista)
+
+    def delta(self, desde: int, limite: int = 1000) -> dict:
+        """
+        Revocaciones con version > `desde`, en orden. Si hay más de `limite`, 'version'
+        es la última incluida y 'completo' es False: se pide de nuevo desde ahí.
+        """
+        version = self.version
+        inicio = bisect.bisect_right(self._versiones, desde)
+        fin = min(bisect.bisect_right(self._versiones, version), inicio + limite)
+        revocados = [
+            {'version': v, 'codigo_unico': c}
+            for v, c in zip(self._versiones[inicio:fin], self._codigos[inicio:fin])
+        ]
+        completo = fin >= bisect.bisect_right(self._versiones, version)
+        return {
+            'desde': desde,
+            'version': version if completo else revocados[-1]['version'],
+            'completo': completo,
+            'revocados': revocados,
+        }
+
+    def estadisticas(self) -> dict:
+        return {
+            'version': self.version,
+            'revocados': len(self._ordenados),
+            'filtro_bytes': len(self._filtro.bits),
+            'filtro_k': self._filtro.k,
+            'filtro_tasa_estimada': round(self._filtro.tasa_estimada(), 6),
+            'edad_s': None if self._sincronizado_en is None else round(time.monotonic() - self._sincronizado_en, 1),
+        }
+
+    # ACTUALIZACIÓN
+
+    def sincronizar_si_vence(self):
+        """Sincroniza si pasó el intervalo. Requiere un contexto de aplicación."""
+        sincronizado_en = self._sincronizado_en
+        if sincronizado_en is not None and time.monotonic() - sincronizado_en < self.intervalo:
+            return
+        # Un solo hilo sincroniza; los demás siguen con el estado anterior mientras tanto
+        if not self._lock.acquire(blocking=sincronizado_en is None):
+            return
+        try:
+            if self._sincronizado_en is sincronizado_en:
+                self._sincronizar()
+        finally:
+            self._lock.release()
+
+    def sincronizar(self):
+        """Trae las revocaciones nuevas ya mismo. Requiere un contexto de aplicación."""
+        with self._lock:
+            self._sincronizar()
+
+    def registrar_local(self, codigo_unico: str):
+        """
+        Aplica una revocación hecha en este proceso sin esperar a la próxima
+        sincronización. Solo entra al filtro y a la lista: el log y la versión avanzan
+        al sincronizar, para que los deltas sigan en orden.
+        """
+        with self._lock:
+            self._agregar([codigo_unico])
+
+    def _sincronizar(self):
+        # Las versiones se hacen visibles en orden (SQLite serializa las escrituras; en
+        # PostgreSQL revocar_certificado toma un lock de tabla hasta el commit), así que
+        # basta con pedir las mayores a la última aplicada
+        with sesion_lectura(db) as sesion:
+            filas = sesion.query(Revocacion.version, Revocacion.codigo_unico).filter(
+                Revocacion.version > self.version
+            ).order_by(Revocacion.version).all()
+
+        self._agregar([codigo for _, codigo in filas])
+        for version, codigo in filas:
+            self._versiones.append(version)
+            self._codigos.append(codigo)
+        if filas:
+            self.version = filas[-1][0]
+        self._sincronizado_en = time.monotonic()
+
+    def _agregar(self, codigos: list):
+        nuevos = [codigo for codigo in set(codigos) if not self._en_lista(codigo)]
+        if not nuevos:
+            return
+        total = len(self._ordenados) + len(nuevos)
+        if total > self._filtro.capacidad:
+            # Filtro nuevo con capacidad de sobra; se publica ya completo
+            filtro = FiltroBloom(max(self._filtro.capacidad * 2, total * 2), self.tasa_falsos)
+            for codigo in self._ordenados:
+                filtro.agregar(codigo)
+        else:
+            filtro = self._filtro
+        # Primero el filtro: un lector que vea el código en la lista ya lo ve en el filtro
+        for codigo in nuevos:
+            filtro.agregar(codigo)
+        if filtro is not self._filtro:
+            self._filtro = filtro
+            self._publicar_consulta()
+        # sorted() sobre dos tramos ya ordenados es lineal; la lista nueva se publica entera
+        self._ordenados = sorted(self._ordenados + sorted(nuevos))
+
+    def _en_lista(self, codigo: str) -> bool:
+        ordenados = self._ordenados
+        i = bisect.bisect_left(ordenados, codigo)
+        return i < len(ordenados) and ordenados[i] == codigo
@@ -0,0 +1,110 @@
+import hmac
+import json
+import base64
+import hashlib
+from app.services.revocacion_service import RegistroRevocaciones
+
+VERSION_TOKEN = 1
+# Solo con DEBUG: es público, cualquiera podría firmar tokens válidos con él
+SECRETO_DESARROLLO = 'certificado-token-secret'
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b'=').decode('ascii')
+
+
+def _desde_b64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+class TokenCertificados:
+    """
+    Tokens firmados que acompañan a cada certificado emitido (impresos en el PDF y en
+    su QR) y se verifican sin base de datos ni archivo:
+
+        <payload base64url>.<HMAC-SHA256 base64url>
+
+    El payload es un JSON compacto con la versión, el código único, el estudiante, la
+    matrícula, el título y la fecha de emisión. La firma usa CERTIFICADO_TOKEN_SECRETO,
+    así que cualquier verificador que tenga el secreto (otra réplica, un servidor de
+    borde) valida el token sin consultar nada.
+
+    Lo único que cambia después de emitir es la revocación, que se consulta en el
+    RegistroRevocaciones en memoria (sincronizado por versión, sin una consulta por
+    verificación).
+    """
+
+    def __init__(self, secreto: str, revocaciones: RegistroRevocaciones):
+        self._clave = secreto.encode('utf-8')
+        self.revocaciones = revocaciones
+
+    @staticmethod
+    def desde_app(app) -> 'TokenCertificados':
+        """Devuelve el firmador asociado a la aplicación, creándolo la primera vez."""
+        tokens = app.extensions.get('token_certificados')
+        if tokens is None:
+            secreto = app.config.get('CERTIFICADO_TOKEN_SECRETO')
+            if not secreto:
+                if not app.config.get('DEBUG'):
+                    raise RuntimeError("CERTIFICADO_TOKEN_SECRETO no está configurado: "
+                                       "no se firman ni verifican tokens de certificados sin él")
+                secreto = SECRETO_DESARROLLO
+            tokens = TokenCertificados(
+                secreto=secreto,
+                revocaciones=RegistroRevocaciones.desde_app(app),
+            )
+            app.extensions['token_certificados'] = tokens
+        return tokens
+
+    # API PÚBLICA
+
+    def firmar(self, codigo_unico: str, nombre_completo: str, matricula: str, titulo: str, fecha_emision) -> str:
+        """Token del certificado. `fecha_emision` es un datetime; se firma solo la fecha."""
+        payload = _b64(json.dumps({
+            'v': VERSION_TOKEN,
+            'c': codigo_unico,
+            'e': nombre_completo,
+            'm': matricula,
+            't': titulo,
+            'f': fecha_emision.strftime('%Y-%m-%d'),
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        return f"{payload}.{self._firma(payload)}"
+
+    def datos_pdf(self, base_url: str, codigo_unico: str, nombre_completo: str, matricula: str,
+                  titulo: str, fecha_emision) -> dict:
+        """Campos `token` y `url_token` (contenido del QR) para generar_certificado_registro."""
+        token = self.firmar(codigo_unico, nombre_completo, matricula, titulo, fecha_emision)
+        return {'token': token, 'url_token': f"{base_url}/api/v1/certificados/token/{token}"}
+
+    def verificar(self, token: str) -> tuple[bool, str, dict | None]:
+        """
+        Valida la firma y consulta el registro de revocaciones. Requiere un contexto de
+        aplicación (la sincronización periódica del registro lee la base de datos).
+        Retorna: (success, message, {codigo_unico, estudiante, matricula, titulo, emision})
+        """
+        payload, _, firma = token.partition('.')
+        if not token.isascii() or not payload or not firma or not hmac.compare_digest(firma, self._firma(payload)):
+            return False, "Token de certificado inválido (firma no coincide).", None
+        try:
+            campos = json.loads(_desde_b64(payload))
+        except ValueError:
+            return False, "Token de certificado inválido (contenido ilegible).", None
+        if campos.get('v') != VERSION_TOKEN:
+            return False, "Versión de token no soportada.", None
+
+        data = {
+            'codigo_unico': campos['c'],
+            'estudiante': campos['e'],
+            'matricula': campos['m'],
+            'titulo': campos['t'],
+            'emision': campos['f'],
+        }
+        self.revocaciones.sincronizar_si_vence()
+        if self.revocaciones.esta_revocado(campos['c']):
+            return False, "Certificado encontrado, pero su estado es: Revocado.", data
+        return True, "Firma del certificado válida.", data
+
+    # INTERNOS
+
+    def _firma(self, payload: str) -> str:
+        return _b64(hmac.new(self._clave, payload.encode('ascii'), hashlib.sha256).digest())
@@ -0,0 +1,48 @@
+import os
+import uuid
+
+SUFIJO_TEMPORAL = '.tmp'
+
+
+def ruta_temporal(ruta: str) -> str:
+    """Archivo temporal en la misma carpeta (y sistema de archivos) que `ruta`."""
+    carpeta, nombre = os.path.split(ruta)
+    return os.path.join(carpeta, f".{nombre}.{os.getpid()}.{uuid.uuid4().hex[:8]}{SUFIJO_TEMPORAL}")
+
+
+def fsync_directorio(carpeta: str):
+    """Persiste la entrada de directorio tras un rename (no disponible en Windows)."""
+    try:
+        fd = os.open(carpeta, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def escribir_atomico(ruta: str, contenido: bytes, sincronizar: bool = True):
+    """
+    Escribe `contenido` en `ruta` sin que nunca exista un archivo a medio escribir:
+    una sola escritura a un temporal, fsync, y os.replace() atómico sobre el destino.
+    Si algo falla, el temporal se borra y `ruta` queda como estaba.
+    """
+    temporal = ruta_temporal(ruta)
+    try:
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+            f.flush()
+            if sincronizar:
+                os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    if sincronizar:
+        fsync_directorio(os.path.dirname(ruta) or '.')
@@ -1,57 +1,74 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import jsonify
 from app.services.auth_service import AuthService
 
-def token_requerido(f):
+def _proteger(f, tipos):
     """
-    Decorador para proteger rutas, asegurando que un token JWT válido esté presente
-    y que el usuario asociado exista.
+    Exige un token JWT válido de uno de los `tipos` ('access' o 'temp', el de 5 minutos
+    previo a la MFA) cuyo usuario exista y esté activo; pasa el usuario al endpoint.
     """
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        #Obtener el token del encabezado Authorization
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                #Esperamos 'Bearer <token>'
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                pass #Si no hay 'Bearer ' o el formato es incorrecto, token sigue siendo None
+        #Decodificar el token una sola vez por request (compartido con mfa_requerido/rol_requerido)
+        contexto = AuthService.contexto_request()
         
-        if not token:
+        if not contexto['token']:
             return jsonify({
                 'success': False, 
                 'message': 'Token JWT no encontrado o formato incorrecto.'
             }), 401 
         
-        #Verificar y decodificar el token
-        valid, payload = AuthService.verificar_token(token)
-        
-        if not valid:
-            error_message = payload.get('error', 'Token inválido')
+        if not contexto['valido']:
+            error_message = contexto['payload'].get('error', 'Token inválido')
             return jsonify({
                 'success': False, 
                 'message': error_message
             }), 401
+
+        #El token temporal previo a la MFA solo sirve para completarla
+        if contexto['payload'].get('type') not in tipos:
+            return jsonify({
+                'success': False,
+                'message': 'Token incorrecto. Se requiere un token de acceso.'
+            }), 401
             
-        #Obtener el usuario
-        user_id = payload.get('user_id')
-        usuario_actual = AuthService.obtener_usuario_por_id(user_id)
+        #Obtener el usuario (caché de proyecciones; la DB solo se consulta si no está)
+        usuario_actual = AuthService.usuario_de_request()
         
         if not usuario_actual:
             return jsonify({
                 'success': False, 
                 'message': 'Usuario asociado al token no encontrado.'
             }), 401 
+
+        if not usuario_actual.is_active:
+            return jsonify({
+                'success': False,
+                'message': 'Usuario inactivo.'
+            }), 403
         
-        #Pasar el objeto Usuario al endpoint
+        #Pasar el usuario al endpoint
         return f(usuario_actual, *args, **kwargs)
 
     return decorated
 
 
+def token_requerido(f):
+    """
+    Decorador para proteger rutas, asegurando que un token de acceso JWT válido esté
+    presente y que el usuario asociado exista y esté activo.
+    """
+    return _proteger(f, ('access',))
+
+
+def token_mfa_requerido(f):
+    """
+    Como token_requerido, pero acepta también el token temporal que entrega el login
+    cuando falta la MFA. Solo para la ruta que la completa (/mfa/verify).
+    """
+    return _proteger(f, ('access', 'temp'))
+
+
 def mfa_requerido(f):
     """
     Decorador para proteger rutas sensibles. 
@@ -61,11 +78,8 @@ def mfa_requerido(f):
     @wraps(f)
     @token_requerido  # Asegura que el token sea válido primero
     def decorated(usuario_actual, *args, **kwargs):
-        # Obtener el token del encabezado (ya validado por @token_requerido)
-        token = request.headers['Authorization'].split(" ")[1]
-        
-        # Decodificar el token (si pasó @token_requerido, es válido)
-        _, payload = AuthService.verificar_token(token)
+        # Payload ya decodificado por @token_requerido en esta misma petición
+        payload = AuthService.contexto_request()['payload']
         
         # Verificar si el usuario tiene MFA activada
         if usuario_actual.mfa_enabled:
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+# Nombre del bind de solo lectura (SQLALCHEMY_BINDS) para las rutas públicas
+BIND_LECTURA = 'lectura'
+
+
+def en_bloques(valores: list, tamano: int = 500):
+    """Parte una lista para no superar el límite de parámetros de SQLite en IN (...)."""
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def _es_sqlite(url) -> bool:
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def _es_sqlite_en_memoria(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def opciones_motor(url: str, config) -> dict:
+    """
+    Opciones de create_engine a partir de Config: tamaño del pool, desborde,
+    espera por una conexión, pre-ping y reciclado. SQLite en memoria usa un
+    pool de una sola conexión y no admite estas opciones.
+    """
+    if _es_sqlite_en_memoria(url):
+        return {}
+    opciones = {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+    }
+    if _es_sqlite(url):
+        # Espera del driver ante un bloqueo (además del PRAGMA busy_timeout)
+        opciones['connect_args'] = {'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}
+    return opciones
+
+
+def configurar_binds(app):
+    """
+    Completa SQLALCHEMY_ENGINE_OPTIONS y declara el bind de solo lectura antes
+    de db.init_app(). El bind apunta a DATABASE_URL_LECTURA (p. ej. una réplica)
+    o, si no se indica, a la misma base con su propio pool.
+    """
+    config = app.config
+    url = config['SQLALCHEMY_DATABASE_URI']
+    url_lectura = config.get('DATABASE_URL_LECTURA') or url
+
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for clave, valor in opciones_motor(url, config).items():
+        config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault(clave, valor)
+
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    if BIND_LECTURA not in binds and not _es_sqlite_en_memoria(url_lectura):
+        binds[BIND_LECTURA] = {'url': url_lectura, **opciones_motor(url_lectura, config)}
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def configurar_sqlite(engine, config, solo_lectura: bool = False):
+    """
+    Aplica los PRAGMA de SQLite en cada conexión nueva (evento 'connect'):
+    WAL para que los lectores no bloqueen al escritor, synchronous, busy_timeout
+    y mmap_size. En el motor de lectura se activa query_only.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(dbapi_conexion, _registro):
+        cursor = dbapi_conexion.cursor()
+        try:
+            if config.get('SQLITE_WAL', True):
+                cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute(f"PRAGMA synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+            cursor.execute(f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+            cursor.execute(f"PRAGMA mmap_size={int(config.get('SQLITE_MMAP_SIZE', 0))}")
+            if solo_lectura:
+                cursor.execute('PRAGMA query_only=ON')
+        finally:
+            cursor.close()
+
+
+def motor_lectura(db):
+    """Motor de solo lectura; si no hay bind de lectura, el principal. Requiere contexto de aplicación."""
+    return db.engines.get(BIND_LECTURA, db.engine)
+
+
+@contextmanager
+def sesion_lectura(db):
+    """
+    Sesión corta sobre el motor de solo lectura para las rutas públicas
+    (verificación y descarga). Los objetos cargados solo son válidos dentro del bloque.
+    """
+    with Session(motor_lectura(db)) as sesion:
+        yield sesion
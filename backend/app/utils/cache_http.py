@@ -0,0 +1,31 @@
+from flask import request
+from werkzeug.http import is_resource_modified
+
+
+def no_modificado(etag: str | None, last_modified=None) -> bool:
+    """
+    True si el cliente ya tiene esta versión (If-None-Match / If-Modified-Since).
+    Se evalúa antes de generar o leer el contenido, para responder 304 sin hacer el trabajo.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def aplicar_cache_control(respuesta, max_age: int, publico: bool = True):
+    """
+    Cache-Control según el tiempo de vida configurado: max_age > 0 permite guardar
+    y reutilizar la respuesta ese tiempo; 0 obliga a revalidar siempre (con ETag
+    la revalidación es un 304 sin cuerpo).
+    """
+    if max_age > 0:
+        if publico:
+            respuesta.cache_control.public = True
+        else:
+            respuesta.cache_control.private = True
+        respuesta.cache_control.max_age = max_age
+        respuesta.cache_control.no_cache = None
+    else:
+        respuesta.cache_control.no_cache = True
+        respuesta.cache_control.max_age = None
+    return respuesta
@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class CacheHashArchivos:
+    """
+    Caché de hashes de archivos indexada por (ruta, tamaño, mtime_ns, inodo).
+
+    Mientras el stat() del archivo no cambie se devuelve el último digest calculado,
+    así que una verificación cuesta una sola llamada a stat(). Si el archivo se
+    reescribe o se reemplaza, su stat cambia y el hash se vuelve a calcular.
+
+    Como un atacante podría modificar el contenido conservando tamaño y mtime, se
+    puede activar un "scrub" periódico en segundo plano que vuelve a calcular el
+    hash de todas las entradas y corrige las que no coincidan.
+    """
+
+    def __init__(self, max_entradas: int = 50000):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # ruta -> (clave_stat, digest)
+        self._lock = threading.Lock()
+        self._hilo_scrub = None
+        self._detener_scrub = threading.Event()
+        self._contadores = {
+            'hits': 0,
+            'misses': 0,
+            'scrubs': 0,
+            'alteraciones_detectadas': 0,
+        }
+
+    @staticmethod
+    def desde_app(app) -> 'CacheHashArchivos':
+        """Devuelve la caché asociada a la aplicación, creándola la primera vez."""
+        cache = app.extensions.get('cache_integridad')
+        if cache is None:
+            cache = CacheHashArchivos(max_entradas=app.config.get('HASH_CACHE_MAX_ENTRADAS', 50000))
+            app.extensions['cache_integridad'] = cache
+        return cache
+
+    @staticmethod
+    def clave_stat(info: os.stat_result) -> tuple:
+        return (info.st_size, info.st_mtime_ns, info.st_ino)
+
+    def obtener_hash(self, ruta: str, calcular) -> str | None:
+        """
+        Retorna el hash del archivo. `calcular(ruta)` solo se llama si no hay una
+        entrada válida para el stat actual. Lanza FileNotFoundError si el archivo no existe.
+        """
+        clave = self.clave_stat(os.stat(ruta))
+
+        with self._lock:
+            entrada = self._entradas.get(ruta)
+            if entrada is not None and entrada[0] == clave:
+                self._entradas.move_to_end(ruta)
+                self._contadores['hits'] += 1
+                return entrada[1]
+            self._contadores['misses'] += 1
+
+        digest = calcular(ruta)
+        if digest is not None:
+            # Si el archivo cambió mientras se leía, no se guarda: la próxima vez se recalcula
+            try:
+                if self.clave_stat(os.stat(ruta)) == clave:
+                    self._guardar(ruta, clave, digest)
+            except FileNotFoundError:
+                pass
+        return digest
+
+    def registrar(self, ruta: str, digest: str):
+        """Guarda un hash ya conocido (p. ej. el calculado al emitir el certificado)."""
+        try:
+            clave = self.clave_stat(os.stat(ruta))
+        except FileNotFoundError:
+            return
+        self._guardar(ruta, clave, digest)
+
+    def invalidar(self, ruta: str):
+        with self._lock:
+            self._entradas.pop(ruta, None)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._contadores)
+            datos['entradas'] = len(self._entradas)
+        datos['scrub_activo'] = self._hilo_scrub is not None and self._hilo_scrub.is_alive()
+        return datos
+
+    def _guardar(self, ruta, clave, digest):
+        with self._lock:
+            self._entradas[ruta] = (clave, digest)
+            self._entradas.move_to_end(ruta)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    # SCRUB PERIÓDICO
+
+    def scrub(self, calcular, logger=None) -> int:
+        """
+        Recalcula el hash de todas las entradas. Retorna cuántas tenían un hash
+        distinto con el mismo stat (contenido alterado sin cambiar tamaño/mtime).
+        """
+        with self._lock:
+            rutas = list(self._entradas.items())
+
+        alteradas = 0
+        for ruta, (clave, digest) in rutas:
+            try:
+                actual = calcular(ruta)
+                clave_actual = self.clave_stat(os.stat(ruta))
+            except FileNotFoundError:
+                self.invalidar(ruta)
+                continue
+            if actual is None:
+                continue
+            if clave_actual == clave and actual != digest:
+                alteradas += 1
+                if logger:
+                    logger.warning(f"Scrub de integridad: {ruta} cambió de contenido sin cambiar su stat")
+            self._guardar(ruta, clave_actual, actual)
+
+        with self._lock:
+            self._contadores['scrubs'] += 1
+            self._contadores['alteraciones_detectadas'] += alteradas
+        return alteradas
+
+    def iniciar_scrub(self, intervalo_segundos: float, calcular, logger=None):
+        """Ejecuta scrub() cada `intervalo_segundos` en un hilo en segundo plano."""
+        if self._hilo_scrub is not None and self._hilo_scrub.is_alive():
+            return
+
+        def bucle():
+            while not self._detener_scrub.wait(intervalo_segundos):
+                try:
+                    self.scrub(calcular, logger)
+                except Exception as e:
+                    if logger:
+                        logger.error(f"Error en scrub de integridad: {str(e)}")
+
+        self._detener_scrub.clear()
+        self._hilo_scrub = threading.Thread(target=bucle, name='scrub-integridad', daemon=True)
+        self._hilo_scrub.start()
+
+    def detener_scrub(self):
+        self._detener_scrub.set()
@@ -0,0 +1,73 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Caché LRU en memoria, acotada por número de entradas, con expiración por entrada.
+    Cada valor expira a los `ttl` segundos o antes si se indica `expira_en`
+    (timestamp de time.time(), p. ej. el 'exp' de un JWT).
+    """
+
+    def __init__(self, max_entradas: int = 10000, ttl: float = 60):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self._contadores = {
+            'hits': 0,
+            'misses': 0,
+            'expirados': 0,
+            'invalidaciones': 0,
+        }
+
+    @staticmethod
+    def desde_app(app, nombre: str, max_entradas: int = 10000, ttl: float = 60) -> 'CacheTTL':
+        """Devuelve la caché `nombre` asociada a la aplicación, creándola la primera vez."""
+        cache = app.extensions.get(nombre)
+        if cache is None:
+            cache = CacheTTL(max_entradas=max_entradas, ttl=ttl)
+            app.extensions[nombre] = cache
+        return cache
+
+    def obtener(self, clave):
+        """Retorna el valor guardado o None si no existe o expiró."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self._contadores['misses'] += 1
+                return None
+            if entrada[0] <= time.time():
+                del self._entradas[clave]
+                self._contadores['expirados'] += 1
+                self._contadores['misses'] += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self._contadores['hits'] += 1
+            return entrada[1]
+
+    def guardar(self, clave, valor, expira_en: float | None = None):
+        limite = time.time() + self.ttl
+        if expira_en is not None:
+            limite = min(limite, expira_en)
+        with self._lock:
+            self._entradas[clave] = (limite, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._lock:
+            if self._entradas.pop(clave, None) is not None:
+                self._contadores['invalidaciones'] += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            datos = dict(self._contadores)
+            datos['entradas'] = len(self._entradas)
+        return datos
@@ -0,0 +1,60 @@
+import threading
+from flask import g, has_request_context
+from sqlalchemy import event
+
+
+class ContadorConsultas:
+    """
+    Cuenta las sentencias SQL que ejecuta el hilo actual en todos los motores de
+    `db` dentro de un bloque `with` (los hilos en segundo plano, como el escritor
+    de logs, no cuentan). Requiere un contexto de aplicación.
+
+        with ContadorConsultas(db) as consultas:
+            cliente.get('/api/v1/certificados/verificar/...')
+        assert consultas.total == 1
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.sentencias = []
+        self._hilo = None
+        self._motores = []
+
+    def __enter__(self) -> 'ContadorConsultas':
+        self._hilo = threading.get_ident()
+        self._motores = list(self.db.engines.values())
+        for motor in self._motores:
+            event.listen(motor, 'before_cursor_execute', self._anotar)
+        return self
+
+    def __exit__(self, *exc):
+        for motor in self._motores:
+            event.remove(motor, 'before_cursor_execute', self._anotar)
+        self._motores = []
+
+    @property
+    def total(self) -> int:
+        return len(self.sentencias)
+
+    def _anotar(self, conexion, cursor, sentencia, parametros, contexto, executemany):
+        if threading.get_ident() == self._hilo:
+            self.sentencias.append(sentencia)
+
+
+def instrumentar_app(app, db):
+    """
+    Cuenta las sentencias SQL de cada petición y las devuelve en la cabecera
+    X-SQL-Consultas (se activa con SQL_CONTAR_CONSULTAS; pensado para desarrollo).
+    """
+    def anotar(*_):
+        if has_request_context():
+            g.sql_consultas = g.get('sql_consultas', 0) + 1
+
+    with app.app_context():
+        for motor in db.engines.values():
+            event.listen(motor, 'before_cursor_execute', anotar)
+
+    @app.after_request
+    def cabecera_consultas(respuesta):
+        respuesta.headers['X-SQL-Consultas'] = str(g.get('sql_consultas', 0))
+        return respuesta
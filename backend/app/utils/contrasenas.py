@@ -0,0 +1,60 @@
+import bcrypt
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash
+
+PREFIJOS_BCRYPT = ('$2a$', '$2b$', '$2y$')
+# bcrypt solo usa los primeros 72 bytes de la contraseña
+MAX_BYTES_BCRYPT = 72
+
+
+def generar_hash(password: str, rondas: int = 12) -> str:
+    """Hash bcrypt de la contraseña con `rondas` como factor de trabajo (2^rondas iteraciones)."""
+    return bcrypt.hashpw(password.encode('utf-8')[:MAX_BYTES_BCRYPT], bcrypt.gensalt(rounds=rondas)).decode('utf-8')
+
+
+def verificar_hash(password: str, password_hash: str) -> bool:
+    """
+    Verifica la contraseña contra un hash bcrypt o, para cuentas creadas antes de
+    unificar los algoritmos, contra un hash de werkzeug (scrypt:/pbkdf2:).
+    """
+    if not password_hash:
+        return False
+    if password_hash.startswith(PREFIJOS_BCRYPT):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8')[:MAX_BYTES_BCRYPT], password_hash.encode('utf-8'))
+        except ValueError:
+            return False
+    return check_password_hash(password_hash, password)
+
+
+def rondas_de_hash(password_hash: str) -> int | None:
+    """Factor de trabajo de un hash bcrypt ('$2b$12$...' -> 12); None si no es bcrypt."""
+    if not password_hash or not password_hash.startswith(PREFIJOS_BCRYPT):
+        return None
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+# Con la aplicación activa el cálculo se hace en el pool de PasswordService, que
+# create_app registra en app.extensions['password_service']; fuera de un contexto de
+# aplicación (scripts) se calcula directamente con el factor por defecto.
+
+def _servicio():
+    return current_app.extensions.get('password_service') if has_app_context() else None
+
+
+def hashear_password(password: str) -> str:
+    servicio = _servicio()
+    return servicio.hashear(password) if servicio else generar_hash(password)
+
+
+def verificar_password(password: str, password_hash: str) -> bool:
+    servicio = _servicio()
+    return servicio.verificar(password, password_hash) if servicio else verificar_hash(password, password_hash)
+
+
+def necesita_rehash(password_hash: str) -> bool:
+    servicio = _servicio()
+    return servicio.necesita_rehash(password_hash) if servicio else False
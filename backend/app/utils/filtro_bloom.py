@@ -0,0 +1,62 @@
+import math
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom sobre un bytearray: `clave in filtro` es False con seguridad si la
+    clave nunca se agregó, y True con una probabilidad de falso positivo cercana a
+    `tasa_falsos` mientras no se superen `capacidad` claves.
+
+    Las k posiciones salen de un solo hash() de la clave (doble hashing: h + i*h2 mod m).
+    hash() de un str se calcula una vez y queda guardado en el objeto, y está aleatorizado
+    por proceso: el filtro no se comparte entre procesos, cada uno lo construye con las
+    mismas claves (los workers lo heredan del maestro en el fork).
+    """
+
+    def __init__(self, capacidad: int, tasa_falsos: float = 0.01):
+        self.capacidad = max(1, capacidad)
+        self.tasa_falsos = tasa_falsos
+        self.bits_totales = max(8, math.ceil(-self.capacidad * math.log(tasa_falsos) / math.log(2) ** 2))
+        self.k = max(1, round(self.bits_totales / self.capacidad * math.log(2)))
+        self.bits = bytearray((self.bits_totales + 7) // 8)
+        self.elementos = 0
+        self.contiene = self.consulta()
+
+    def agregar(self, clave):
+        h = hash(clave)
+        h2 = (h >> 32) | 1
+        bits, m = self.bits, self.bits_totales
+        for i in range(self.k):
+            p = (h + i * h2) % m
+            bits[p >> 3] |= 1 << (p & 7)
+        self.elementos += 1
+
+    def __contains__(self, clave) -> bool:
+        return self.contiene(clave)
+
+    def consulta(self, confirmar=None):
+        """
+        Consulta como función con el bytearray, m y k ligados como valores por defecto:
+        sin búsquedas de atributos ni llamadas anidadas, el negativo típico cuesta poco
+        más que el hash() de la clave. Si se da `confirmar`, se llama con la clave solo
+        cuando el filtro responde que sí (p. ej. para descartar falsos positivos).
+        `agregar` modifica el mismo bytearray, así que la función ve las claves nuevas.
+        """
+        def contiene(clave, bits=self.bits, m=self.bits_totales, k=self.k) -> bool:
+            # La primera posición se prueba fuera del bucle: con el filtro a menos de la
+            # mitad de su capacidad casi todos los negativos terminan aquí
+            h = hash(clave)
+            p = h % m
+            if not bits[p >> 3] >> (p & 7) & 1:
+                return False
+            h2 = (h >> 32) | 1
+            for i in range(1, k):
+                p = (h + i * h2) % m
+                if not bits[p >> 3] >> (p & 7) & 1:
+                    return False
+            return confirmar is None or confirmar(clave)
+        return contiene
+
+    def tasa_estimada(self) -> float:
+        """Probabilidad de falso positivo con los elementos actuales."""
+        return (1 - math.exp(-self.k * self.elementos / self.bits_totales)) ** self.k
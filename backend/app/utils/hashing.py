@@ -0,0 +1,115 @@
+import os
+import mmap
+import fnmatch
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Bloque por defecto: 1 MiB (un PDF típico de certificado se lee en una sola llamada)
+TAMANO_BLOQUE = 1024 * 1024
+
+ESTRATEGIAS = ('auto', 'bloques', 'mmap', 'file_digest')
+
+
+def _hash_bloques(f, h, tamano_bloque, tamano_archivo):
+    """Lee con readinto sobre un único buffer reutilizado (sin crear bytes por bloque)."""
+    # El buffer nunca es mayor que el archivo: un certificado pesa pocos KB
+    buffer = bytearray(max(1, min(tamano_bloque, tamano_archivo + 1)))
+    vista = memoryview(buffer)
+    while True:
+        leidos = f.readinto(buffer)
+        if not leidos:
+            break
+        h.update(vista[:leidos])
+
+
+def _hash_mmap(f, h, tamano_archivo):
+    """Mapea el archivo completo en memoria y lo pasa a hashlib sin copiarlo."""
+    if tamano_archivo == 0:
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+        h.update(mapa)
+
+
+def calcular_hash_archivo(ruta: str, algoritmo: str = 'sha256', estrategia: str = 'auto',
+                          tamano_bloque: int = TAMANO_BLOQUE) -> str:
+    """
+    Calcula el hash de un archivo y retorna su hexdigest.
+    Estrategias:
+      - 'file_digest': hashlib.file_digest (Python 3.11+), lee directo del descriptor.
+      - 'mmap': mapeo en memoria, sin copias en espacio de usuario.
+      - 'bloques': readinto con bloques de `tamano_bloque` bytes.
+      - 'auto': archivos que caben en un bloque se leen con una sola llamada a read();
+                los más grandes usan file_digest si está disponible, si no 'bloques'.
+    Lanza FileNotFoundError / OSError igual que open().
+    """
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia de hash desconocida: {estrategia}")
+
+    with open(ruta, 'rb', buffering=0) as f:
+        tamano_archivo = os.fstat(f.fileno()).st_size
+
+        if estrategia == 'auto':
+            if tamano_archivo < tamano_bloque:
+                return hashlib.new(algoritmo, f.readall()).hexdigest()
+            estrategia = 'file_digest' if hasattr(hashlib, 'file_digest') else 'bloques'
+
+        if estrategia == 'file_digest' and hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, algoritmo).hexdigest()
+
+        h = hashlib.new(algoritmo)
+        if estrategia == 'mmap':
+            _hash_mmap(f, h, tamano_archivo)
+        else:
+            _hash_bloques(f, h, tamano_bloque, tamano_archivo)
+        return h.hexdigest()
+
+
+def hashear_archivos(rutas, max_workers: int | None = None, **opciones) -> dict:
+    """
+    Calcula el hash de varios archivos en paralelo con un pool de hilos (hashlib
+    libera el GIL mientras procesa los bloques). Retorna {ruta: hexdigest}; las
+    rutas que no se pudieron leer quedan con valor None.
+    """
+    def tarea(grupo):
+        resultado = []
+        for ruta in grupo:
+            try:
+                resultado.append((ruta, calcular_hash_archivo(ruta, **opciones)))
+            except OSError:
+                resultado.append((ruta, None))
+        return resultado
+
+    rutas = list(rutas)
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+    # Se reparten grupos de rutas en lugar de una tarea por archivo: con archivos de
+    # pocos KB el costo de despachar cada tarea supera al del propio hash
+    tamano_grupo = max(1, min(256, len(rutas) // (max_workers * 4) or 1))
+    grupos = [rutas[i:i + tamano_grupo] for i in range(0, len(rutas), tamano_grupo)]
+
+    hashes = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for resultado in pool.map(tarea, grupos):
+            hashes.update(resultado)
+    return hashes
+
+
+def hashear_directorio(carpeta: str, patron: str = '*.pdf', recursivo: bool = False,
+                       max_workers: int | None = None, **opciones) -> dict:
+    """
+    Genera un manifiesto {ruta_relativa: hexdigest} de los archivos de `carpeta`
+    que coinciden con `patron`, ordenado por ruta.
+    """
+    rutas = []
+    if recursivo:
+        for raiz, _, archivos in os.walk(carpeta):
+            rutas.extend(os.path.join(raiz, nombre) for nombre in archivos if fnmatch.fnmatch(nombre, patron))
+    else:
+        rutas = [entrada.path for entrada in os.scandir(carpeta)
+                 if entrada.is_file() and fnmatch.fnmatch(entrada.name, patron)]
+
+    hashes = hashear_archivos(rutas, max_workers=max_workers, **opciones)
+    return {
+        os.path.relpath(ruta, carpeta).replace(os.sep, '/'): digest
+        for ruta, digest in sorted(hashes.items())
+    }
@@ -1,25 +1,21 @@
-import bcrypt
 import jwt
 import datetime
 import pyotp 
 import hashlib
 import hmac
+from app.utils.contrasenas import hashear_password, verificar_password
 
 SECRET_KEY = "TU_SUPER_SECRETO_PARA_JWT" 
 ALGORITHM = "HS256"
 
-#1)Hashing de Contraseñas (Bcrypt)
+#1)Hashing de Contraseñas (Bcrypt, misma implementación que Usuario)
 def hash_password(password: str) -> str:
     """Hashea una contraseña para almacenamiento seguro."""
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    return hashed.decode('utf-8')
+    return hashear_password(password)
 
 def verify_password(password: str, hashed_password: str) -> bool:
     """Verifica una contraseña contra su hash."""
-    return bcrypt.checkpw(
-        password.encode('utf-8'), 
-        hashed_password.encode('utf-8')
-    )
+    return verificar_password(password, hashed_password)
 
 #2)JSON Web Tokens (JWT)
 def generate_auth_token(user_id: int, rol: str, token_type='access') -> str:
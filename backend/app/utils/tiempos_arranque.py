@@ -0,0 +1,36 @@
+import time
+from contextlib import contextmanager
+
+
+class TiemposArranque:
+    """
+    Cronómetro de las fases de create_app (configuración, base de datos, seed,
+    blueprints, ...). Se guarda en app.extensions['tiempos_arranque'] y lo lee
+    `diagnosticar.py --startup-profile`.
+    """
+
+    def __init__(self):
+        self._inicio = time.perf_counter()
+        self._fin = None
+        self.fases = {}  # nombre -> ms (en orden de ejecución)
+
+    @contextmanager
+    def fase(self, nombre: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nombre] = self.fases.get(nombre, 0.0) + (time.perf_counter() - inicio) * 1000
+
+    def detener(self):
+        """Fija el total al terminar create_app."""
+        self._fin = time.perf_counter()
+
+    def total_ms(self) -> float:
+        return ((self._fin or time.perf_counter()) - self._inicio) * 1000
+
+    def resumen(self) -> dict:
+        return {
+            'fases_ms': {nombre: round(ms, 2) for nombre, ms in self.fases.items()},
+            'total_ms': round(self.total_ms(), 2),
+        }
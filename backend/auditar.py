@@ -0,0 +1,54 @@
+# auditar.py
+# Auditoría de integridad de todos los certificados emitidos. Uso:
+#   python auditar.py                 # incremental: solo revisa las cubetas que cambiaron
+#   python auditar.py --completo      # vuelve a leer todos los archivos
+#   python auditar.py --salida reporte.json
+import json
+import argparse
+from app import create_app
+from app.services.auditoria_service import AuditoriaService
+
+
+def _listar(titulo, elementos, limite):
+    print(f"   {titulo}: {len(elementos)}")
+    for elemento in elementos[:limite]:
+        print(f"      - {elemento}")
+    if len(elementos) > limite:
+        print(f"      ... y {len(elementos) - limite} más")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoría de integridad de certificados")
+    parser.add_argument('--completo', action='store_true', help="Ignorar el manifiesto anterior y leer todos los archivos")
+    parser.add_argument('--workers', type=int, default=None, help="Hilos para calcular hashes")
+    parser.add_argument('--salida', help="Guardar el reporte completo en un archivo JSON")
+    parser.add_argument('--limite', type=int, default=20, help="Elementos a mostrar por categoría")
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        print("🔍 Auditando certificados...")
+        reporte = AuditoriaService.auditar(
+            completo=args.completo,
+            max_workers=args.workers,
+            progreso=lambda mensaje: print(f"   {mensaje}"),
+        )
+
+    print(f" Raíz Merkle: {reporte['raiz']}")
+    if reporte['raiz_anterior'] == reporte['raiz']:
+        print("   Sin cambios desde la auditoría anterior")
+    print(f"   Certificados: {reporte['total']}  Archivos leídos: {reporte['archivos_leidos']}  "
+          f"Tiempo: {reporte['duracion_segundos']} s")
+    _listar("Faltantes", reporte['faltantes'], args.limite)
+    _listar("Alterados", reporte['alterados'], args.limite)
+    _listar("Huérfanos", reporte['huerfanos'], args.limite)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f" Reporte guardado en {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
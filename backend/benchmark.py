@@ -0,0 +1,640 @@
+# benchmark.py
+# Mediciones de rendimiento del backend. Uso:
+#   python benchmark.py plantillas [-n 200]
+#   python benchmark.py hashing [-n 10000] [--carpeta /tmp/corpus]
+#   python benchmark.py login [-n 64] [--clientes 16] [--costos 4 8 10 12]
+#   python benchmark.py arranque [--repeticiones 3]
+#   python benchmark.py carga [--usuarios 32] [--duracion 10] [--escrituras 0.2]
+#   python benchmark.py entrega [-n 500] [--tamano-kb 512]
+#   python benchmark.py verificacion-lote [-n 200] [--tamanos 1 10 100]
+#   python benchmark.py token [-n 20000]
+#   python benchmark.py revocaciones [--revocados 100000] [-n 200000]
+import sys
+import os
+import time
+import tempfile
+import argparse
+import statistics
+
+# Agregar la ruta actual al path de Python
+sys.path.append(os.path.dirname(__file__))
+
+
+def _medir(funcion, repeticiones):
+    """Ejecuta `funcion(i)` `repeticiones` veces y retorna la lista de tiempos en segundos."""
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def _resumen(nombre, tiempos):
+    total = sum(tiempos)
+    ordenados = sorted(tiempos)
+    p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+    print(f" {nombre:<32} {len(tiempos) / total:>10.1f} docs/s   "
+          f"p50 {statistics.median(tiempos) * 1000:>7.2f} ms   p99 {p99 * 1000:>7.2f} ms")
+    return len(tiempos) / total
+
+
+def bench_plantillas(args):
+    """Generación masiva: maquetación completa con platypus vs plantilla compilada."""
+    from app.pdf_generator import (
+        generate_simple_certificate_platypus, generate_simple_certificate,
+        generar_certificado_registro, calentar_plantillas
+    )
+
+    def datos(i):
+        return {
+            'nombre_completo': f"Estudiante de Prueba Número {i}",
+            'codigo': f"CEB-{i:06d}",
+            'fecha_emision': '15/12/2025',
+            'titulo': 'Certificado de Estudios - Culminación Satisfactoria',
+        }
+
+    def datos_registro(i):
+        return {
+            'nombre_completo': f"Estudiante de Prueba Número {i}",
+            'matricula': f"MAT-{i:06d}",
+            'titulo': 'Educación Secundaria Completa',
+            'fecha_emision': '15/12/2025',
+            'codigo_unico': f"00000000-0000-4000-8000-{i:012d}",
+        }
+
+    print(f"Generando {args.n} certificados por estrategia...")
+    inicio = time.perf_counter()
+    calentar_plantillas()
+    print(f" Compilación de plantillas: {(time.perf_counter() - inicio) * 1000:.1f} ms (una vez por proceso)")
+
+    base = _resumen("platypus (SimpleDocTemplate)", _medir(lambda i: generate_simple_certificate_platypus(datos(i)), args.n))
+    compilada = _resumen("plantilla compilada (descarga)", _medir(lambda i: generate_simple_certificate(datos(i)), args.n))
+    _resumen("plantilla compilada (registro)", _medir(lambda i: generar_certificado_registro(datos_registro(i)), args.n))
+    print(f" Aceleración descarga: {compilada / base:.1f}x")
+
+
+def _generar_corpus(carpeta, n):
+    """Genera `n` PDFs de certificado en `carpeta` (reutiliza los que ya existan)."""
+    from app.pdf_generator import generar_certificado_registro
+
+    os.makedirs(carpeta, exist_ok=True)
+    existentes = len([nombre for nombre in os.listdir(carpeta) if nombre.endswith('.pdf')])
+    for i in range(existentes, n):
+        pdf = generar_certificado_registro({
+            'nombre_completo': f"Estudiante de Prueba Número {i}",
+            'matricula': f"MAT-{i:06d}",
+            'titulo': 'Educación Secundaria Completa',
+            'fecha_emision': '15/12/2025',
+            'codigo_unico': f"00000000-0000-4000-8000-{i:012d}",
+        })
+        with open(os.path.join(carpeta, f"certificado_{i:06d}.pdf"), 'wb') as f:
+            f.write(pdf)
+    return sorted(os.path.join(carpeta, nombre) for nombre in os.listdir(carpeta) if nombre.endswith('.pdf'))[:n]
+
+
+def bench_hashing(args):
+    """Hash de archivos: bucle original de 4 KB vs bloques grandes, mmap, file_digest y modo paralelo."""
+    import hashlib
+    from app.utils.hashing import calcular_hash_archivo, hashear_directorio
+
+    carpeta = args.carpeta or os.path.join(tempfile.gettempdir(), 'corpus_certificados')
+    print(f"Preparando corpus de {args.n} PDFs en {carpeta}...")
+    rutas = _generar_corpus(carpeta, args.n)
+    total_bytes = sum(os.path.getsize(ruta) for ruta in rutas)
+    print(f" {len(rutas)} archivos, {total_bytes / 1024 / 1024:.1f} MiB")
+
+    def original(ruta):
+        hash_sha256 = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for chunk in iter(lambda: f.read(4096), b''):
+                hash_sha256.update(chunk)
+        return hash_sha256.hexdigest()
+
+    estrategias = [
+        ("read(4096) (original)", original),
+        ("auto", lambda r: calcular_hash_archivo(r)),
+        ("bloques 64 KiB", lambda r: calcular_hash_archivo(r, estrategia='bloques', tamano_bloque=64 * 1024)),
+        ("bloques 1 MiB", lambda r: calcular_hash_archivo(r, estrategia='bloques')),
+        ("mmap", lambda r: calcular_hash_archivo(r, estrategia='mmap')),
+    ]
+    if hasattr(hashlib, 'file_digest'):
+        estrategias.append(("hashlib.file_digest", lambda r: calcular_hash_archivo(r, estrategia='file_digest')))
+
+    referencia = None
+    for nombre, funcion in estrategias:
+        inicio = time.perf_counter()
+        resultado = [funcion(ruta) for ruta in rutas]
+        duracion = time.perf_counter() - inicio
+        if referencia is None:
+            referencia = resultado
+        coincide = "ok" if resultado == referencia else "DISTINTO"
+        print(f" {nombre:<32} {len(rutas) / duracion:>10.0f} archivos/s   "
+              f"{total_bytes / duracion / 1024 / 1024:>8.1f} MiB/s   {coincide}")
+
+    for workers in (4, 16):
+        inicio = time.perf_counter()
+        manifiesto = hashear_directorio(carpeta, max_workers=workers)
+        duracion = time.perf_counter() - inicio
+        print(f" {f'manifiesto paralelo ({workers} hilos)':<32} {len(manifiesto) / duracion:>10.0f} archivos/s   "
+              f"{total_bytes / duracion / 1024 / 1024:>8.1f} MiB/s")
+
+
+def bench_login(args):
+    """Throughput de verificación de contraseñas (login) según el factor de trabajo de bcrypt."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.security import generate_password_hash
+    from app.services.password_service import PasswordService, ServicioSaturado, verificar_hash
+
+    password = 'Admin123!'
+    print(f"{args.n} logins por costo con {args.clientes} clientes concurrentes, "
+          f"{args.workers or os.cpu_count()} hilos de hash, política '{args.politica}'")
+
+    def carga(nombre, verificar):
+        rechazados = []
+        lock = threading.Lock()
+
+        def login(_):
+            try:
+                verificar()
+            except ServicioSaturado:
+                with lock:
+                    rechazados.append(1)
+
+        inicio = time.perf_counter()
+        tiempos = []
+        with ThreadPoolExecutor(max_workers=args.clientes) as clientes:
+            def medido(i):
+                t = time.perf_counter()
+                login(i)
+                tiempos.append(time.perf_counter() - t)
+            list(clientes.map(medido, range(args.n)))
+        duracion = time.perf_counter() - inicio
+        ordenados = sorted(tiempos)
+        p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+        print(f" {nombre:<24} {args.n / duracion:>8.1f} logins/s   p50 {statistics.median(tiempos) * 1000:>8.1f} ms   "
+              f"p99 {p99 * 1000:>8.1f} ms   rechazados {len(rechazados)}")
+
+    legado = generate_password_hash(password)
+    carga(f"werkzeug ({legado.split('$')[0]})", lambda: verificar_hash(password, legado))
+
+    for costo in args.costos:
+        servicio = PasswordService(rondas=costo, max_workers=args.workers, max_cola=args.cola,
+                                   politica=args.politica, espera_ms=args.espera_ms)
+        hash_guardado = servicio.hashear(password)
+        carga(f"bcrypt costo {costo}", lambda: servicio.verificar(password, hash_guardado))
+
+
+_SCRIPT_ARRANQUE_FRIO = """
+import os, sys, time, json, io, contextlib
+inicio = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import create_app
+    app = create_app()
+listo = time.perf_counter()
+cliente = app.test_client()
+t = time.perf_counter(); cliente.get(f'/download-certificate?code=CEB-ANA-{os.getpid()}'); primera = time.perf_counter() - t
+t = time.perf_counter(); cliente.get(f'/download-certificate?code=CEB-JUAN-{os.getpid()}'); segunda = time.perf_counter() - t
+print(json.dumps({'arranque': listo - inicio, 'primera': primera, 'segunda': segunda}))
+"""
+
+_SCRIPT_ARRANQUE_PRELOAD = """
+import os, sys, time, json, io, contextlib
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import create_app, preparar_worker
+    app = create_app(iniciar_hilos=False)
+lectura, escritura = os.pipe()
+inicio = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    with contextlib.redirect_stdout(io.StringIO()):
+        preparar_worker(app)
+    listo = time.perf_counter()
+    cliente = app.test_client()
+    t = time.perf_counter(); cliente.get(f'/download-certificate?code=CEB-ANA-{os.getpid()}'); primera = time.perf_counter() - t
+    t = time.perf_counter(); cliente.get(f'/download-certificate?code=CEB-JUAN-{os.getpid()}'); segunda = time.perf_counter() - t
+    os.write(escritura, json.dumps({'arranque': listo - inicio, 'primera': primera, 'segunda': segunda}).encode())
+    os._exit(0)
+os.close(escritura)
+os.waitpid(pid, 0)
+print(os.read(lectura, 4096).decode())
+"""
+
+
+def bench_arranque(args):
+    """Arranque en frío de un worker y latencia de la primera petición: sin preload vs preload."""
+    import json
+    import subprocess
+
+    def ejecutar(script):
+        resultados = []
+        for _ in range(args.repeticiones):
+            salida = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    capture_output=True, text=True, check=True).stdout
+            resultados.append(json.loads(salida.strip().splitlines()[-1]))
+        return {clave: statistics.median(r[clave] for r in resultados) for clave in resultados[0]}
+
+    print(f"Mediana de {args.repeticiones} arranques (GET /download-certificate como primera petición)")
+    for nombre, script in (("cada worker inicializa", _SCRIPT_ARRANQUE_FRIO),
+                           ("preload + fork (gunicorn)", _SCRIPT_ARRANQUE_PRELOAD)):
+        r = ejecutar(script)
+        print(f" {nombre:<28} worker listo {r['arranque'] * 1000:>8.1f} ms   "
+              f"1ª petición {r['primera'] * 1000:>7.1f} ms   2ª petición {r['segunda'] * 1000:>6.1f} ms")
+
+
+_SCRIPT_CARGA = """
+import os, sys, json, time, random, threading, io
+from datetime import datetime
+sys.stdout = io.StringIO()  # los prints de la aplicación no ensucian el resultado
+from app import create_app
+from app.models import db
+from app.models.certificado import Certificado
+from app.models.estudiante import Estudiante
+from app.models.log_verificacion import LogVerificacion
+app = create_app()
+with app.app_context():
+    estudiante = Estudiante.query.first()
+    codigos = [f'CARGA-{{i:04d}}' for i in range(200)]
+    db.session.add_all([Certificado(codigo=c, titulo='Certificado de carga', fecha_emision=datetime(2024, 1, 1),
+                                    estudiante_id=estudiante.id) for c in codigos])
+    db.session.commit()
+cliente = app.test_client()
+for c in codigos[:20]:
+    cliente.get(f'/download-certificate?code={{c}}')  # llenar la caché de PDFs: se mide la base de datos
+
+USUARIOS, DURACION, ESCRITURAS = {usuarios}, {duracion}, {escrituras}
+resultados = {{'leer': [], 'escribir': []}}
+errores = {{'bloqueada': 0, 'otros': 0}}
+lock = threading.Lock()
+fin = time.perf_counter() + DURACION
+
+def usuario(semilla):
+    azar = random.Random(semilla)
+    cliente = app.test_client()
+    while time.perf_counter() < fin:
+        tarea = 'escribir' if azar.random() < ESCRITURAS else 'leer'
+        t = time.perf_counter()
+        try:
+            if tarea == 'leer':
+                r = cliente.get(f'/download-certificate?code={{azar.choice(codigos[:20])}}')
+                ok = r.status_code == 200
+                bloqueada = ok is False and b'locked' in r.data
+            else:
+                with app.test_request_context():
+                    LogVerificacion.registrar(codigo_unico=azar.choice(codigos), es_valido=True, notas='carga')
+                    db.session.remove()
+                ok, bloqueada = True, False
+        except Exception as e:
+            ok, bloqueada = False, 'locked' in str(e)
+        with lock:
+            if ok:
+                resultados[tarea].append(time.perf_counter() - t)
+            else:
+                errores['bloqueada' if bloqueada else 'otros'] += 1
+
+hilos = [threading.Thread(target=usuario, args=(i,)) for i in range(USUARIOS)]
+for h in hilos: h.start()
+for h in hilos: h.join()
+print(json.dumps({{'resultados': resultados, 'errores': errores, 'duracion': DURACION}}), file=sys.__stdout__)
+"""
+
+
+def bench_carga(args):
+    """Carga mixta de lecturas (/download-certificate) y escrituras (log de verificaciones) sobre SQLite."""
+    import json
+    import subprocess
+
+    configuraciones = (
+        ("journal DELETE, synchronous FULL", {'SQLITE_WAL': 'False', 'SQLITE_SYNCHRONOUS': 'FULL',
+                                              'SQLITE_MMAP_SIZE': '0'}),
+        ("WAL, synchronous NORMAL, mmap", {'SQLITE_WAL': 'True', 'SQLITE_SYNCHRONOUS': 'NORMAL'}),
+    )
+    print(f"{args.usuarios} usuarios durante {args.duracion} s, {args.escrituras:.0%} escrituras "
+          f"(busy_timeout {args.busy_timeout_ms} ms, caché del resolvedor desactivada)")
+    for nombre, entorno in configuraciones:
+        with tempfile.TemporaryDirectory() as carpeta:
+            env = dict(os.environ, **entorno,
+                       DATABASE_URL=f"sqlite:///{os.path.join(carpeta, 'carga.db')}",
+                       SQLITE_BUSY_TIMEOUT_MS=str(args.busy_timeout_ms),
+                       LOG_VERIFICACION_ASINCRONO='False', RESOLVEDOR_CODIGOS_TTL='0')
+            script = _SCRIPT_CARGA.format(usuarios=args.usuarios, duracion=args.duracion, escrituras=args.escrituras)
+            salida = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    env=env, capture_output=True, text=True, check=True).stdout
+        r = json.loads(salida.strip().splitlines()[-1])
+        print(f" {nombre}")
+        for tarea, tiempos in r['resultados'].items():
+            if not tiempos:
+                continue
+            ordenados = sorted(tiempos)
+            p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+            print(f"   {tarea:<9} {len(tiempos) / r['duracion']:>8.1f} ops/s   p50 {statistics.median(tiempos) * 1000:>7.2f} ms"
+                  f"   p99 {p99 * 1000:>8.2f} ms")
+        print(f"   errores   'database is locked' {r['errores']['bloqueada']}   otros {r['errores']['otros']}")
+
+
+def bench_entrega(args):
+    """Entrega de PDFs almacenados: send_file en el worker vs X-Sendfile vs X-Accel-Redirect."""
+    import io
+    import hashlib
+    import contextlib
+    from datetime import datetime
+
+    carpeta = tempfile.mkdtemp(prefix='bench_entrega_')
+    # La configuración se lee del entorno al importar app.config
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(carpeta, 'bench.db')
+    from app import create_app
+    from app.models import db, verificar_esquema, Certificado
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app(inicializar=False)
+        app.config['CERTIFICADOS_FOLDER'] = carpeta
+        filename = 'certificado_BENCH_00000000.pdf'
+        contenido = os.urandom(args.tamano_kb * 1024)
+        with open(os.path.join(carpeta, filename), 'wb') as f:
+            f.write(contenido)
+        with app.app_context():
+            verificar_esquema()
+            db.session.add(Certificado(
+                codigo='BENCH', codigo_unico='BENCH', titulo='Benchmark', fecha_emision=datetime(2024, 1, 1),
+                hash_firma=hashlib.sha256(contenido).hexdigest(), ruta_archivo=os.path.join(carpeta, filename),
+            ))
+            db.session.commit()
+
+    url = f'/api/v1/certificados/archivo/{filename}'
+    modos = (
+        ("send_file (worker)", {'USE_X_SENDFILE': False, 'CERTIFICADOS_X_ACCEL_PREFIJO': ''}),
+        ("X-Sendfile", {'USE_X_SENDFILE': True, 'CERTIFICADOS_X_ACCEL_PREFIJO': ''}),
+        ("X-Accel-Redirect (nginx)", {'USE_X_SENDFILE': False, 'CERTIFICADOS_X_ACCEL_PREFIJO': '/protegido/certificados'}),
+    )
+    print(f"{args.n} descargas de {args.tamano_kb} KB por modo (tiempo del worker, cliente de pruebas de Flask)")
+    cliente = app.test_client()
+    for nombre, config in modos:
+        app.config.update(config)
+        cliente.get(url).close()
+
+        def descargar(_):
+            respuesta = cliente.get(url)
+            respuesta.get_data()
+            respuesta.close()
+
+        tiempos = _medir(descargar, args.n)
+        total = sum(tiempos)
+        print(f" {nombre:<26} {args.n * len(contenido) / total / 1024 ** 2:>10.1f} MB/s por worker   "
+              f"p50 {statistics.median(tiempos) * 1000:>7.3f} ms por petición")
+
+    import shutil
+    shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def bench_verificacion_lote(args):
+    """Verificación de N códigos: POST por lotes (NDJSON) vs N peticiones GET individuales."""
+    import io
+    import json
+    import hashlib
+    import contextlib
+    from datetime import datetime
+
+    carpeta = tempfile.mkdtemp(prefix='bench_verificacion_')
+    # La configuración se lee del entorno al importar app.config; los logs se escriben
+    # en la petición para que su costo entre en la medición
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(carpeta, 'bench.db')
+    os.environ['LOG_VERIFICACION_ASINCRONO'] = 'False'
+    from app import create_app
+    from app.models import db, verificar_esquema, Certificado
+    from app.utils.cache_integridad import CacheHashArchivos
+
+    maximo = max(args.tamanos)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app(inicializar=False)
+        app.config['CERTIFICADOS_FOLDER'] = carpeta
+        app.config['VERIFICACION_LOTE_MAX'] = maximo
+        with app.app_context():
+            verificar_esquema()
+            for i in range(maximo):
+                ruta = os.path.join(carpeta, f'certificado_BENCH{i:04d}.pdf')
+                contenido = os.urandom(args.tamano_kb * 1024)
+                with open(ruta, 'wb') as f:
+                    f.write(contenido)
+                db.session.add(Certificado(
+                    codigo=f'BENCH{i:04d}', codigo_unico=f'BENCH{i:04d}', titulo='Benchmark',
+                    fecha_emision=datetime(2024, 1, 1), hash_firma=hashlib.sha256(contenido).hexdigest(),
+                    ruta_archivo=ruta,
+                ))
+            db.session.commit()
+
+    cliente = app.test_client()
+    cache = CacheHashArchivos.desde_app(app)
+    codigos = [f'BENCH{i:04d}' for i in range(maximo)]
+
+    def lote(n):
+        respuesta = cliente.post('/api/v1/certificados/verificar', json={'codigos': codigos[:n]})
+        lineas = respuesta.get_data(as_text=True).splitlines()
+        assert len(lineas) == n and all(json.loads(l)['success'] for l in lineas), lineas[:1]
+
+    def individuales(n):
+        for codigo in codigos[:n]:
+            assert cliente.get(f'/api/v1/certificados/verificar/{codigo}').status_code == 200
+
+    print(f"{args.n} repeticiones por tamaño, PDFs de {args.tamano_kb} KB, logs de verificación síncronos")
+    for estado in ('caché de hashes caliente', 'caché de hashes fría'):
+        print(f" {estado}")
+        for n in args.tamanos:
+            for nombre, funcion in (('POST lote', lote), ('GET x N', individuales)):
+                funcion(n)
+
+                def medido(_):
+                    if estado.endswith('fría'):
+                        for codigo in codigos[:n]:
+                            cache.invalidar(os.path.join(carpeta, f'certificado_{codigo}.pdf'))
+                    funcion(n)
+
+                tiempos = _medir(medido, args.n)
+                ordenados = sorted(tiempos)
+                p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+                print(f"   {n:>4} códigos  {nombre:<10} p50 {statistics.median(tiempos) * 1000:>8.2f} ms   "
+                      f"p99 {p99 * 1000:>8.2f} ms")
+
+    import shutil
+    shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def bench_token(args):
+    """Verificación del token firmado (sin base de datos) vs verificar_integridad (consulta + hash)."""
+    import io
+    import hashlib
+    import contextlib
+    from datetime import datetime
+
+    carpeta = tempfile.mkdtemp(prefix='bench_token_')
+    # La configuración se lee del entorno al importar app.config
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(carpeta, 'bench.db')
+    from app import create_app
+    from app.models import db, verificar_esquema, Certificado
+    from app.services.certificado_service import CertificadoService
+    from app.services.token_certificado_service import TokenCertificados
+
+    fecha = datetime(2025, 12, 15)
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app(inicializar=False)
+        app.config['CERTIFICADOS_FOLDER'] = carpeta
+        ruta = os.path.join(carpeta, 'certificado_BENCH.pdf')
+        contenido = os.urandom(64 * 1024)
+        with open(ruta, 'wb') as f:
+            f.write(contenido)
+        with app.app_context():
+            verificar_esquema()
+            db.session.add(Certificado(
+                codigo='BENCH', codigo_unico='BENCH', titulo='Educación Secundaria Completa', fecha_emision=fecha,
+                hash_firma=hashlib.sha256(contenido).hexdigest(), ruta_archivo=ruta,
+            ))
+            db.session.commit()
+
+    tokens = TokenCertificados.desde_app(app)
+    token = tokens.firmar('BENCH', 'María Fernanda Cruz Salazar', 'MAT-2025-0042', 'Educación Secundaria Completa', fecha)
+    print(f"Token de {len(token)} caracteres, {args.n} verificaciones")
+    with app.test_request_context():
+        tokens.verificar(token)
+        tiempos = _medir(lambda _: tokens.verificar(token), args.n)
+        print(f" {'token firmado (HMAC-SHA256)':<32} p50 {statistics.median(tiempos) * 1e6:>9.2f} µs")
+        n = max(1, args.n // 20)
+        tiempos = _medir(lambda _: CertificadoService.verificar_integridad('BENCH'), n)
+        print(f" {'verificar_integridad':<32} p50 {statistics.median(tiempos) * 1e6:>9.2f} µs   ({n} verificaciones)")
+
+    cliente = app.test_client()
+    url = f'/api/v1/certificados/token/{token}'
+    tiempos = _medir(lambda _: cliente.get(url), max(1, args.n // 20))
+    print(f" {'GET /api/v1/certificados/token':<32} p50 {statistics.median(tiempos) * 1e6:>9.2f} µs   (pila HTTP completa)")
+
+    import shutil
+    shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def bench_revocaciones(args):
+    """Consulta de revocación: filtro de Bloom + lista ordenada vs set, carga completa y deltas."""
+    import io
+    import sys
+    import uuid
+    import contextlib
+
+    carpeta = tempfile.mkdtemp(prefix='bench_revocaciones_')
+    # La configuración se lee del entorno al importar app.config
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(carpeta, 'bench.db')
+    from app import create_app
+    from app.models import db, verificar_esquema, Revocacion
+    from app.services.revocacion_service import RegistroRevocaciones
+
+    revocados = [str(uuid.uuid4()) for _ in range(args.revocados)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app(inicializar=False)
+        with app.app_context():
+            verificar_esquema()
+            db.session.bulk_insert_mappings(Revocacion, [{'codigo_unico': c} for c in revocados])
+            db.session.commit()
+
+    registro = RegistroRevocaciones.desde_app(app)
+    with app.app_context():
+        inicio = time.perf_counter()
+        registro.sincronizar()
+        carga = time.perf_counter() - inicio
+        db.session.bulk_insert_mappings(Revocacion, [{'codigo_unico': str(uuid.uuid4())} for _ in range(100)])
+        db.session.commit()
+        inicio = time.perf_counter()
+        registro.sincronizar()
+        delta = time.perf_counter() - inicio
+
+    def por_consulta(funcion, codigos):
+        # Cadenas nuevas: el costo incluye calcular su hash(), como con un código recién recibido
+        inicio = time.perf_counter()
+        for codigo in codigos:
+            funcion(codigo)
+        return (time.perf_counter() - inicio) / len(codigos) * 1e9
+
+    conjunto = frozenset(registro._ordenados)
+    estadisticas = registro.estadisticas()
+    print(f"{estadisticas['revocados']} revocados, versión {estadisticas['version']}")
+    print(f" carga completa {carga * 1000:.1f} ms, delta de 100 revocaciones {delta * 1000:.2f} ms")
+    # Las cadenas son las mismas para la lista, el log y el set: se cuentan aparte una vez
+    cadenas = sum(sys.getsizeof(codigo) for codigo in registro._ordenados)
+    filtro = estadisticas['filtro_bytes']
+    lista = sys.getsizeof(registro._ordenados)
+    log = sys.getsizeof(registro._versiones) + sys.getsizeof(registro._codigos)
+    tabla = sys.getsizeof(conjunto)
+    print(f" memoria: filtro {filtro / 1024:.0f} KB (k={estadisticas['filtro_k']}) + lista ordenada "
+          f"{lista / 1024:.0f} KB + log {log / 1024:.0f} KB = {(filtro + lista + log) / 1024:.0f} KB; "
+          f"set {tabla / 1024:.0f} KB; cadenas {cadenas / 1024:.0f} KB en ambos casos")
+
+    negativos = [str(uuid.uuid4()) for _ in range(args.n)]
+    falsos = sum(map(registro._filtro.contiene, negativos))
+    print(f" falsos positivos del filtro {falsos / args.n:.4%} (objetivo {registro.tasa_falsos:.2%})")
+    negativos = [str(uuid.uuid4()) for _ in range(args.n)]
+    print(f" negativo  esta_revocado       {por_consulta(registro.esta_revocado, negativos):>7.0f} ns")
+    negativos = [str(uuid.uuid4()) for _ in range(args.n)]
+    print(f" negativo  set (referencia)    {por_consulta(conjunto.__contains__, negativos):>7.0f} ns")
+    positivos = [''.join(c) for c in revocados[:args.n]]
+    print(f" positivo  esta_revocado       {por_consulta(registro.esta_revocado, positivos):>7.0f} ns")
+
+    import shutil
+    shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del sistema de certificados")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('plantillas', help=bench_plantillas.__doc__)
+    p.add_argument('-n', type=int, default=200, help="Certificados por estrategia")
+    p.set_defaults(func=bench_plantillas)
+
+    p = sub.add_parser('hashing', help=bench_hashing.__doc__)
+    p.add_argument('-n', type=int, default=10000, help="Tamaño del corpus de PDFs")
+    p.add_argument('--carpeta', help="Carpeta del corpus (por defecto en el directorio temporal)")
+    p.set_defaults(func=bench_hashing)
+
+    p = sub.add_parser('login', help=bench_login.__doc__)
+    p.add_argument('-n', type=int, default=64, help="Logins por factor de trabajo")
+    p.add_argument('--clientes', type=int, default=16, help="Hilos cliente concurrentes")
+    p.add_argument('--costos', type=int, nargs='+', default=[4, 8, 10, 12], help="Factores de trabajo de bcrypt")
+    p.add_argument('--workers', type=int, default=None, help="Hilos del pool de hash (por defecto, núcleos de CPU)")
+    p.add_argument('--cola', type=int, default=32, help="Operaciones en espera admitidas")
+    p.add_argument('--politica', choices=('queue', 'reject'), default='queue')
+    p.add_argument('--espera-ms', type=int, default=2000, help="Espera máxima por un cupo (política queue)")
+    p.set_defaults(func=bench_login)
+
+    p = sub.add_parser('arranque', help=bench_arranque.__doc__)
+    p.add_argument('--repeticiones', type=int, default=3, help="Arranques a medir por modo")
+    p.set_defaults(func=bench_arranque)
+
+    p = sub.add_parser('carga', help=bench_carga.__doc__)
+    p.add_argument('--usuarios', type=int, default=32, help="Usuarios virtuales (hilos) concurrentes")
+    p.add_argument('--duracion', type=float, default=10, help="Segundos de carga por configuración")
+    p.add_argument('--escrituras', type=float, default=0.2, help="Fracción de operaciones que escriben")
+    p.add_argument('--busy-timeout-ms', type=int, default=5000, help="SQLITE_BUSY_TIMEOUT_MS de ambas configuraciones")
+    p.set_defaults(func=bench_carga)
+
+    p = sub.add_parser('entrega', help=bench_entrega.__doc__)
+    p.add_argument('-n', type=int, default=500, help="Descargas por modo")
+    p.add_argument('--tamano-kb', type=int, default=512, help="Tamaño del PDF almacenado")
+    p.set_defaults(func=bench_entrega)
+
+    p = sub.add_parser('verificacion-lote', help=bench_verificacion_lote.__doc__)
+    p.add_argument('-n', type=int, default=200, help="Repeticiones por tamaño de lote")
+    p.add_argument('--tamanos', type=int, nargs='+', default=[1, 10, 100], help="Códigos por lote")
+    p.add_argument('--tamano-kb', type=int, default=64, help="Tamaño de cada PDF almacenado")
+    p.set_defaults(func=bench_verificacion_lote)
+
+    p = sub.add_parser('token', help=bench_token.__doc__)
+    p.add_argument('-n', type=int, default=20000, help="Verificaciones del token")
+    p.set_defaults(func=bench_token)
+
+    p = sub.add_parser('revocaciones', help=bench_revocaciones.__doc__)
+    p.add_argument('--revocados', type=int, default=100000, help="Revocaciones en la tabla")
+    p.add_argument('-n', type=int, default=200000, help="Consultas por caso")
+    p.set_defaults(func=bench_revocaciones)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,401 @@
 # diagnostic.py
+# Uso:
+#   python diagnosticar.py
+#   python diagnosticar.py --startup-profile [--inicializar] [--top 25] [--presupuesto-ms 1500]
+#   python diagnosticar.py --explain
+#   python diagnosticar.py --consultas
 import sys
 import os
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from collections import defaultdict
 
 # Agregar la ruta actual al path de Python
 sys.path.append(os.path.dirname(__file__))
 
-print("🔍 Iniciando diagnóstico...")
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
 
-try:
-    print("1. Intentando importar create_app...")
+# Módulos pesados que solo deben cargarse en su primer uso, no al arrancar un worker
+MODULOS_DIFERIDOS = ('reportlab', 'qrcode', 'PIL')
+
+# Sentencias SQL máximas por petición (cachés frías, log de verificaciones asíncrono)
+PRESUPUESTO_CONSULTAS = {
+    'GET /api/v1/certificados/verificar/<codigo>': 1,
+    'GET /api/v1/certificados/recientes': 1,
+    'GET /download-certificate?code=<codigo>': 1,
+    'POST /api/v1/certificados/verificar (100 códigos)': 1,
+    # Con las revocaciones ya cargadas (se sincronizan una vez por intervalo, no por petición)
+    'GET /api/v1/certificados/token/<token>': 0,
+    'GET /api/v1/revocaciones/version': 0,
+}
+
+# Se ejecuta en un intérprete nuevo: mide import + create_app y lo reporta en una línea JSON
+_SCRIPT_ARRANQUE = """
+import io, sys, json, time, contextlib
+inicio = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    from app import create_app
+    importado = time.perf_counter()
+    app = create_app(inicializar={inicializar})
+fin = time.perf_counter()
+print(json.dumps({{
+    'ok': app is not None,
+    'import_ms': (importado - inicio) * 1000,
+    'create_app_ms': (fin - importado) * 1000,
+    'total_ms': (fin - inicio) * 1000,
+    'fases_ms': app.extensions['tiempos_arranque'].resumen()['fases_ms'] if app else {{}},
+    'diferidos_cargados': sorted({{m.split('.')[0] for m in sys.modules}} & set({diferidos!r})),
+}}))
+"""
+
+
+def _arrancar(inicializar: bool, importtime: bool = False) -> tuple[dict, str]:
+    """Arranca la aplicación en un proceso nuevo. Retorna (medición, stderr)."""
+    comando = [sys.executable]
+    if importtime:
+        comando += ['-X', 'importtime']
+    comando += ['-c', _SCRIPT_ARRANQUE.format(inicializar=inicializar, diferidos=MODULOS_DIFERIDOS)]
+    proceso = subprocess.run(comando, cwd=DIRECTORIO, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise RuntimeError(f"El arranque falló:\n{proceso.stderr[-2000:]}")
+    return json.loads(proceso.stdout.strip().splitlines()[-1]), proceso.stderr
+
+
+def _parsear_importtime(salida: str) -> list[tuple[str, int, int]]:
+    """Líneas de `-X importtime` -> [(módulo, self_us, acumulado_us)]."""
+    modulos = []
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        try:
+            propio, acumulado, nombre = linea[len('import time:'):].split('|', 2)
+            modulos.append((nombre.strip(), int(propio), int(acumulado)))
+        except ValueError:
+            continue
+    return modulos
+
+
+def perfil_arranque(args) -> int:
+    if args.presupuesto_ms is None:
+        from app.config import Config
+        args.presupuesto_ms = Config.ARRANQUE_PRESUPUESTO_MS
+    modo = "con inicialización" if args.inicializar else "worker (sin inicialización)"
+    print(f"🔍 Perfil de arranque: {modo}")
+
+    # 1. Costo de importación por módulo
+    _, stderr = _arrancar(args.inicializar, importtime=True)
+    modulos = _parsear_importtime(stderr)
+    por_paquete = defaultdict(int)
+    for nombre, propio, _ in modulos:
+        por_paquete[nombre.split('.')[0]] += propio
+
+    print(f"\n Importación por paquete (tiempo propio, top {args.top}):")
+    for paquete, us in sorted(por_paquete.items(), key=lambda p: -p[1])[:args.top]:
+        print(f"   {us / 1000:>8.1f} ms  {paquete}")
+
+    print(f"\n Importación por módulo (acumulado, top {args.top}):")
+    for nombre, _, acumulado in sorted(modulos, key=lambda m: -m[2])[:args.top]:
+        print(f"   {acumulado / 1000:>8.1f} ms  {nombre}")
+
+    # 2. Fases de create_app y total (procesos sin -X importtime, que añade su propio costo)
+    mediciones = [_arrancar(args.inicializar)[0] for _ in range(args.repeticiones)]
+    medicion = min(mediciones, key=lambda m: m['total_ms'])
+    total = statistics.median(m['total_ms'] for m in mediciones)
+
+    print(f"\n Fases (mejor de {args.repeticiones} arranques):")
+    print(f"   {medicion['import_ms']:>8.1f} ms  import de app (flask, config)")
+    for fase, ms in medicion['fases_ms'].items():
+        print(f"   {ms:>8.1f} ms  {fase}")
+    print(f"\n Total import + create_app: mediana {total:.1f} ms (mejor {medicion['total_ms']:.1f} ms)")
+
+    # 3. Presupuesto
+    fallos = []
+    if not medicion['ok']:
+        fallos.append("create_app() retornó None")
+    if total > args.presupuesto_ms:
+        fallos.append(f"arranque de {total:.1f} ms supera el presupuesto de {args.presupuesto_ms:.0f} ms")
+    if not args.inicializar and medicion['diferidos_cargados']:
+        fallos.append(f"módulos que deberían cargarse en su primer uso: {', '.join(medicion['diferidos_cargados'])}")
+
+    if fallos:
+        for fallo in fallos:
+            print(f" ❌ {fallo}")
+        return 1
+    print(f" ✅ Dentro del presupuesto ({args.presupuesto_ms:.0f} ms)")
+    return 0
+
+
+def _consultas_criticas():
+    """Consultas de las rutas y reportes más usados, con la misma forma que en los servicios."""
+    from datetime import datetime, timedelta
+    from sqlalchemy import select, func
+    from app.models import Certificado, Estudiante, LogVerificacion, Revocacion
+
+    hasta = datetime.utcnow()
+    return {
+        'verificación por codigo_unico': select(Certificado).where(Certificado.codigo_unico == 'x'),
+        'descarga: código -> estudiante': select(
+            Certificado.codigo, Certificado.titulo, Certificado.fecha_emision,
+            Certificado.estudiante_id, Estudiante.nombre_completo
+        ).outerjoin(Estudiante, Estudiante.id == Certificado.estudiante_id).where(Certificado.codigo == 'x'),
+        'certificados de un estudiante por fecha': select(Certificado).where(
+            Certificado.estudiante_id == 1
+        ).order_by(Certificado.fecha_emision.desc()),
+        'lote: certificados ya emitidos': select(Certificado.estudiante_id).where(
+            Certificado.titulo == 'x', Certificado.estudiante_id.in_([1, 2, 3])
+        ),
+        'reporte de verificaciones por rango': select(func.count()).select_from(LogVerificacion).where(
+            LogVerificacion.fecha_verificacion.between(hasta - timedelta(days=30), hasta),
+            LogVerificacion.es_valido.is_(False)
+        ),
+        'certificados recientes': select(Certificado.codigo_unico, Estudiante.nombre_completo).outerjoin(
+            Estudiante, Estudiante.id == Certificado.estudiante_id
+        ).order_by(Certificado.fecha_emision.desc(), Certificado.id.desc()).limit(20),
+        'estudiante por matrícula': select(Estudiante).where(Estudiante.matricula == 'x'),
+        'revocaciones: delta por versión': select(Revocacion.version, Revocacion.codigo_unico).where(
+            Revocacion.version > 1
+        ).order_by(Revocacion.version),
+    }
+
+
+def _usar_base_temporal() -> str:
+    """
+    Apunta la aplicación a una base SQLite vacía en una carpeta temporal (antes de
+    importar app: la configuración se lee del entorno al importar app.config).
+    Retorna la carpeta, que el llamador borra al terminar.
+    """
+    carpeta = tempfile.mkdtemp(prefix='diagnostico_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(carpeta, 'diagnostico.db')
+    return carpeta
+
+
+def plan_consulta(conexion, consulta) -> tuple[list[str], list[str]]:
+    """EXPLAIN QUERY PLAN (SQLite) de una consulta. Retorna (pasos, recorridos completos)."""
+    compilada = consulta.compile(conexion, compile_kwargs={'render_postcompile': True})
+    # El plan no depende de los valores: basta con pasarlos como texto
+    parametros = tuple(str(compilada.params[clave]) for clave in compilada.positiontup)
+    plan = [fila[-1] for fila in conexion.exec_driver_sql('EXPLAIN QUERY PLAN ' + compilada.string, parametros)]
+    return plan, [paso for paso in plan if paso.startswith('SCAN') and 'INDEX' not in paso]
+
+
+def explicar_consultas() -> int:
+    """
+    EXPLAIN QUERY PLAN de las consultas críticas sobre una base temporal con el esquema
+    de los modelos (índices incluidos): falla si alguna recorre una tabla completa.
+    """
+    import io
+    import contextlib
+
+    carpeta = _usar_base_temporal()
+    from app import create_app
+    from app.models import db, verificar_esquema
+
+    fallos = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            app = create_app(inicializar=False)
+            if app is not None:
+                with app.app_context():
+                    verificar_esquema()
+        if app is None:
+            print(" create_app() retornó None")
+            return 1
+
+        print("🔍 Plan de las consultas críticas")
+        with app.app_context(), db.engine.connect() as conexion:
+            for nombre, consulta in _consultas_criticas().items():
+                plan, recorridos = plan_consulta(conexion, consulta)
+                print(f"\n {'❌' if recorridos else '✅'} {nombre}")
+                for paso in plan:
+                    print(f"     {paso}")
+                if recorridos:
+                    fallos.append(nombre)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    if fallos:
+        print(f"\n ❌ Consultas sin índice: {', '.join(fallos)}")
+        return 1
+    print("\n ✅ Todas las consultas críticas usan un índice")
+    return 0
+
+
+def preparar_medicion(app) -> tuple[dict, dict]:
+    """
+    Emite un certificado de prueba y crea un administrador en la base de `app` (con el
+    esquema y los datos iniciales ya creados) y calienta las cachés que no dependen de
+    la petición. Retorna (nombre -> (método, url, cuerpo JSON), cabeceras).
+    """
+    from app.models import db, Estudiante, Certificado, Usuario
+    from app.services.auth_service import AuthService
+    from app.services.certificado_service import CertificadoService
+    from app.services.token_certificado_service import TokenCertificados
+
+    with app.test_request_context():
+        estudiante = Estudiante.query.first()
+        estudiante.matricula = 'DIAG-001'
+        db.session.commit()
+        ok, mensaje, codigo, _ = CertificadoService.generar_y_guardar_certificado(
+            estudiante.id, 'Certificado de diagnóstico'
+        )
+        if not ok:
+            raise RuntimeError(f"No se pudo emitir el certificado de prueba: {mensaje}")
+        certificado = Certificado.query.filter_by(codigo_unico=codigo).first()
+        titular = db.session.get(Estudiante, certificado.estudiante_id)
+        token = TokenCertificados.desde_app(app).firmar(
+            codigo, titular.nombre_completo, titular.matricula, certificado.titulo, certificado.fecha_emision
+        )
+        # /recientes es solo para administradores
+        admin = Usuario(username='diagnostico', email='diagnostico@localhost', rol='admin')
+        admin.password_hash = '-'
+        db.session.add(admin)
+        db.session.commit()
+        cabeceras = {'Authorization': f'Bearer {AuthService.generar_token(admin)}'}
+
+    urls = {
+        'GET /api/v1/certificados/verificar/<codigo>': ('GET', f'/api/v1/certificados/verificar/{codigo}', None),
+        'GET /api/v1/certificados/recientes': ('GET', '/api/v1/certificados/recientes', None),
+        'GET /download-certificate?code=<codigo>': ('GET', f'/download-certificate?code={codigo}', None),
+        'POST /api/v1/certificados/verificar (100 códigos)': (
+            'POST', '/api/v1/certificados/verificar',
+            {'codigos': [codigo] + [f'DIAG-INEXISTENTE-{i:03d}' for i in range(99)]}
+        ),
+        'GET /api/v1/certificados/token/<token>': ('GET', f'/api/v1/certificados/token/{token}', None),
+        'GET /api/v1/revocaciones/version': ('GET', '/api/v1/revocaciones/version', None),
+    }
+    cliente = app.test_client()
+    cliente.get(f'/api/v1/certificados/token/{token}')
+    # Usuario autenticado en caché: se mide la consulta de la ruta, no la del login
+    cliente.get('/api/v1/certificados/recientes?limite=1', headers=cabeceras)
+    return urls, cabeceras
+
+
+def medir_peticion(app, metodo: str, url: str, cuerpo=None, cabeceras=None):
+    """Hace la petición y cuenta sus sentencias SQL. Retorna (respuesta, ContadorConsultas)."""
+    import io
+    import contextlib
+    from app.models import db
+    from app.utils.contador_consultas import ContadorConsultas
+
+    with app.app_context():
+        with ContadorConsultas(db) as consultas, contextlib.redirect_stdout(io.StringIO()):
+            respuesta = app.test_client().open(url, method=metodo, json=cuerpo, headers=cabeceras)
+            # Las respuestas en streaming ejecutan sus consultas al leer el cuerpo
+            respuesta.get_data()
+    return respuesta, consultas
+
+
+def contar_consultas() -> int:
+    """
+    Cuenta las sentencias SQL de cada endpoint de lectura sobre una base temporal
+    con un certificado recién emitido y las compara con PRESUPUESTO_CONSULTAS.
+    """
+    import io
+    import contextlib
+
+    carpeta = _usar_base_temporal()
+    os.environ['LOG_VERIFICACION_ASINCRONO'] = 'True'
     from app import create_app
-    print(" create_app importado correctamente")
-    
-    print("2. Ejecutando create_app()...")
-    app = create_app()
-    
-    if app is None:
-        print(" create_app() retornó None")
-        print("3. Probable causa: Error en la inicialización de blueprints o base de datos")
-    else:
-        print(" create_app() retornó una aplicación Flask válida")
-        print(f"   Tipo: {type(app)}")
-        
-except ImportError as e:
-    print(f" Error de importación: {e}")
-    print("   Posibles causas:")
-    print("   - Falta archivo __init__.py en alguna carpeta")
-    print("   - Error en imports circulares")
-    print("   - Módulo no encontrado")
-    
-except Exception as e:
-    print(f" Error general: {e}")
-    print("   Revisa los archivos de inicialización")
-
-print(" Diagnóstico completado")
\ No newline at end of file
+    from app.models import verificar_esquema
+    from app.seed_data import seed_initial_data
+
+    fallos = []
+    try:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                app = create_app(inicializar=False)
+                app.config['CERTIFICADOS_FOLDER'] = carpeta
+                app.config['PDF_CACHE_FOLDER'] = os.path.join(carpeta, 'cache')
+                with app.app_context():
+                    verificar_esquema()
+                    seed_initial_data()
+                urls, cabeceras = preparar_medicion(app)
+        except RuntimeError as e:
+            print(f" {e}")
+            return 1
+
+        print("🔍 Sentencias SQL por petición")
+        for nombre, (metodo, url, cuerpo) in urls.items():
+            respuesta, consultas = medir_peticion(app, metodo, url, cuerpo, cabeceras)
+            maximo = PRESUPUESTO_CONSULTAS[nombre]
+            correcto = respuesta.status_code == 200 and consultas.total <= maximo
+            print(f"\n {'✅' if correcto else '❌'} {nombre}: HTTP {respuesta.status_code}, "
+                  f"{consultas.total} consultas (máximo {maximo})")
+            for sentencia in consultas.sentencias:
+                print(f"     {' '.join(sentencia.split())[:160]}")
+            if not correcto:
+                fallos.append(nombre)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    if fallos:
+        print(f"\n ❌ Fuera de presupuesto: {', '.join(fallos)}")
+        return 1
+    print("\n ✅ Todas las peticiones dentro del presupuesto de consultas")
+    return 0
+
+
+def diagnostico_basico() -> int:
+    print("🔍 Iniciando diagnóstico...")
+
+    try:
+        print("1. Intentando importar create_app...")
+        from app import create_app
+        print(" create_app importado correctamente")
+
+        print("2. Ejecutando create_app()...")
+        app = create_app()
+
+        if app is None:
+            print(" create_app() retornó None")
+            print("3. Probable causa: Error en la inicialización de blueprints o base de datos")
+        else:
+            print(" create_app() retornó una aplicación Flask válida")
+            print(f"   Tipo: {type(app)}")
+
+    except ImportError as e:
+        print(f" Error de importación: {e}")
+        print("   Posibles causas:")
+        print("   - Falta archivo __init__.py en alguna carpeta")
+        print("   - Error en imports circulares")
+        print("   - Módulo no encontrado")
+
+    except Exception as e:
+        print(f" Error general: {e}")
+        print("   Revisa los archivos de inicialización")
+
+    print(" Diagnóstico completado")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnóstico del backend")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="Costo de importación por módulo, tiempos por fase y control de presupuesto")
+    parser.add_argument('--inicializar', action='store_true',
+                        help="Incluir esquema, seed y precalentamiento (por defecto: arranque de un worker)")
+    parser.add_argument('--top', type=int, default=25, help="Módulos/paquetes a mostrar")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Arranques a medir")
+    parser.add_argument('--presupuesto-ms', type=float, default=None,
+                        help="Falla (código 1) si el arranque lo supera (por defecto ARRANQUE_PRESUPUESTO_MS)")
+    parser.add_argument('--explain', action='store_true',
+                        help="Verifica con EXPLAIN (sobre una base temporal) que las consultas críticas usen un índice")
+    parser.add_argument('--consultas', action='store_true',
+                        help="Cuenta las sentencias SQL de los endpoints de lectura")
+    args = parser.parse_args()
+
+    if args.consultas:
+        return contar_consultas()
+    if args.explain:
+        return explicar_consultas()
+    if args.startup_profile:
+        return perfil_arranque(args)
+    return diagnostico_basico()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
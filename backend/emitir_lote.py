@@ -0,0 +1,67 @@
+# emitir_lote.py
+# Emisión masiva de certificados. Uso:
+#   python emitir_lote.py --titulo "Educación Secundaria Completa" --ids 1 2 3
+#   python emitir_lote.py --titulo "Educación Secundaria Completa" --cohorte
+#   python emitir_lote.py --reanudar <lote_id>
+#   python emitir_lote.py --estado <lote_id>
+import argparse
+from app import create_app
+from app.services.emision_lote_service import EmisionLoteService
+
+
+def mostrar_progreso(hechos, total):
+    print(f"\r   Generados: {hechos}/{total}", end="", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emisión masiva de certificados")
+    parser.add_argument('--titulo', help="Título del certificado a emitir")
+    parser.add_argument('--ids', type=int, nargs='+', help="Lista de estudiante_id")
+    parser.add_argument('--cohorte', action='store_true', help="Emitir para todos los estudiantes")
+    parser.add_argument('--reanudar', metavar='LOTE_ID', help="Reanudar un lote interrumpido")
+    parser.add_argument('--estado', metavar='LOTE_ID', help="Mostrar el estado de un lote")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos para generar PDFs")
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        if args.estado:
+            estado = EmisionLoteService.estado_lote(args.estado)
+            if not estado:
+                print(" Lote no encontrado")
+                return
+            print(f" Lote {estado['lote_id']} ({estado['titulo']}): {estado['estado']}")
+            print(f"   Generados: {estado['generados']}/{estado['total']}")
+            if estado['mensaje']:
+                print(f"   {estado['mensaje']}")
+            return
+
+        if args.reanudar:
+            lote_id = args.reanudar
+        else:
+            success, message, lote = EmisionLoteService.crear_lote(args.titulo, args.ids, args.cohorte)
+            if not success:
+                print(f" Error: {message}")
+                return
+            lote_id = lote['lote_id']
+            print(f" {message} Lote: {lote_id}")
+
+        print("🔧 Generando certificados...")
+        success, message, resumen = EmisionLoteService.ejecutar_lote(
+            lote_id, max_workers=args.workers, progreso=mostrar_progreso
+        )
+        print()
+
+        if success:
+            print(f" {message}")
+            for error in (resumen or {}).get('errores', []):
+                print(f"   Estudiante {error['estudiante_id']}: {error['error']}")
+        else:
+            print(f" Error: {message}")
+            print(f"\n Puede reanudar con: python emitir_lote.py --reanudar {lote_id}")
+
+
+# El guard es necesario: ProcessPoolExecutor vuelve a importar este módulo en Windows
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# gunicorn.conf.py
+# Configuración de gunicorn para producción:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#   GUNICORN_PRELOAD=True gunicorn -c gunicorn.conf.py wsgi:app
+#
+# - Con preload, la app completa se crea en el maestro antes del fork: los workers
+#   heredan módulos importados, plantillas compiladas y fuentes (copy-on-write).
+# - Sin preload, el maestro solo hace la inicialización de una sola vez
+#   (esquema, seed, precalentamiento) y cada worker crea la app sin repetirla.
+#
+# Detrás de nginx, los PDFs almacenados los puede enviar el proxy (sendfile) en lugar
+# del worker: CERTIFICADOS_X_ACCEL_PREFIJO=/protegido/certificados y en nginx
+#   location /protegido/certificados/ {
+#       internal;
+#       alias /ruta/a/backend/app/certificados_pdf/;
+#   }
+import os
+import multiprocessing
+
+# Escucha en 127.0.0.1 detrás de nginx: se confía en un salto de X-Forwarded-For para
+# obtener la IP real del cliente (se lee al importar app.config, antes de wsgi.py)
+os.environ.setdefault('PROXY_SALTOS_CONFIABLES', '1')
+# Ni el maestro (con o sin preload) ni la carga de wsgi.py arrancan hilos en segundo
+# plano: los arranca post_worker_init en cada worker
+os.environ['APP_INICIAR_HILOS'] = 'False'
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Reciclar workers de vez en cuando acota cualquier crecimiento de memoria
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = 500
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """En el maestro, antes de crear los workers."""
+    from app.config import Config
+
+    if server.cfg.workers > 1 and Config.LOGIN_LIMITE_BACKEND == 'memoria':
+        server.log.warning(
+            "LOGIN_LIMITE_BACKEND=memoria cuenta los intentos de login por worker: con %d workers "
+            "se permiten hasta %d veces los intentos configurados. Usar LOGIN_LIMITE_BACKEND=redis.",
+            server.cfg.workers, server.cfg.workers,
+        )
+        server.log.warning(
+            "Sin LOGIN_LIMITE_BACKEND=redis la caché de códigos MFA ya usados es por worker: "
+            "con %d workers un mismo código TOTP puede aceptarse hasta %d veces dentro de su ventana.",
+            server.cfg.workers, server.cfg.workers,
+        )
+    if server.cfg.preload_app:
+        # wsgi.py ya se importó en el maestro con la inicialización completa
+        return
+    from app import create_app, inicializar_aplicacion
+
+    app = create_app(inicializar=False, iniciar_hilos=False)
+    inicializar_aplicacion(app)
+    # Los workers heredan el entorno: crean la app sin repetir el trabajo
+    os.environ['APP_INICIALIZAR'] = 'False'
+
+
+def post_worker_init(worker):
+    """En cada worker, con la app ya cargada (heredada con preload o importada de wsgi.py)."""
+    from app import preparar_worker
+    preparar_worker(worker.wsgi)
@@ -1,12 +1,14 @@
 from app import create_app
 
-app = create_app()
-
+# La app se crea solo al ejecutar el script: los procesos del pool de emisión por
+# lotes (forkserver/spawn) vuelven a importar el módulo principal
 if __name__ == '__main__':
+    app = create_app()
     if app is not None:
         print(f"Iniciando Flask en modo DEBUG: {app.config.get('DEBUG')}")
         print("Servidor corriendo en: http://127.0.0.1:5000")
-        app.run(debug=True, host='127.0.0.1', port=5000)
+        print("Solo para desarrollo. En producción: gunicorn -c gunicorn.conf.py wsgi:app")
+        app.run(debug=app.config.get('DEBUG'), host='127.0.0.1', port=5000)
     else:
         print("ERROR: No se pudo crear la aplicación Flask")
         exit(1)
\ No newline at end of file
@@ -0,0 +1,41 @@
+# Configuración común de las pruebas: cada sesión usa una base SQLite y carpetas de
+# archivos temporales, nunca la DATABASE_URL configurada.
+#   cd backend && python -m pytest
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+DIRECTORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORIO)
+
+CARPETA_TEMPORAL = tempfile.mkdtemp(prefix='pruebas_backend_')
+# La configuración se lee del entorno al importar app.config (y los procesos que
+# lanzan las pruebas heredan este entorno)
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(CARPETA_TEMPORAL, 'pruebas.db')
+os.environ['LOG_VERIFICACION_ASINCRONO'] = 'True'
+os.environ['CERTIFICADOS_RECONCILIAR'] = 'False'
+
+
+@pytest.fixture(scope='session', autouse=True)
+def carpeta_temporal():
+    yield CARPETA_TEMPORAL
+    shutil.rmtree(CARPETA_TEMPORAL, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def app(carpeta_temporal):
+    """Aplicación sobre la base temporal, con el esquema y los datos iniciales."""
+    from app import create_app
+    from app.models import verificar_esquema
+    from app.seed_data import seed_initial_data
+
+    aplicacion = create_app(inicializar=False)
+    aplicacion.config['CERTIFICADOS_FOLDER'] = os.path.join(carpeta_temporal, 'certificados_pdf')
+    aplicacion.config['PDF_CACHE_FOLDER'] = os.path.join(carpeta_temporal, 'cache_pdf')
+    with aplicacion.app_context():
+        verificar_esquema()
+        seed_initial_data()
+    return aplicacion
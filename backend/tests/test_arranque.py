@@ -0,0 +1,20 @@
+import diagnosticar
+from app.config import Config
+
+
+def test_arranque_de_worker_dentro_del_presupuesto():
+    # Mejor de tres arranques en procesos nuevos: import de app + create_app sin inicialización
+    medicion = min((diagnosticar._arrancar(inicializar=False)[0] for _ in range(3)), key=lambda m: m['total_ms'])
+
+    assert medicion['ok'], "create_app() retornó None"
+    assert medicion['total_ms'] <= Config.ARRANQUE_PRESUPUESTO_MS, (
+        f"arranque de {medicion['total_ms']:.1f} ms supera el presupuesto de {Config.ARRANQUE_PRESUPUESTO_MS:.0f} ms"
+    )
+
+
+def test_modulos_pesados_no_se_cargan_al_arrancar():
+    medicion, _ = diagnosticar._arrancar(inicializar=False)
+
+    assert medicion['diferidos_cargados'] == [], (
+        f"módulos que deberían cargarse en su primer uso: {', '.join(medicion['diferidos_cargados'])}"
+    )
@@ -0,0 +1,21 @@
+import pytest
+
+import diagnosticar
+
+
+@pytest.fixture(scope='module')
+def medicion(app):
+    """Certificado emitido, administrador y cachés calientes: (urls, cabeceras)."""
+    return diagnosticar.preparar_medicion(app)
+
+
+@pytest.mark.parametrize('nombre', list(diagnosticar.PRESUPUESTO_CONSULTAS))
+def test_endpoint_dentro_del_presupuesto_de_consultas(app, medicion, nombre):
+    urls, cabeceras = medicion
+    metodo, url, cuerpo = urls[nombre]
+
+    respuesta, consultas = diagnosticar.medir_peticion(app, metodo, url, cuerpo, cabeceras)
+
+    assert respuesta.status_code == 200
+    maximo = diagnosticar.PRESUPUESTO_CONSULTAS[nombre]
+    assert consultas.total <= maximo, f"{consultas.total} consultas (máximo {maximo}): {consultas.sentencias}"
@@ -0,0 +1,13 @@
+import pytest
+
+import diagnosticar
+from app.models import db
+
+
+@pytest.mark.parametrize('nombre', list(diagnosticar._consultas_criticas()))
+def test_consulta_critica_usa_un_indice(app, nombre):
+    consulta = diagnosticar._consultas_criticas()[nombre]
+    with app.app_context(), db.engine.connect() as conexion:
+        plan, recorridos = diagnosticar.plan_consulta(conexion, consulta)
+
+    assert not recorridos, f"{nombre} recorre la tabla completa: {plan}"
@@ -0,0 +1,16 @@
+# wsgi.py
+# Punto de entrada WSGI para producción. Uso:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# La inicialización de una sola vez (esquema, seed, precalentamiento) la hace el
+# proceso maestro; los workers crean la app con APP_INICIALIZAR=False (ver gunicorn.conf.py).
+# Con APP_INICIAR_HILOS=False los hilos en segundo plano los arranca cada worker.
+import os
+from app import create_app
+
+app = create_app(
+    inicializar=os.getenv('APP_INICIALIZAR', 'True') == 'True',
+    iniciar_hilos=os.getenv('APP_INICIAR_HILOS', 'True') == 'True',
+)
+
+if app is None:
+    raise RuntimeError("No se pudo crear la aplicación Flask")